@@ -0,0 +1,126 @@
+# Streaming anti-cheat detection for the Typing Speed Test application.
+
+# A 'CheatDetector' watches the keystrokes of one test as they happen and flags results which were (probably) not
+# typed by a human: pasted text, multi-character inserts (e.g., by a macro or input tool), bursts faster than any
+# human types, and sustained typing with implausibly fast or regular inter-key intervals.  Statistics are kept online
+# (Welford's algorithm for the mean/variance of inter-key intervals, and a fixed-size ring of recent keystroke times
+# for bursts), so memory per test is constant and each keystroke costs a few arithmetic operations.
+
+# Import necessary library(ies):
+from array import array
+import math
+
+# Define constants for the burst check (no. of consecutive keystrokes, and the minimum human time to type them):
+BURST_KEYSTROKES = 16
+BURST_MINIMUM_DURATION = 0.15  # ~100 keystrokes per second.
+
+# Define constants for the sustained-typing checks (applied once enough intervals have been observed):
+MINIMUM_INTERVALS_FOR_STATISTICS = 50
+MINIMUM_MEAN_INTERVAL = 0.03  # ~400 WPM sustained.
+MINIMUM_INTERVAL_STANDARD_DEVIATION = 0.004  # Human inter-key intervals vary by tens of milliseconds.
+
+# Define constant for the longest pause (in seconds) counted as an inter-key interval (longer pauses are ignored):
+MAXIMUM_INTERVAL = 2.0
+
+
+class CheatDetector:
+    """Class which detects (online) signs that a test result was not typed by a human"""
+    __slots__ = ("keystrokes", "intervals", "interval_mean", "interval_m2", "last_keystroke_time", "recent_times",
+                 "recent_index", "bursts", "pastes", "multi_character_inserts", "keystrokes_since_check",
+                 "last_text_length")
+
+    def __init__(self):
+        self.recent_times = array("d", [0.0] * BURST_KEYSTROKES)
+        self.reset()
+
+    def get_suspicion_reasons(self, characters_accepted=0):
+        """Function which lists the reasons (if any) for which the test result is suspect"""
+        reasons = []
+        if self.pastes:
+            reasons.append(f"text pasted {self.pastes} time(s)")
+        if self.multi_character_inserts:
+            reasons.append(f"{self.multi_character_inserts} multi-character insert(s)")
+        if self.bursts:
+            reasons.append(f"{self.bursts} burst(s) of {BURST_KEYSTROKES} keystrokes in under {BURST_MINIMUM_DURATION} s")
+        if characters_accepted > self.keystrokes:
+            reasons.append(f"{characters_accepted} characters accepted from only {self.keystrokes} keystrokes")
+        if self.intervals >= MINIMUM_INTERVALS_FOR_STATISTICS:
+            if self.interval_mean < MINIMUM_MEAN_INTERVAL:
+                reasons.append(f"mean inter-key interval of {self.interval_mean * 1000:.0f} ms")
+            standard_deviation = math.sqrt(self.interval_m2 / (self.intervals - 1))
+            if standard_deviation < MINIMUM_INTERVAL_STANDARD_DEVIATION:
+                reasons.append(f"inter-key intervals too regular ({standard_deviation * 1000:.1f} ms deviation)")
+        return reasons
+
+    def record_keystroke(self, timestamp):
+        """Function which records a character-producing keystroke made at the given time (in seconds)"""
+        self.keystrokes += 1
+        self.keystrokes_since_check += 1
+
+        # Update the running mean/variance of inter-key intervals (ignoring pauses):
+        interval = timestamp - self.last_keystroke_time
+        self.last_keystroke_time = timestamp
+        if self.keystrokes > 1 and interval <= MAXIMUM_INTERVAL:
+            self.intervals += 1
+            delta = interval - self.interval_mean
+            self.interval_mean += delta / self.intervals
+            self.interval_m2 += delta * (interval - self.interval_mean)
+
+        # Compare with the time of the keystroke BURST_KEYSTROKES keystrokes ago (the oldest entry in the ring):
+        oldest_time = self.recent_times[self.recent_index]
+        self.recent_times[self.recent_index] = timestamp
+        self.recent_index = (self.recent_index + 1) % BURST_KEYSTROKES
+        if self.keystrokes > BURST_KEYSTROKES and timestamp - oldest_time < BURST_MINIMUM_DURATION:
+            self.bursts += 1
+
+    def record_paste(self):
+        """Function which records that text was pasted"""
+        self.pastes += 1
+
+    def record_text_length(self, text_length):
+        """Function which records the current length of the typed text, detecting growth not explained by keystrokes"""
+        if text_length - self.last_text_length > max(1, self.keystrokes_since_check):
+            self.multi_character_inserts += 1
+        self.last_text_length = text_length
+        self.keystrokes_since_check = 0
+
+    def set_text_length(self, text_length):
+        """Function which records the length of the typed text after the application itself has changed it (e.g., filled in indentation)"""
+        self.last_text_length = text_length
+        self.keystrokes_since_check = 0
+
+    def reset(self):
+        """Function which prepares the detector for a new test"""
+        self.keystrokes = 0
+        self.intervals = 0
+        self.interval_mean = 0.0
+        self.interval_m2 = 0.0
+        self.last_keystroke_time = 0.0
+        self.recent_index = 0
+        self.bursts = 0
+        self.pastes = 0
+        self.multi_character_inserts = 0
+        self.keystrokes_since_check = 0
+        self.last_text_length = 0
+
+
+if __name__ == '__main__':
+    # Benchmark the cost of recording a keystroke, and check that a human-like and a macro-like stream are told apart:
+    import random
+    import time
+
+    detector = CheatDetector()
+    rng = random.Random(0)
+    timestamp = 0.0
+    start = time.perf_counter()
+    for _ in range(1000000):
+        timestamp += rng.lognormvariate(-2.2, 0.4)  # Human-like: ~110 ms mean interval, variable.
+        detector.record_keystroke(timestamp)
+    elapsed = time.perf_counter() - start
+    print(f"record_keystroke: {elapsed:.2f} us/keystroke (including random-number generation)")
+    print("Human-like stream:", detector.get_suspicion_reasons() or "not suspect")
+
+    detector.reset()
+    for index in range(300):
+        detector.record_keystroke(index * 0.005)  # Macro-like: 200 keystrokes per second, perfectly regular.
+    print("Macro-like stream:", detector.get_suspicion_reasons())
@@ -0,0 +1,253 @@
+# Decoded and scaled image asset cache for the Typing Speed Test application.
+
+# Images (e.g., 'keyboard.png') are decoded and scaled once, and the result is saved in a cache directory as a binary
+# PPM file: raw RGB pixels behind a short header, which Tk loads without any decompression or filtering.  Cache files
+# are keyed by a hash of the source image, the scale factor and the background colour (PPM has no transparency, so
+# transparent pixels are blended with the background the image is shown on), so an edited image or a different scale
+# (e.g., on a HiDPI display) simply gets a new cache file.  On a cache hit, the PNG is never decoded.
+
+# PNG decoding and scaling (bilinear) are done in pure Python on a cache miss, for 8-bit, non-interlaced greyscale, RGB
+# or RGBA images; any other image is decoded by Tk instead, and scaled with Tk's integer zoom/subsample.
+
+# Import necessary library(ies):
+from fractions import Fraction
+import hashlib
+import os
+import struct
+import zlib
+
+# Define constant for the directory in which decoded and scaled images are cached:
+ASSET_CACHE_DIRECTORY = "asset_cache"
+
+# Define constant for the signature at the start of every PNG file:
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Define constant for the no. of bytes per pixel of each supported PNG colour type (8 bits per channel):
+PNG_BYTES_PER_PIXEL = {0: 1, 2: 3, 4: 2, 6: 4}
+
+# Define dictionary of computed source hashes ((path, size, modification time) -> hash):
+computed_hashes = {}
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def build_cached_image(source_path, cache_path, scale, background):
+    """Function which decodes, flattens onto the background and scales an image, and saves it as a PPM file (False if unsupported)"""
+    try:
+        with open(source_path, mode="rb") as file:
+            width, height, channels, pixels = decode_png(file.read())
+    except ValueError:  # Not a PNG image, or one which is not supported by the decoder.
+        return False
+    rgb = flatten_pixels(pixels, channels, background)
+    if scale != 1:
+        width, height, rgb = scale_pixels(rgb, width, height, scale)
+
+    # Save the image atomically (so other processes never load a partly written file):
+    os.makedirs(ASSET_CACHE_DIRECTORY, exist_ok=True)
+    temporary_path = cache_path + "." + str(os.getpid()) + ".tmp"
+    with open(temporary_path, mode="wb") as file:
+        file.write(b"P6\n%d %d\n255\n" % (width, height))
+        file.write(rgb)
+    os.replace(temporary_path, cache_path)
+    return True
+
+
+def decode_png(data):
+    """Function which decodes an 8-bit, non-interlaced PNG image into (width, height, channels, pixel bytes)"""
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG image.")
+
+    # Read the header and the (compressed) image data from the chunks:
+    position = len(PNG_SIGNATURE)
+    header = None
+    compressed = []
+    while position < len(data):
+        length, chunk_type = struct.unpack_from(">I4s", data, position)
+        chunk = data[position + 8:position + 8 + length]
+        position += 12 + length
+        if chunk_type == b"IHDR":
+            header = struct.unpack(">IIBBBBB", chunk)
+        elif chunk_type == b"IDAT":
+            compressed.append(chunk)
+        elif chunk_type == b"IEND":
+            break
+    if header is None:
+        raise ValueError("PNG image has no header.")
+    width, height, bit_depth, colour_type, _, _, interlace = header
+    if bit_depth != 8 or colour_type not in PNG_BYTES_PER_PIXEL or interlace:
+        raise ValueError("Unsupported PNG image (only 8-bit, non-interlaced, non-palette images are supported).")
+
+    # Decompress the image data and undo each row's filter:
+    raw = zlib.decompress(b"".join(compressed))
+    bytes_per_pixel = PNG_BYTES_PER_PIXEL[colour_type]
+    stride = width * bytes_per_pixel
+    pixels = bytearray(stride * height)
+    previous = bytearray(stride)
+    for row in range(height):
+        filter_type = raw[row * (stride + 1)]
+        line = bytearray(raw[row * (stride + 1) + 1:(row + 1) * (stride + 1)])
+        if filter_type == 1:  # Sub.
+            for index in range(bytes_per_pixel, stride):
+                line[index] = (line[index] + line[index - bytes_per_pixel]) & 0xFF
+        elif filter_type == 2:  # Up.
+            line = bytearray((value + above) & 0xFF for value, above in zip(line, previous))
+        elif filter_type == 3:  # Average.
+            for index in range(stride):
+                left = line[index - bytes_per_pixel] if index >= bytes_per_pixel else 0
+                line[index] = (line[index] + ((left + previous[index]) >> 1)) & 0xFF
+        elif filter_type == 4:  # Paeth.
+            for index in range(stride):
+                if index >= bytes_per_pixel:
+                    left = line[index - bytes_per_pixel]
+                    upper_left = previous[index - bytes_per_pixel]
+                else:
+                    left = upper_left = 0
+                above = previous[index]
+                estimate = left + above - upper_left
+                distance_left = abs(estimate - left)
+                distance_above = abs(estimate - above)
+                distance_upper_left = abs(estimate - upper_left)
+                if distance_left <= distance_above and distance_left <= distance_upper_left:
+                    predictor = left
+                elif distance_above <= distance_upper_left:
+                    predictor = above
+                else:
+                    predictor = upper_left
+                line[index] = (line[index] + predictor) & 0xFF
+        elif filter_type != 0:
+            raise ValueError(f"Invalid PNG filter type: {filter_type}")
+        pixels[row * stride:(row + 1) * stride] = line
+        previous = line
+
+    # Return the decoded image:
+    return width, height, bytes_per_pixel, pixels
+
+
+def flatten_pixels(pixels, channels, background):
+    """Function which converts decoded pixels (grey, grey + alpha, RGB or RGBA) into RGB, blending alpha with the background (r, g, b)"""
+    if channels == 3:
+        return bytes(pixels)
+    if channels == 1:
+        return bytes(value for value in pixels for _ in range(3))
+
+    # Blend each pixel with the background according to its alpha:
+    colour_channels = channels - 1
+    rgb = bytearray(len(pixels) // channels * 3)
+    output = 0
+    for index in range(0, len(pixels), channels):
+        alpha = pixels[index + colour_channels]
+        for channel in range(3):
+            value = pixels[index + (channel if colour_channels == 3 else 0)]
+            rgb[output] = (value * alpha + background[channel] * (255 - alpha) + 127) // 255
+            output += 1
+    return bytes(rgb)
+
+
+def get_cache_path(source_path, scale, background):
+    """Function which returns the path of the cached (decoded and scaled) image for a source image, scale and background"""
+    status = os.stat(source_path)
+    key = (source_path, status.st_size, status.st_mtime_ns)
+    source_hash = computed_hashes.get(key)
+    if source_hash is None:
+        with open(source_path, mode="rb") as file:
+            source_hash = hashlib.sha256(file.read()).hexdigest()[:16]
+        computed_hashes[key] = source_hash
+    return os.path.join(ASSET_CACHE_DIRECTORY, f"{source_hash}_{format(scale, 'g')}x_{bytes(background).hex()}.ppm")
+
+
+def load_image(source_path, scale=1, background=(255, 255, 255), master=None):
+    """Function which returns a Tk 'PhotoImage' of an image at the given scale, from the asset cache where possible"""
+    from tkinter import PhotoImage
+
+    # Load the cached image, building it first if needed:
+    cache_path = get_cache_path(source_path, scale, background)
+    try:
+        if os.path.exists(cache_path) or build_cached_image(source_path, cache_path, scale, background):
+            return PhotoImage(master=master, file=cache_path, format="PPM")
+    except OSError:  # Cache directory not writable (or file unreadable); decode the image with Tk below.
+        pass
+
+    # Otherwise, let Tk decode the image, and scale it by the nearest fraction with small terms:
+    image = PhotoImage(master=master, file=source_path)
+    if scale != 1:
+        fraction = Fraction(scale).limit_denominator(8)
+        image = image.zoom(fraction.numerator).subsample(fraction.denominator)
+    return image
+
+
+def scale_pixels(rgb, width, height, scale):
+    """Function which scales RGB pixels by the given factor (bilinear interpolation) and returns (width, height, pixels)"""
+    scaled_width = max(1, round(width * scale))
+    scaled_height = max(1, round(height * scale))
+
+    # Precompute, for each output column and row, the two source columns/rows and the weight of the second:
+    def get_samples(size, scaled_size):
+        samples = []
+        for position in range(scaled_size):
+            source = min(max((position + 0.5) * size / scaled_size - 0.5, 0.0), size - 1.0)
+            first = int(source)
+            samples.append((first, min(first + 1, size - 1), source - first))
+        return samples
+
+    columns = [(first * 3, second * 3, weight) for first, second, weight in get_samples(width, scaled_width)]
+    stride = width * 3
+    scaled = bytearray(scaled_width * scaled_height * 3)
+    output = 0
+    for first_row, second_row, row_weight in get_samples(height, scaled_height):
+        top = rgb[first_row * stride:(first_row + 1) * stride]
+        bottom = rgb[second_row * stride:(second_row + 1) * stride]
+        # Interpolate between the two rows, then between the two columns:
+        line = [value + (other - value) * row_weight for value, other in zip(top, bottom)]
+        for first, second, weight in columns:
+            for channel in range(3):
+                value = line[first + channel]
+                scaled[output] = int(value + (line[second + channel] - value) * weight + 0.5)
+                output += 1
+    return scaled_width, scaled_height, bytes(scaled)
+
+
+if __name__ == '__main__':
+    # Startup benchmark: time loading 'keyboard.png' at 1x and 2x with and without the asset cache (PhotoImage
+    # creation is included only if a display is available):
+    import shutil
+    import tempfile
+    import time
+
+    source = os.path.abspath("keyboard.png")
+    ASSET_CACHE_DIRECTORY = os.path.join(tempfile.mkdtemp(), ASSET_CACHE_DIRECTORY)
+    try:
+        import tkinter
+        root = tkinter.Tk()
+        root.withdraw()
+    except Exception:
+        root = None
+        print("(No display available: timing decoding and cache files only, without creating Tk images.)")
+
+    def time_call(function, repeat=20):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    for scale in (1, 2, 1.5):
+        cache_path = get_cache_path(source, scale, (255, 255, 255))
+        if root is not None:
+            def load_uncached():
+                image = tkinter.PhotoImage(master=root, file=source)
+                if scale != 1:
+                    fraction = Fraction(scale).limit_denominator(8)
+                    image = image.zoom(fraction.numerator).subsample(fraction.denominator)
+            miss = time_call(lambda: (os.path.exists(cache_path) and os.remove(cache_path),
+                                      load_image(source, scale, master=root)), repeat=3)
+            hit = time_call(lambda: load_image(source, scale, master=root))
+            print(f"{format(scale, 'g'):>4}x: PNG decoded by Tk {time_call(load_uncached):7.2f} ms; "
+                  f"cache miss {miss:7.2f} ms; cache hit {hit:6.2f} ms")
+        else:
+            miss = time_call(lambda: build_cached_image(source, cache_path, scale, (255, 255, 255)), repeat=3)
+
+            def read_cached():
+                with open(get_cache_path(source, scale, (255, 255, 255)), mode="rb") as file:
+                    file.read()
+            print(f"{format(scale, 'g'):>4}x: cache miss (decode, scale and save) {miss:7.2f} ms; "
+                  f"cache hit (look up and read) {time_call(read_cached):6.3f} ms; "
+                  f"{os.path.getsize(cache_path):,} bytes")
+    shutil.rmtree(os.path.dirname(ASSET_CACHE_DIRECTORY))
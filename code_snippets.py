@@ -0,0 +1,286 @@
+# Code mode for the Typing Speed Test application.
+
+# Instead of words, the user types real code: short, function-sized snippets taken from a local source tree.  The
+# tree is indexed once: every source file is parsed for snippets (functions, for Python; otherwise top-level blocks
+# separated by blank lines) which fit the words pane, and the byte offset and length of each snippet are saved, with
+# the size and modification time of its file, in one index file per tree (in CODE_INDEX_DIRECTORY).  When the index is
+# next loaded, only files whose size or modification time has changed (or which are new) are parsed again, and a
+# snippet is checked against its file's modification time when it is read, so tests are sampled from the index
+# without rescanning the tree.
+
+# Snippets are typed line by line: each line of code is one "word" of the test.  Indentation is normalised (tabs
+# expanded, the common indentation removed, and each level of nesting indented by INDENT), and it is filled in
+# automatically at the start of each line, as an editor would, so only the code itself is typed (followed by Return).
+
+# Usage example (index a source tree ahead of time, and report the time to sample a test from it):
+#   python code_snippets.py ~/src/project
+
+# Import necessary library(ies):
+from array import array
+import ast
+import hashlib
+import os
+import random
+import struct
+
+# Define constant for the directory in which the index of each source tree is saved:
+CODE_INDEX_DIRECTORY = "code_index"
+
+# Define constants for the index file of a source tree (extension, header layout and the header of each file's entry):
+INDEX_FILE_EXTENSION = ".cidx"
+INDEX_FILE_HEADER = struct.Struct("<8sQ")  # Magic, no. of files
+INDEX_FILE_MAGIC = b"CODEIDX1"
+INDEX_ENTRY_HEADER = struct.Struct("<HQQI")  # Length of relative path, size of file, modification time, no. of snippets
+
+# Define constant for the extensions of the source files indexed:
+DEFAULT_EXTENSIONS = (".py",)
+
+# Define constants for the snippets indexed (no. of lines and the maximum length of a line, which fits the words pane):
+MINIMUM_SNIPPET_LINES = 3
+MAXIMUM_SNIPPET_LINES = 15
+MAXIMUM_LINE_LENGTH = 35
+
+# Define constant for the minimum number of snippets in a source tree for code mode (fewer would repeat within a test):
+MINIMUM_SNIPPETS = 50
+
+# Define constant for the indentation of each level of nesting in a (normalised) snippet:
+INDENT = "    "
+
+# Define constant for the number of lines of code chosen for a test (more than anyone types in a test):
+NUMBER_OF_LINES_TO_SELECT = 120
+
+# Define dictionary of loaded indices (source directory -> CodeIndex):
+loaded_indices = {}
+
+
+class CodeIndex:
+    """Class which holds the snippet index of a source tree: each file's size, modification time and snippets"""
+    __slots__ = ("root", "extensions", "files", "snippets", "digest")
+
+    def __init__(self, root, extensions, files):
+        self.root = root
+        self.extensions = extensions
+        self.files = files
+        self.update()
+
+    def update(self):
+        """Function which rebuilds the list of all snippets (relative path, offset, length) and the digest of the index"""
+        self.snippets = [(relative_path, offset, length) for relative_path, (_, _, offsets, lengths)
+                         in sorted(self.files.items()) for offset, length in zip(offsets, lengths)]
+        digest = hashlib.sha256()
+        for relative_path, (size, modified, _, _) in sorted(self.files.items()):
+            digest.update(f"{relative_path}\0{size}\0{modified}\n".encode("utf-8", errors="surrogateescape"))
+        self.digest = digest.hexdigest()
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def choose_code_lines(root, number_of_lines=NUMBER_OF_LINES_TO_SELECT, rng=random, extensions=DEFAULT_EXTENSIONS):
+    """Function which returns (at least) the given number of lines of code from snippets chosen at random in a source tree"""
+    index = get_code_index(root, extensions)
+    lines = []
+    attempts = 0
+    while index.snippets and len(lines) < number_of_lines and attempts < 4 * number_of_lines:
+        attempts += 1
+        snippet = read_snippet(index, *index.snippets[rng.randrange(len(index.snippets))])
+        if snippet is not None:
+            lines.extend(snippet)
+    return lines
+
+
+def find_snippets(source, is_python):
+    """Function which returns the (byte offset, length) of each snippet of a source file which fits the words pane"""
+    line_offsets = [0]
+    for line in source.splitlines(keepends=True):
+        line_offsets.append(line_offsets[-1] + len(line))
+
+    # Find the first and last line (1-based) of each candidate snippet:
+    spans = []
+    if is_python:
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError):
+            return []
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                first_line = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+                spans.append((first_line, node.end_lineno))
+    else:
+        # Blocks of lines starting at the left margin and separated by blank lines:
+        start = None
+        lines = source.splitlines(keepends=True)
+        for number, line in enumerate(lines + [b"\n"], start=1):
+            if not line.strip():
+                if start is not None:
+                    spans.append((start, number - 1))
+                start = None
+            elif start is None and not line[:1].isspace():
+                start = number
+
+    # Keep the snippets which fit the words pane once normalised:
+    snippets = []
+    for first_line, last_line in sorted(spans):
+        offset = line_offsets[first_line - 1]
+        length = line_offsets[last_line] - offset
+        lines = normalise_snippet(source[offset:offset + length])
+        if (lines is not None and MINIMUM_SNIPPET_LINES <= len(lines) <= MAXIMUM_SNIPPET_LINES
+                and max(map(len, lines)) <= MAXIMUM_LINE_LENGTH):
+            snippets.append((offset, length))
+    return snippets
+
+
+def get_code_index(root, extensions=DEFAULT_EXTENSIONS):
+    """Function which returns the snippet index of a source tree, loading it from disk and re-indexing changed files as needed"""
+    index = loaded_indices.get(root)
+    if index is not None:
+        return index
+
+    # Load the saved index (if any), and bring it up to date with the tree (only new or changed files are parsed):
+    saved_files = load_code_index(root) or {}
+    files = {}
+    changed = False
+    for directory, subdirectories, file_names in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith("."))
+        for file_name in sorted(file_names):
+            if not file_name.endswith(extensions):
+                continue
+            path = os.path.join(directory, file_name)
+            relative_path = os.path.relpath(path, root)
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            entry = saved_files.get(relative_path)
+            if entry is None or entry[0] != status.st_size or entry[1] != status.st_mtime_ns:
+                entry = index_file(path, status)
+                changed = True
+            files[relative_path] = entry
+    changed = changed or len(files) != len(saved_files)
+
+    # Save the index if it has changed, and keep it for the rest of the session:
+    index = CodeIndex(root, extensions, files)
+    if changed:
+        save_code_index(index)
+    loaded_indices[root] = index
+    return index
+
+
+def get_index_path(root):
+    """Function which returns the path of the saved snippet index of a source tree"""
+    return os.path.join(CODE_INDEX_DIRECTORY,
+                        hashlib.sha1(os.path.abspath(root).encode("utf-8", errors="surrogateescape")).hexdigest()
+                        + INDEX_FILE_EXTENSION)
+
+
+def index_file(path, status):
+    """Function which parses a source file for snippets and returns its index entry (size, modification time, offsets, lengths)"""
+    offsets = array("Q")
+    lengths = array("I")
+    try:
+        with open(path, mode="rb") as file:
+            source = file.read()
+    except OSError:
+        source = b""
+    for offset, length in find_snippets(source, path.endswith(".py")):
+        offsets.append(offset)
+        lengths.append(length)
+    return status.st_size, status.st_mtime_ns, offsets, lengths
+
+
+def load_code_index(root):
+    """Function which loads the saved snippet index of a source tree (None if missing or unreadable)"""
+    try:
+        with open(get_index_path(root), mode="rb") as file:
+            magic, count = INDEX_FILE_HEADER.unpack(file.read(INDEX_FILE_HEADER.size))
+            if magic != INDEX_FILE_MAGIC:
+                return None
+            files = {}
+            for _ in range(count):
+                path_length, size, modified, snippet_count = INDEX_ENTRY_HEADER.unpack(
+                    file.read(INDEX_ENTRY_HEADER.size))
+                relative_path = file.read(path_length).decode("utf-8", errors="surrogateescape")
+                offsets = array("Q")
+                offsets.fromfile(file, snippet_count)
+                lengths = array("I")
+                lengths.fromfile(file, snippet_count)
+                files[relative_path] = (size, modified, offsets, lengths)
+            return files
+    except (OSError, struct.error, EOFError):
+        return None
+
+
+def normalise_snippet(data):
+    """Function which decodes a snippet and normalises its indentation, returning its lines (None if not valid UTF-8)"""
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    lines = [line.expandtabs(len(INDENT)).rstrip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    if not lines:
+        return lines
+
+    # Re-indent each line by its level of nesting (the rank of its indentation among the snippet's indentations):
+    widths = [len(line) - len(line.lstrip(" ")) for line in lines]
+    levels = {width: level for level, width in enumerate(sorted(set(widths)))}
+    return [INDENT * levels[width] + line[width:] for line, width in zip(lines, widths)]
+
+
+def read_snippet(index, relative_path, offset, length):
+    """Function which reads and normalises a snippet, re-indexing its file (and returning None) if the file has changed"""
+    path = os.path.join(index.root, relative_path)
+    try:
+        status = os.stat(path)
+        size, modified, _, _ = index.files[relative_path]
+        if status.st_size == size and status.st_mtime_ns == modified:
+            with open(path, mode="rb") as file:
+                file.seek(offset)
+                return normalise_snippet(file.read(length))
+        index.files[relative_path] = index_file(path, status)
+    except OSError:  # File removed since it was indexed.
+        index.files.pop(relative_path, None)
+    index.update()
+    save_code_index(index)
+    return None
+
+
+def save_code_index(index):
+    """Function which saves the snippet index of a source tree (silently skipped if not writable)"""
+    try:
+        os.makedirs(CODE_INDEX_DIRECTORY, exist_ok=True)
+        path = get_index_path(index.root)
+        temporary_path = path + "." + str(os.getpid()) + ".tmp"
+        with open(temporary_path, mode="wb") as file:
+            file.write(INDEX_FILE_HEADER.pack(INDEX_FILE_MAGIC, len(index.files)))
+            for relative_path, (size, modified, offsets, lengths) in sorted(index.files.items()):
+                encoded_path = relative_path.encode("utf-8", errors="surrogateescape")
+                file.write(INDEX_ENTRY_HEADER.pack(len(encoded_path), size, modified, len(offsets)))
+                file.write(encoded_path)
+                offsets.tofile(file)
+                lengths.tofile(file)
+        os.replace(temporary_path, path)
+    except OSError:
+        pass
+
+
+if __name__ == '__main__':
+    # Index a source tree (or this application's own directory), then time loading the index and sampling tests:
+    import sys
+    import time
+
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    code_index = get_code_index(root)
+    print(f"Indexed {len(code_index.files):,} files ({len(code_index.snippets):,} snippets) in "
+          f"{time.perf_counter() - start:.2f} s")
+
+    loaded_indices.clear()
+    start = time.perf_counter()
+    code_index = get_code_index(root)
+    print(f"Loaded and validated the saved index in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(100):
+        test_lines = choose_code_lines(root, rng=rng)
+    print(f"Sampled a test of {len(test_lines)} lines in {(time.perf_counter() - start) * 10:.2f} ms")
+    print("\n".join(test_lines[:MAXIMUM_SNIPPET_LINES]))
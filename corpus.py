@@ -0,0 +1,244 @@
+# Language corpora for the Typing Speed Test application.
+
+# Each corpus is a list of words for a given language, optionally with a frequency weight per word (e.g., as built by
+# 'corpus_builder.py'), in proportion to which words are then chosen for tests.  When a corpus is loaded, every word is normalised
+# (Unicode NFKC, which also folds full-width/half-width forms) and case-folded exactly once, and the folded forms are
+# cached alongside the display forms.  Typed input is folded incrementally (see 'IncrementalMatcher'), so the
+# per-keystroke comparison against the current word costs the same regardless of corpus size.
+
+# Import necessary library(ies):
+import hashlib
+from itertools import accumulate, repeat
+import os
+import unicodedata
+
+# Define constant for the directory which holds additional corpora (one word per line, optionally followed by a tab
+# and its frequency weight, UTF-8, named '<language>.txt'):
+CORPORA_DIRECTORY = "corpora"
+
+# Define constant for the language used when none is specified:
+DEFAULT_LANGUAGE = "english"
+
+# Define dictionary of registered corpus loaders (language -> function returning a list of words):
+corpus_loaders = {}
+
+# Define dictionary of loaded corpora (language -> Corpus), so that each corpus is loaded and folded only once:
+loaded_corpora = {}
+
+
+class Corpus:
+    """Class which holds the words of one language together with their precomputed folded forms"""
+    __slots__ = ("language", "words", "cumulative_weights", "folded", "folded_by_word", "digest")
+
+    def __init__(self, language, words, weights=None):
+        self.language = language
+
+        # Remove empty entries and duplicates (preserving the original order; a duplicate's weight is added to that of
+        # its first occurrence), and keep the cumulative weights (if any) for weighted sampling:
+        weights_by_word = {}
+        for word, weight in zip(words, repeat(0) if weights is None else weights):
+            word = word.strip()
+            if word:
+                weights_by_word[word] = weights_by_word.get(word, 0) + weight
+        self.words = list(weights_by_word)
+        self.cumulative_weights = None if weights is None else list(accumulate(weights_by_word.values()))
+
+        # Fold every word once and cache the result, both positionally and by display form:
+        self.folded = [fold_text(word) for word in self.words]
+        self.folded_by_word = dict(zip(self.words, self.folded))
+
+        # Compute a digest of the word list and weights, if any (identifies the corpus, e.g. for reproducible tests):
+        contents = "\n".join(self.words)
+        if weights is not None:
+            contents += "\n" + ",".join(map(repr, weights_by_word.values()))
+        self.digest = hashlib.sha256(contents.encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self.words)
+
+    def choose_words(self, rng, number_of_words):
+        """Function which chooses words at random (with replacement, in proportion to their weights if the corpus has any)"""
+        return rng.choices(self.words, cum_weights=self.cumulative_weights, k=number_of_words)
+
+    def get_folded(self, word):
+        """Function which returns the cached folded form of a word (folding it on the fly if it is not in the corpus)"""
+        folded = self.folded_by_word.get(word)
+        return fold_text(word) if folded is None else folded
+
+
+class IncrementalMatcher:
+    """Class which folds what the user has typed incrementally and compares it against the (pre-folded) current word"""
+    __slots__ = ("target_folded", "exact", "raw", "stable_length", "stable_folded", "folded")
+
+    def __init__(self, target_folded=""):
+        self.reset(target_folded)
+
+    def is_match(self):
+        """Function which indicates whether the typed text matches the current word"""
+        return self.folded == self.target_folded
+
+    def is_prefix(self):
+        """Function which indicates whether the typed text is (so far) a correct beginning of the current word"""
+        return self.target_folded.startswith(self.folded)
+
+    def reset(self, target_folded, exact=False):
+        """Function which prepares the matcher for a new word (compared as typed, without folding, if exact)"""
+        self.target_folded = target_folded
+        self.exact = exact
+        self.raw = ""
+        self.stable_length = 0
+        self.stable_folded = ""
+        self.folded = ""
+
+    def update(self, typed):
+        """Function which folds newly typed text, re-folding only the characters after the last stable boundary"""
+        # If nothing has changed since the last keystroke, there is nothing to do:
+        if typed == self.raw:
+            return self.folded
+
+        # An exact match (e.g., of a line of code, where case and symbols matter) compares the text as typed:
+        if self.exact:
+            self.raw = self.folded = typed
+            return self.folded
+
+        # If the text up to the last stable boundary is unchanged, its folded form is still valid, provided the
+        # character now after the boundary cannot compose with the one before it (after a backspace, e.g., a combining
+        # mark may be typed right after the boundary).  Otherwise (e.g., an edit in the middle), start over from the
+        # beginning:
+        if not typed.startswith(self.raw[:self.stable_length]) or (
+                len(typed) > self.stable_length and is_non_starter(typed[self.stable_length])):
+            self.stable_length = 0
+            self.stable_folded = ""
+
+        # A boundary is stable when the character after it is not a combining mark or conjoining Hangul vowel/final
+        # (which could still compose with the character before it).  Find the last such boundary in the typed text:
+        boundary = len(typed)
+        while boundary > self.stable_length and is_non_starter(typed[boundary - 1]):
+            boundary -= 1
+        boundary = max(boundary - 1, self.stable_length)
+
+        # Fold the characters between the previous and the new stable boundary, then the (short) unstable tail:
+        self.stable_folded += fold_text(typed[self.stable_length:boundary])
+        self.stable_length = boundary
+        self.folded = self.stable_folded + fold_text(typed[boundary:])
+        self.raw = typed
+
+        # Return the folded form of the typed text:
+        return self.folded
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def available_languages():
+    """Function which lists the languages for which a corpus can be loaded"""
+    languages = set(corpus_loaders)
+    if os.path.isdir(CORPORA_DIRECTORY):
+        languages.update(os.path.splitext(name)[0] for name in os.listdir(CORPORA_DIRECTORY) if name.endswith(".txt"))
+    return sorted(languages)
+
+
+def fold_text(text):
+    """Function which normalises (NFKC, including width folding) and case-folds text"""
+    # Case folding can produce text which is no longer normalised (e.g., 'ǰ'), so normalise again afterwards:
+    return unicodedata.normalize("NFKC", unicodedata.normalize("NFKC", text).casefold())
+
+
+def get_corpus(language=DEFAULT_LANGUAGE):
+    """Function which returns the corpus for a language, loading (and folding) it on first use"""
+    corpus = loaded_corpora.get(language)
+    if corpus is None:
+        corpus = Corpus(language, *load_words(language))
+        loaded_corpora[language] = corpus
+    return corpus
+
+
+def is_non_starter(character):
+    """Function which indicates whether a character may compose with the character before it"""
+    return unicodedata.combining(character) != 0 or "\u1160" <= character <= "\u11ff"
+
+
+def load_english_words():
+    """Function which loads the English word list (contained in 'data.py')"""
+    from data import common_words
+    return common_words
+
+
+def load_words(language):
+    """Function which loads the raw word list for a language, and its weights (None if unweighted), from a registered loader or the corpora directory"""
+    # Use a registered loader, if there is one:
+    if language in corpus_loaders:
+        return corpus_loaders[language](), None
+
+    # Otherwise, read the word list from the corpora directory (weighted only if every word has a weight):
+    words = []
+    weights = []
+    with open(os.path.join(CORPORA_DIRECTORY, language + ".txt"), mode="r", encoding="utf-8") as file:
+        for line in file:
+            if "\t" in line:
+                word, weight = line.split("\t", 1)
+                words.append(word)
+                weights.append(float(weight))
+            else:
+                words.extend(line.split())
+    return words, weights if weights and len(weights) == len(words) else None
+
+
+def register_corpus(language, loader):
+    """Function which registers a loader (returning a list of words) for a language and discards any cached corpus"""
+    corpus_loaders[language] = loader
+    loaded_corpora.pop(language, None)
+
+
+# Register the built-in English corpus:
+register_corpus(DEFAULT_LANGUAGE, load_english_words)
+
+
+if __name__ == '__main__':
+    # Benchmark loading/folding a large synthetic corpus and the per-keystroke comparison cost:
+    import random
+    import string
+    import time
+
+    # Build a synthetic 500k-word corpus (including accented words in decomposed form):
+    rng = random.Random(0)
+    synthetic_words = ["".join(rng.choices(string.ascii_lowercase + "éüñ", k=rng.randint(2, 12))) for _ in range(500000)]
+    synthetic_words = [unicodedata.normalize("NFD", word) for word in synthetic_words]
+    register_corpus("synthetic", lambda: synthetic_words)
+
+    start = time.perf_counter()
+    corpus = get_corpus("synthetic")
+    print(f"Loaded and folded {len(corpus):,} words in {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    assert get_corpus("synthetic") is corpus
+    print(f"Cached lookup in {(time.perf_counter() - start) * 1e6:.1f} us")
+
+    # Simulate typing each of a sample of words (in composed form) one keystroke at a time:
+    matcher = IncrementalMatcher()
+    keystrokes = 0
+    start = time.perf_counter()
+    for word, folded in zip(corpus.words[:50000], corpus.folded[:50000]):
+        matcher.reset(folded)
+        typed = unicodedata.normalize("NFC", word)
+        for i in range(1, len(typed) + 1):
+            matcher.update(typed[:i])
+            keystrokes += 1
+        assert matcher.is_match()
+    elapsed = time.perf_counter() - start
+    print(f"{keystrokes:,} keystrokes compared in {elapsed:.2f} s ({elapsed / keystrokes * 1e6:.2f} us/keystroke)")
+
+    # Check that the incremental folding always equals folding the whole text, through random edits (appends of base
+    # letters, combining marks and Hangul jamo, and backspaces):
+    characters = "aceoun" + "\u0301\u0308\u0303" + "\u1100\u1161\u11a8" + "\ufb01"
+    matcher = IncrementalMatcher()
+    mismatches = 0
+    for _ in range(20000):
+        matcher.reset("")
+        typed = ""
+        for _ in range(rng.randint(1, 20)):
+            if typed and rng.random() < 0.3:
+                typed = typed[:-1]
+            else:
+                typed += rng.choice(characters)
+            mismatches += matcher.update(typed) != fold_text(typed)
+    print(f"Incremental folding after random edits: {mismatches} mismatch(es) with folding the whole text")
+    assert not mismatches
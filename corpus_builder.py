@@ -0,0 +1,222 @@
+# Corpus builder for the Typing Speed Test application.
+
+# Derives a word list (with frequency weights) for a language from a local collection of text files, e.g. books or
+# articles, instead of a hand-pasted list such as 'data.py'.  The files are split into chunks of about CHUNK_SIZE bytes
+# (at line breaks), and the chunks are dealt out to a pool of processes (largest first, each to the least-loaded
+# process) which tokenise them and count word frequencies (map); each process returns one table of counts, and the
+# tables are summed (reduce).  Only the chunk being tokenised is held in memory by each process, and the processes
+# share no state, so the build scales with the number of cores on multi-GB collections.
+
+# Words are normalised as typed input is (see 'fold_text' in 'corpus.py': Unicode NFKC and case folding), so each
+# word appears once whatever its case or form.  The most frequent words are written to the corpora directory, ranked
+# by frequency, one per line with their count ('word<TAB>count'); the application then loads them as the corpus of
+# that language, and chooses words for tests in proportion to their counts.
+
+# Usage examples:
+#   python corpus_builder.py ~/texts/english --language english-books --size 5000
+#   python corpus_builder.py ~/texts/german --language german --min-length 3 --workers 8
+#   python corpus_builder.py --benchmark 200
+
+# Import necessary library(ies):
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import heapq
+import os
+import re
+import time
+
+from corpus import CORPORA_DIRECTORY, fold_text
+
+# Define constant for the approximate size (in bytes) of the chunks into which text files are split:
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# Define constant for the pattern of a word (letters, possibly joined by apostrophes, e.g. "don't"):
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+
+# Define constants for the default size of the corpus, the minimum count of a word, and the lengths of words kept:
+DEFAULT_CORPUS_SIZE = 1000
+DEFAULT_MINIMUM_COUNT = 2
+DEFAULT_MINIMUM_LENGTH = 1
+DEFAULT_MAXIMUM_LENGTH = 20
+
+# Define constant for the extensions of the files read from the source directory:
+DEFAULT_EXTENSIONS = (".txt",)
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def assign_chunks(chunks, workers):
+    """Function which deals chunks out to the given no. of workers (largest first, each to the least-loaded worker)"""
+    loads = [(0, worker) for worker in range(workers)]
+    assignments = [[] for _ in range(workers)]
+    for chunk in sorted(chunks, key=lambda chunk: chunk[2] - chunk[1], reverse=True):
+        load, worker = heapq.heappop(loads)
+        assignments[worker].append(chunk)
+        heapq.heappush(loads, (load + chunk[2] - chunk[1], worker))
+    return [assignment for assignment in assignments if assignment]
+
+
+def build_corpus(source_directory, workers=None, extensions=DEFAULT_EXTENSIONS, minimum_length=DEFAULT_MINIMUM_LENGTH,
+                 maximum_length=DEFAULT_MAXIMUM_LENGTH, chunk_size=CHUNK_SIZE):
+    """Function which counts the (normalised) words in the text files under a directory, in a pool of processes"""
+    workers = workers or os.cpu_count() or 1
+    assignments = assign_chunks(list_chunks(source_directory, extensions, chunk_size), workers)
+
+    # Count the words of each worker's chunks in parallel (map), and sum the counts (reduce):
+    if len(assignments) <= 1:
+        return count_words_in_chunks(assignments[0] if assignments else [], minimum_length, maximum_length)
+    counts = Counter()
+    with ProcessPoolExecutor(max_workers=len(assignments)) as executor:
+        for worker_counts in executor.map(count_words_in_chunks, assignments, [minimum_length] * len(assignments),
+                                          [maximum_length] * len(assignments)):
+            if counts:
+                counts.update(worker_counts)
+            else:
+                counts = worker_counts
+    return counts
+
+
+def count_words_in_chunks(chunks, minimum_length=DEFAULT_MINIMUM_LENGTH, maximum_length=DEFAULT_MAXIMUM_LENGTH):
+    """Function which counts the (normalised) words of the lengths given in a list of chunks (path, start, end) of text files"""
+    counts = Counter()
+    for path, start, end in chunks:
+        text = fold_text(read_chunk(path, start, end).decode("utf-8", errors="replace").replace("’", "'"))
+
+        # Count the whitespace-separated tokens first (e.g. 'cat', 'cat,' and '(cat'), then extract the words of each
+        # distinct token only once (most tokens are repeats, so this is much faster than matching the whole text):
+        for token, count in Counter(text.split()).items():
+            for word in WORD_PATTERN.findall(token):
+                counts[word] += count
+
+    # Drop words which are too short or too long:
+    for word in [word for word in counts if not minimum_length <= len(word) <= maximum_length]:
+        del counts[word]
+    return counts
+
+
+def list_chunks(source_directory, extensions=DEFAULT_EXTENSIONS, chunk_size=CHUNK_SIZE):
+    """Generator which yields the chunks (path, start, end) of the text files under a directory"""
+    for directory, subdirectories, file_names in os.walk(source_directory):
+        subdirectories.sort()
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(extensions):
+                path = os.path.join(directory, file_name)
+                size = os.path.getsize(path)
+                for start in range(0, size, chunk_size):
+                    yield path, start, min(start + chunk_size, size)
+
+
+def rank_words(counts, size=DEFAULT_CORPUS_SIZE, minimum_count=DEFAULT_MINIMUM_COUNT):
+    """Function which returns the given no. of most frequent words (word, count), most frequent first (ties alphabetical)"""
+    return heapq.nsmallest(size, ((word, count) for word, count in counts.items() if count >= minimum_count),
+                           key=lambda entry: (-entry[1], entry[0]))
+
+
+def read_chunk(path, start, end):
+    """Function which reads the lines of a text file starting within the given byte range (so each line is read by exactly one chunk)"""
+    with open(path, mode="rb") as file:
+        # Skip the line which started before the range (it belongs to the previous chunk):
+        if start:
+            file.seek(start - 1)
+            file.readline()
+        position = file.tell()
+        if position >= end:
+            return b""
+
+        # Read up to the end of the range, then to the end of the line which straddles it:
+        data = file.read(end - position)
+        if not data.endswith(b"\n"):
+            data += file.readline()
+        return data
+
+
+def run_builder():
+    """Main function used to build a corpus from the command line"""
+    parser = argparse.ArgumentParser(description="Build a word list with frequency weights from a directory of text "
+                                                 "files.")
+    parser.add_argument("source", nargs="?", help="directory of text files to read (searched recursively)")
+    parser.add_argument("--language", help="name of the corpus (written to the corpora directory as <language>.txt)")
+    parser.add_argument("--output", help="path of the corpus file to write (instead of the corpora directory)")
+    parser.add_argument("--size", type=int, default=DEFAULT_CORPUS_SIZE, help="number of words in the corpus")
+    parser.add_argument("--min-count", type=int, default=DEFAULT_MINIMUM_COUNT, help="minimum count of a word")
+    parser.add_argument("--min-length", type=int, default=DEFAULT_MINIMUM_LENGTH, help="minimum length of a word")
+    parser.add_argument("--max-length", type=int, default=DEFAULT_MAXIMUM_LENGTH, help="maximum length of a word")
+    parser.add_argument("--extensions", default=",".join(DEFAULT_EXTENSIONS),
+                        help="comma-separated extensions of the files to read")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: one per core)")
+    parser.add_argument("--benchmark", type=int, metavar="MEGABYTES",
+                        help="time the build of a synthetic collection of this size with 1, 2, 4, ... workers")
+    arguments = parser.parse_args()
+
+    if arguments.benchmark:
+        run_benchmark(arguments.benchmark, arguments.workers or os.cpu_count() or 1)
+        return
+    if not arguments.source or not (arguments.language or arguments.output):
+        parser.error("a source directory and --language (or --output) are required")
+
+    # Count the words of the collection, then write the most frequent ones:
+    start = time.perf_counter()
+    counts = build_corpus(arguments.source, arguments.workers, tuple(arguments.extensions.lower().split(",")),
+                          arguments.min_length, arguments.max_length)
+    ranked_words = rank_words(counts, arguments.size, arguments.min_count)
+    output_path = arguments.output or os.path.join(CORPORA_DIRECTORY, arguments.language + ".txt")
+    write_corpus(output_path, ranked_words)
+    print(f"Counted {sum(counts.values()):,} words ({len(counts):,} distinct) in {time.perf_counter() - start:.1f} s; "
+          f"wrote the {len(ranked_words):,} most frequent to {output_path}")
+
+
+def run_benchmark(megabytes, maximum_workers):
+    """Function which times building a corpus from a synthetic collection of text files with 1, 2, 4, ... workers"""
+    import random
+    import shutil
+    import tempfile
+
+    from corpus import get_corpus
+
+    # Write the collection: lines of words drawn from the built-in corpus with Zipf-like frequencies:
+    directory = tempfile.mkdtemp()
+    try:
+        rng = random.Random(0)
+        words = get_corpus().words
+        weights = [1 / rank for rank in range(1, len(words) + 1)]
+        file_size = 64 * 1024 * 1024
+        for number in range(-(-megabytes * 1024 * 1024 // file_size)):
+            with open(os.path.join(directory, f"text{number:03d}.txt"), mode="w", encoding="utf-8") as file:
+                written = 0
+                target = min(file_size, megabytes * 1024 * 1024 - number * file_size)
+                while written < target:
+                    line = " ".join(rng.choices(words, weights, k=12)).capitalize() + ".\n"
+                    file.write(line * 64)
+                    written += len(line) * 64
+        print(f"Wrote a synthetic collection of {megabytes:,} MB")
+
+        # Build it with increasing numbers of workers:
+        baseline = None
+        workers = 1
+        while True:
+            start = time.perf_counter()
+            counts = build_corpus(directory, workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>3} worker(s): {elapsed:6.2f} s ({megabytes / elapsed:6.1f} MB/s, speed-up "
+                  f"{baseline / elapsed:4.1f}x); {len(counts):,} distinct words")
+            if workers >= maximum_workers:
+                break
+            workers = min(workers * 2, maximum_workers)
+    finally:
+        shutil.rmtree(directory)
+
+
+def write_corpus(output_path, ranked_words):
+    """Function which writes a ranked corpus (one 'word<TAB>count' line per word) atomically"""
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = output_path + "." + str(os.getpid()) + ".tmp"
+    with open(temporary_path, mode="w", encoding="utf-8") as file:
+        file.writelines(f"{word}\t{count}\n" for word, count in ranked_words)
+    os.replace(temporary_path, output_path)
+
+
+if __name__ == '__main__':
+    run_builder()
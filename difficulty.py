@@ -0,0 +1,199 @@
+# Difficulty-banded word index for the Typing Speed Test application.
+
+# Every word of a corpus is scored once for how hard it is to type: its length, rare letters, same-finger sequences
+# (two keys in a row typed by the same finger) and lack of hand alternation.  The words are then split by score into
+# difficulty bands of equal size (easy, medium, hard), each held as an array of word positions in the corpus, so a test
+# with a given mix of difficulties is sampled in O(K) for K words, however large the corpus.  The index is saved next
+# to the corpora (see 'corpus.py') and reused while the corpus is unchanged, so it is only computed once.
+
+# Import necessary library(ies):
+from array import array
+import os
+import struct
+
+import corpus as corpus_module
+from keyboard_model import FINGER_OF_KEY, LEFT_HAND_KEYS
+
+# Define constants for the difficulty bands (easiest first) and the default mix of bands in a graded test:
+BAND_NAMES = ("easy", "medium", "hard")
+DEFAULT_DIFFICULTY_MIX = (0.5, 0.3, 0.2)
+
+# Define constants for the scoring of words (weight of each rare letter, and of each difficulty feature):
+RARE_LETTER_WEIGHTS = {"z": 3.0, "q": 3.0, "x": 3.0, "j": 3.0, "k": 1.5, "v": 1.5, "b": 1.0, "p": 1.0, "y": 1.0,
+                       "g": 1.0, "f": 0.5, "w": 0.5, "m": 0.5}
+NON_ASCII_LETTER_WEIGHT = 2.0
+LENGTH_WEIGHT = 1.0
+SAME_FINGER_WEIGHT = 2.0
+SAME_HAND_WEIGHT = 3.0  # Applied to the share of bigrams typed with one hand (0 = fully alternating, 1 = one hand).
+
+# Define constants for the index file saved with the corpora (extension and header layout):
+INDEX_FILE_EXTENSION = ".bands"
+INDEX_FILE_HEADER = struct.Struct("<8s32sII")  # Magic, digest of the corpus, no. of words, no. of bands
+INDEX_FILE_MAGIC = b"BANDS001"
+
+# Define dictionary of loaded indices ((language, corpus digest) -> DifficultyIndex):
+loaded_indices = {}
+
+
+class DifficultyIndex:
+    """Class which holds the difficulty score of every word of a corpus and the word positions in each difficulty band"""
+    __slots__ = ("digest", "scores", "bands")
+
+    def __init__(self, digest, scores, bands):
+        self.digest = digest
+        self.scores = scores
+        self.bands = bands
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def build_difficulty_index(corpus):
+    """Function which scores every word of a corpus and splits the words into difficulty bands of equal size"""
+    scores = array("f", map(score_word, corpus.folded))
+
+    # Rank the words by score and split the ranking into bands:
+    ranking = sorted(range(len(scores)), key=scores.__getitem__)
+    band_size = -(-len(ranking) // len(BAND_NAMES)) if ranking else 0
+    bands = [array("I", sorted(ranking[band * band_size:(band + 1) * band_size])) for band in range(len(BAND_NAMES))]
+    return DifficultyIndex(corpus.digest, scores, bands)
+
+
+def choose_graded_words(corpus, rng, number_of_words, mix=DEFAULT_DIFFICULTY_MIX):
+    """Function which chooses words at random with the given mix (share of each band, easiest first) of difficulties"""
+    index = get_difficulty_index(corpus)
+
+    # Divide the words between the (non-empty) bands in proportion to the mix, by largest remainder:
+    shares = [share if band else 0.0 for share, band in zip(mix, index.bands)]
+    total_share = sum(shares)
+    if total_share <= 0:
+        raise ValueError("The difficulty mix selects no words.")
+    quotas = [number_of_words * share / total_share for share in shares]
+    counts = [int(quota) for quota in quotas]
+    for band in sorted(range(len(quotas)), key=lambda band: counts[band] - quotas[band])[:number_of_words - sum(counts)]:
+        counts[band] += 1
+
+    # Sample each band, then shuffle so that the difficulties are interleaved:
+    words = corpus.words
+    chosen = []
+    for band, count in zip(index.bands, counts):
+        if count:
+            chosen.extend(words[position] for position in rng.choices(band, k=count))
+    rng.shuffle(chosen)
+    return chosen
+
+
+def get_difficulty_index(corpus):
+    """Function which returns the difficulty index of a corpus (loaded from the saved index, or built and saved, once)"""
+    key = (corpus.language, corpus.digest)
+    index = loaded_indices.get(key)
+    if index is None:
+        index = load_difficulty_index(corpus)
+        if index is None:
+            index = build_difficulty_index(corpus)
+            save_difficulty_index(corpus, index)
+        loaded_indices[key] = index
+    return index
+
+
+def get_index_path(language):
+    """Function which returns the path of the saved difficulty index of a language"""
+    return os.path.join(corpus_module.CORPORA_DIRECTORY, language + INDEX_FILE_EXTENSION)
+
+
+def load_difficulty_index(corpus):
+    """Function which loads the saved difficulty index of a corpus (None if missing or out of date)"""
+    try:
+        with open(get_index_path(corpus.language), mode="rb") as file:
+            magic, digest, word_count, band_count = INDEX_FILE_HEADER.unpack(file.read(INDEX_FILE_HEADER.size))
+            if (magic != INDEX_FILE_MAGIC or digest.hex() != corpus.digest or word_count != len(corpus)
+                    or band_count != len(BAND_NAMES)):
+                return None
+            band_sizes = array("I")
+            band_sizes.fromfile(file, band_count)
+            bands = []
+            for band_size in band_sizes:
+                band = array("I")
+                band.fromfile(file, band_size)
+                bands.append(band)
+            scores = array("f")
+            scores.fromfile(file, word_count)
+            return DifficultyIndex(corpus.digest, scores, bands)
+    except (OSError, struct.error, EOFError):
+        return None
+
+
+def save_difficulty_index(corpus, index):
+    """Function which saves the difficulty index of a corpus with the corpora (silently skipped if not writable)"""
+    try:
+        os.makedirs(corpus_module.CORPORA_DIRECTORY, exist_ok=True)
+        with open(get_index_path(corpus.language), mode="wb") as file:
+            file.write(INDEX_FILE_HEADER.pack(INDEX_FILE_MAGIC, bytes.fromhex(index.digest), len(index.scores),
+                                              len(index.bands)))
+            array("I", (len(band) for band in index.bands)).tofile(file)
+            for band in index.bands:
+                band.tofile(file)
+            index.scores.tofile(file)
+    except OSError:
+        pass
+
+
+def score_word(word):
+    """Function which scores how hard a (folded) word is to type (higher = harder)"""
+    score = LENGTH_WEIGHT * len(word)
+
+    # Add the weight of each rare (or non-ASCII) letter:
+    for character in word:
+        score += RARE_LETTER_WEIGHTS.get(character, NON_ASCII_LETTER_WEIGHT if not character.isascii() else 0.0)
+
+    # Add the weight of same-finger bigrams and of the share of bigrams typed with one hand:
+    bigrams = 0
+    same_hand_bigrams = 0
+    for previous, key in zip(word, word[1:]):
+        finger = FINGER_OF_KEY.get(key)
+        if finger is None or FINGER_OF_KEY.get(previous) is None:
+            continue
+        bigrams += 1
+        if finger == FINGER_OF_KEY[previous] and key != previous:
+            score += SAME_FINGER_WEIGHT
+        if (key in LEFT_HAND_KEYS) == (previous in LEFT_HAND_KEYS):
+            same_hand_bigrams += 1
+    if bigrams:
+        score += SAME_HAND_WEIGHT * same_hand_bigrams / bigrams
+
+    # Return the score:
+    return score
+
+
+if __name__ == '__main__':
+    # Benchmark building, saving and loading the index of a large synthetic corpus, and sampling graded tests from it:
+    import random
+    import string
+    import tempfile
+    import time
+
+    rng = random.Random(0)
+    synthetic_words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 12))) for _ in range(500000)]
+    corpus_module.register_corpus("synthetic", lambda: synthetic_words)
+    corpus_module.CORPORA_DIRECTORY = tempfile.mkdtemp()
+    corpus = corpus_module.get_corpus("synthetic")
+
+    start = time.perf_counter()
+    index = get_difficulty_index(corpus)
+    print(f"Scored and banded {len(corpus):,} words (and saved the index) in {time.perf_counter() - start:.2f} s")
+
+    loaded_indices.clear()
+    start = time.perf_counter()
+    loaded_index = get_difficulty_index(corpus)
+    print(f"Loaded the saved index in {(time.perf_counter() - start) * 1000:.1f} ms")
+    assert loaded_index.bands == index.bands and loaded_index.scores == index.scores
+
+    for number_of_words in (100, 1000, 10000):
+        start = time.perf_counter()
+        for _ in range(100):
+            choose_graded_words(corpus, rng, number_of_words)
+        print(f"Sampled {number_of_words:>5} graded words in {(time.perf_counter() - start) * 10:.3f} ms")
+
+    # Show the bands of the English corpus:
+    english = corpus_module.get_corpus()
+    english_index = build_difficulty_index(english)
+    for name, band in zip(BAND_NAMES, english_index.bands):
+        print(f"{name:>6}: " + ", ".join(english.words[position] for position in band[:8]) + ", ...")
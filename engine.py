@@ -0,0 +1,43 @@
+# Test rules and high-score storage shared by the front-ends of the Typing Speed Test application
+# (the Tk application in 'main.py' and the terminal application in 'terminal_app.py').
+
+# Methods of calculating key metrics:
+# Characters per minute (CPM): Total the # of characters for each word successfully typed during the test.
+# Words per minute (WPM): Divide the CPM by 5 (de facto international standard)
+
+# Import necessary library(ies):
+import os
+
+# Define constant to store number of words to select at random (from the corpus of the selected language) for the current exercise:
+NUMBER_OF_WORDS_TO_SELECT = 900
+
+# Define constant for setting the length of each test (in seconds):
+LENGTH_OF_TEST = 60.0
+
+# Define constant for the file in which the high score (CPM) is archived:
+HIGH_SCORE_FILE_PATH = "high_score.txt"
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def calculate_wpm(cpm):
+    """Function which calculates the WPM corresponding to a CPM"""
+    return int(round(cpm / 5, 0))
+
+
+def read_high_score():
+    """Function which retrieves the high score (CPM) to-date (0 if none has been archived yet)"""
+    try:
+        with open(HIGH_SCORE_FILE_PATH, mode="r") as file:
+            return int(file.read())
+    except FileNotFoundError:  # Archive file not found.
+        return 0
+
+
+def write_high_score(new_high_score_cpm):
+    """Function which archives a new high score (CPM)"""
+    # Write to a temporary file and then replace the archive file, so that other instances never read a partly
+    # written high score:
+    temporary_path = HIGH_SCORE_FILE_PATH + "." + str(os.getpid()) + ".tmp"
+    with open(temporary_path, mode="w") as file:
+        file.write(str(new_high_score_cpm))
+    os.replace(temporary_path, HIGH_SCORE_FILE_PATH)
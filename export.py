@@ -0,0 +1,116 @@
+# Columnar export of the test history for the Typing Speed Test application.
+
+# Streams recorded results (see 'history.py') to a Parquet or Arrow IPC file in fixed-size record batches, so memory
+# use stays constant however large the history is.  With '--incremental', only results recorded since the previous
+# incremental export (of the same name) are written, so nightly jobs only touch new rows.
+# (NOTE: Requires the 'pyarrow' package.)
+
+# Usage examples:
+#   python export.py results.parquet
+#   python export.py results.arrow --format arrow --user alice --mode words
+#   python export.py nightly.parquet --incremental nightly
+
+# Import necessary library(ies):
+import argparse
+import os
+
+import history
+
+# Define constant for the number of results written per record batch:
+DEFAULT_BATCH_SIZE = 65536
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def build_record_batch(pa, schema, rows):
+    """Function which converts a batch of history rows into an Arrow record batch"""
+    columns = list(zip(*rows))
+    columns[-2] = [bool(suspect) for suspect in columns[-2]]
+    columns[-1] = [history.decode_speed_samples(blob).tolist() for blob in columns[-1]]
+    return pa.RecordBatch.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                                      schema=schema)
+
+
+def build_schema(pa):
+    """Function which returns the Arrow schema of an exported result"""
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user", pa.string()),
+        ("mode", pa.string()),
+        ("finished_at", pa.timestamp("us", tz="UTC")),
+        ("duration", pa.float64()),
+        ("cpm", pa.int32()),
+        ("wpm", pa.int32()),
+        ("accuracy", pa.float64()),
+        ("suspect", pa.bool_()),
+        ("speed_samples", pa.list_(pa.uint32())),
+    ])
+
+
+def export_results(output_path, file_format="parquet", database_path=history.HISTORY_DATABASE_PATH,
+                   incremental_name=None, user=None, mode=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Function which exports (filtered, and optionally only new) results and returns the number of rows written"""
+    import pyarrow as pa
+
+    connection = history.connect(database_path)
+    try:
+        # For an incremental export, start after the last result included in the previous export:
+        since_id = history.get_export_state(connection, incremental_name) if incremental_name else 0
+
+        # Write the results one record batch at a time:
+        schema = build_schema(pa)
+        writer = open_writer(pa, output_path, file_format, schema)
+        rows_written = 0
+        last_id = since_id
+        try:
+            for rows in history.iterate_result_batches(connection, since_id, user, mode, batch_size):
+                # Timestamps are stored as seconds since the epoch; Arrow expects microseconds:
+                rows = [row[:3] + (int(row[3] * 1000000),) + row[4:] for row in rows]
+                writer.write_batch(build_record_batch(pa, schema, rows))
+                rows_written += len(rows)
+                last_id = rows[-1][0]
+        finally:
+            writer.close()
+
+        # Remember where this incremental export ended (only once the file has been written successfully):
+        if incremental_name:
+            history.set_export_state(connection, incremental_name, last_id)
+
+        # Return the number of rows written:
+        return rows_written
+
+    finally:
+        connection.close()
+
+
+def open_writer(pa, output_path, file_format, schema):
+    """Function which opens a Parquet or Arrow IPC writer for the given schema"""
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(output_path, schema)
+    if file_format == "arrow":
+        return pa.ipc.new_file(output_path, schema)
+    raise ValueError(f"Unsupported export format: {file_format}")
+
+
+def run_export():
+    """Main function used to run the export from the command line"""
+    parser = argparse.ArgumentParser(description="Export typing-test results to Parquet or Arrow IPC.")
+    parser.add_argument("output", help="path of the file to write")
+    parser.add_argument("--format", choices=("parquet", "arrow"), help="file format (default: from the file extension)")
+    parser.add_argument("--database", default=history.HISTORY_DATABASE_PATH, help="path of the history database")
+    parser.add_argument("--incremental", metavar="NAME", help="only export results recorded since the last export of this name")
+    parser.add_argument("--user", help="only export results of this user")
+    parser.add_argument("--mode", help="only export results of this test mode")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="number of rows per record batch")
+    arguments = parser.parse_args()
+
+    # Determine the file format from the file extension, if not given:
+    file_format = arguments.format or ("arrow" if os.path.splitext(arguments.output)[1] in (".arrow", ".feather", ".ipc") else "parquet")
+
+    rows_written = export_results(arguments.output, file_format, arguments.database, arguments.incremental,
+                                  arguments.user, arguments.mode, arguments.batch_size)
+    print(f"Exported {rows_written} result(s) to {arguments.output}")
+
+
+if __name__ == '__main__':
+    run_export()
@@ -0,0 +1,246 @@
+# End-to-end GUI latency harness for the Typing Speed Test application.
+
+# Engine benchmarks time the code behind the window, not what the user feels: the time from a key press in the entry
+# widget ('txt_word_typed') until its effect is on screen.  This harness runs the real application (e.g. 'main.py', or
+# any other application script with the same widgets and session) under a virtual X server (Xvfb, started if no
+# display is set), loads itself into it as a plugin (see 'hooks.py'), starts a test and injects key presses with
+# 'event_generate', typing the test's own words.  For each key press it timestamps:
+#   echo    - the key press until the typed character has been drawn in the entry widget,
+#   advance - the key press which completes a word (Return, for a line of code) until the highlight has moved to the
+#             next word in the 'words to type' widget ('txt_words_to_type') and been drawn.
+# Tk has no "painted" callback, so a change counts as drawn when the first idle callback scheduled after it runs: Tk
+# redraws a widget in an idle handler queued when the widget changes, so that handler runs first.  Changes are polled
+# from the application's own event processing, so the latency includes any wait for the application's event loop
+# (e.g. the 10 ms ticks of 'run_test').  Key presses are injected one at a time (the next one a fixed interval after
+# the previous one has been drawn), and the distributions of both latencies are reported per application.
+
+# Usage examples (Xvfb must be installed unless a display is already available):
+#   python gui_latency.py
+#   python gui_latency.py --keystrokes 1000 --interval 80
+#   python gui_latency.py --app main.py --app main_new_engine.py
+
+# Import necessary library(ies):
+from array import array
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from simulator import get_keysym
+
+# Define constants for the environment variables through which the harness configures the plugin in the application:
+OUTPUT_ENVIRONMENT_VARIABLE = "GUI_LATENCY_OUTPUT"
+KEYSTROKES_ENVIRONMENT_VARIABLE = "GUI_LATENCY_KEYSTROKES"
+INTERVAL_ENVIRONMENT_VARIABLE = "GUI_LATENCY_INTERVAL"
+
+# Define constants for the default no. of key presses injected and the interval (in milliseconds) between them:
+DEFAULT_KEYSTROKES = 500
+DEFAULT_INTERVAL = 100
+
+# Define constants for the wait (in milliseconds) before the test is started, and for a change to appear:
+STARTUP_DELAY = 1000
+CHANGE_TIMEOUT = 2000
+
+# Define constants for the virtual X server (display, screen) and the time (in seconds) allowed for it to start:
+XVFB_DISPLAY = ":99"
+XVFB_SCREEN = "1024x768x24"
+XVFB_STARTUP_TIMEOUT = 10.0
+
+# Define constant for the time (in seconds) allowed for a run of the application:
+RUN_TIMEOUT = 600.0
+
+# Define constant for the percentiles reported:
+REPORTED_PERCENTILES = (50, 90, 99)
+
+
+class LatencyProbe:
+    """Class which injects key presses into the running application and measures the latency of their visible effects"""
+    __slots__ = ("app", "keystrokes", "interval", "output_path", "echo_latencies", "advance_latencies", "timeouts",
+                 "injected", "key_time", "expect_advance", "previous_text", "previous_highlight")
+
+    def __init__(self, app, keystrokes, interval, output_path):
+        self.app = app
+        self.keystrokes = keystrokes
+        self.interval = interval
+        self.output_path = output_path
+        self.echo_latencies = array("d")
+        self.advance_latencies = array("d")
+        self.timeouts = 0
+        self.injected = 0
+        self.key_time = 0.0
+        self.expect_advance = False
+        self.previous_text = ""
+        self.previous_highlight = ()
+
+    def check_change(self):
+        """Function which checks (from the application's event processing) whether the effect of the last key press has happened"""
+        app = self.app
+        if self.expect_advance:
+            changed = app.txt_words_to_type.tag_ranges("start") != self.previous_highlight
+        else:
+            changed = app.txt_word_typed.get() != self.previous_text
+        if changed:
+            app.window.after_idle(self.record_drawn)
+        elif (time.perf_counter() - self.key_time) * 1000 > CHANGE_TIMEOUT:
+            self.timeouts += 1
+            app.window.after(self.interval, self.inject_next_key)
+        else:
+            app.window.after(1, self.check_change)
+
+    def finish(self):
+        """Function which saves the measured latencies and exits the application (without ending, and so recording, the test)"""
+        with open(self.output_path, mode="w", encoding="utf-8") as file:
+            json.dump({"app": os.path.basename(sys.argv[0]), "mode": self.app.TEST_MODE,
+                       "echo": self.echo_latencies.tolist(), "advance": self.advance_latencies.tolist(),
+                       "timeouts": self.timeouts}, file)
+        os._exit(0)
+
+    def inject_next_key(self):
+        """Function which injects the next key press of the current word (or Return, to submit a line of code)"""
+        app = self.app
+        if self.injected >= self.keystrokes or not app.test_in_progress or not app.session.has_words_remaining():
+            self.finish()
+            return
+
+        # Type the next character of the current word (the application clears the entry once the word is complete):
+        word = app.session.get_current_word()
+        typed = app.txt_word_typed.get()
+        if not word.startswith(typed):
+            key = "\b"  # (NOTE: Only if the application has changed the text unexpectedly.)
+        elif len(typed) < len(word):
+            key = word[len(typed)]
+        elif app.TEST_MODE == "code":
+            key = "\n"
+        else:  # Complete, but not yet cleared: wait for the application.
+            app.window.after(1, self.inject_next_key)
+            return
+        self.expect_advance = key == "\n" or (app.TEST_MODE != "code" and key != "\b" and len(typed) + 1 == len(word))
+        self.previous_text = typed
+        self.previous_highlight = app.txt_words_to_type.tag_ranges("start")
+
+        # Inject the key press, as if typed on the keyboard, and wait for its effect:
+        self.injected += 1
+        self.key_time = time.perf_counter()
+        app.txt_word_typed.event_generate("<KeyPress>", keysym=get_keysym(key), when="tail")
+        app.window.after(0, self.check_change)
+
+    def record_drawn(self):
+        """Function which records the latency of the last key press once its effect has been drawn, and schedules the next key press"""
+        latency = (time.perf_counter() - self.key_time) * 1000
+        (self.advance_latencies if self.expect_advance else self.echo_latencies).append(latency)
+        self.app.window.after(self.interval, self.inject_next_key)
+
+    def start(self):
+        """Function which starts a test (whose loop then processes the application's events) and the first key press"""
+        # (NOTE: Generated key presses go to the widget with the keyboard focus; without a window manager, the
+        # application window does not get the focus unless forced.)
+        self.app.txt_word_typed.focus_force()
+        self.app.window.after(self.interval, self.inject_next_key)
+        self.app.button_test.invoke()
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def format_distribution(name, latencies):
+    """Function which formats the distribution (count, mean and percentiles, in milliseconds) of a list of latencies"""
+    if not latencies:
+        return f"  {name:<8} no samples"
+    latencies = sorted(latencies)
+    percentiles = "  ".join(f"p{percentile} {latencies[min(len(latencies) - 1, len(latencies) * percentile // 100)]:6.1f}"
+                            for percentile in REPORTED_PERCENTILES)
+    return (f"  {name:<8} n={len(latencies):<5} mean {statistics.fmean(latencies):6.1f}  {percentiles}  "
+            f"max {latencies[-1]:6.1f} ms")
+
+
+def register(hooks):
+    """Function which (as a plugin loaded into the application by the harness) schedules the measured test"""
+    output_path = os.environ.get(OUTPUT_ENVIRONMENT_VARIABLE)
+    if not output_path:
+        return
+    probe = LatencyProbe(sys.modules["__main__"], int(os.environ.get(KEYSTROKES_ENVIRONMENT_VARIABLE, DEFAULT_KEYSTROKES)),
+                         int(os.environ.get(INTERVAL_ENVIRONMENT_VARIABLE, DEFAULT_INTERVAL)), output_path)
+    probe.app.window.after(STARTUP_DELAY, probe.start)
+
+
+def run_app_measured(app_path, keystrokes, interval, environment):
+    """Function which runs an application with the latency probe loaded, and returns the latencies it measured"""
+    output_path = os.path.join(tempfile.mkdtemp(), "latencies.json")
+    harness_directory = os.path.dirname(os.path.abspath(__file__))
+    environment = dict(environment, PYTHONPATH=os.pathsep.join(filter(None, (harness_directory,
+                                                                             environment.get("PYTHONPATH")))))
+    environment["TYPING_TEST_PLUGINS"] = ",".join(filter(None, (environment.get("TYPING_TEST_PLUGINS"), "gui_latency")))
+    environment[OUTPUT_ENVIRONMENT_VARIABLE] = output_path
+    environment[KEYSTROKES_ENVIRONMENT_VARIABLE] = str(keystrokes)
+    environment[INTERVAL_ENVIRONMENT_VARIABLE] = str(interval)
+    try:
+        subprocess.run([sys.executable, os.path.abspath(app_path)], cwd=os.path.dirname(os.path.abspath(app_path)),
+                       env=environment, timeout=RUN_TIMEOUT, check=False)
+    except subprocess.TimeoutExpired:  # (The application has been killed, without saving any latencies.)
+        pass
+    try:
+        with open(output_path, mode="r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def run_harness():
+    """Main function used to run the latency harness from the command line"""
+    parser = argparse.ArgumentParser(description="Measure key-to-paint latency of the application under a virtual X "
+                                                 "server.")
+    parser.add_argument("--app", action="append", help="application script to measure (may be repeated; default: "
+                                                       "main.py)")
+    parser.add_argument("--keystrokes", type=int, default=DEFAULT_KEYSTROKES, help="number of key presses to inject")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL,
+                        help="interval (in milliseconds) between a key press being drawn and the next key press")
+    parser.add_argument("--display", help="X display to use (default: $DISPLAY, or a new Xvfb server)")
+    arguments = parser.parse_args()
+
+    # Use the given (or current) display, or start a virtual X server:
+    environment = dict(os.environ)
+    xvfb = None
+    if arguments.display:
+        environment["DISPLAY"] = arguments.display
+    elif not environment.get("DISPLAY"):
+        xvfb = start_xvfb(XVFB_DISPLAY)
+        environment["DISPLAY"] = XVFB_DISPLAY
+
+    # Measure each application in turn:
+    try:
+        for app_path in arguments.app or [os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")]:
+            results = run_app_measured(app_path, arguments.keystrokes, arguments.interval, environment)
+            if results is None:
+                print(f"{app_path}: no results (see the application's system log)")
+                continue
+            print(f"{app_path} ({results['mode']} mode, {arguments.keystrokes} key presses, {results['timeouts']} "
+                  f"timed out):")
+            print(format_distribution("echo", results["echo"]))
+            print(format_distribution("advance", results["advance"]))
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+
+def start_xvfb(display):
+    """Function which starts a virtual X server (Xvfb) on the given display and waits until it accepts connections"""
+    if shutil.which("Xvfb") is None:
+        sys.exit("Xvfb is not installed (install it, e.g. the 'xvfb' package, or pass --display)")
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", XVFB_SCREEN, "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    socket_path = "/tmp/.X11-unix/X" + display.lstrip(":").split(".")[0]
+    deadline = time.monotonic() + XVFB_STARTUP_TIMEOUT
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            sys.exit(f"Xvfb could not be started on display {display}")
+        time.sleep(0.05)
+    return process
+
+
+if __name__ == '__main__':
+    run_harness()
@@ -0,0 +1,222 @@
+# Test history for the Typing Speed Test application.
+
+# Every completed test is recorded (user, test mode, CPM, WPM, accuracy, duration and the per-second speed samples) in
+# a SQLite database, so that results can be analysed in bulk (see 'export.py').  Results are read back in fixed-size
+# batches through generators, so that memory use stays constant regardless of the size of the history.
+
+# Import necessary library(ies):
+from array import array
+import getpass
+import hashlib
+import sqlite3
+import time
+
+import leaderboard
+import trends
+
+# Define constant for the file name of the history database:
+HISTORY_DATABASE_PATH = "typing_history.db"
+
+# Define constant for the number of rows read from the database at a time:
+DEFAULT_BATCH_SIZE = 10000
+
+# Define constant for the columns of a recorded result (in storage order):
+RESULT_COLUMNS = ("id", "user", "mode", "finished_at", "duration", "cpm", "wpm", "accuracy", "suspect", "speed_samples")
+
+# Define constant for the typecode of the per-second speed samples (CPM at the end of each second, unsigned int):
+SPEED_SAMPLES_TYPECODE = "I"
+
+
+# DEFINE FUNCTIONS TO BE USED FOR SCHEMA MIGRATIONS (LISTED IN ORDER OF APPLICATION):
+def migrate_add_leaderboards(connection):
+    """Function which adds the leaderboard and personal-best tables, populating them from the results recorded so far"""
+    connection.executescript("""
+        CREATE TABLE leaderboard_entries (
+            board TEXT NOT NULL,
+            result_id INTEGER NOT NULL,
+            user TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            cpm INTEGER NOT NULL,
+            wpm INTEGER NOT NULL,
+            finished_at REAL NOT NULL,
+            PRIMARY KEY (board, result_id)
+        );
+        CREATE INDEX leaderboard_entries_by_cpm ON leaderboard_entries (board, cpm DESC, result_id);
+        CREATE TABLE personal_bests (
+            user TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            best_cpm INTEGER NOT NULL,
+            tests INTEGER NOT NULL,
+            total_cpm INTEGER NOT NULL,
+            PRIMARY KEY (user, mode)
+        );
+    """)
+    for row in connection.execute("SELECT id, user, mode, finished_at, cpm, wpm FROM results ORDER BY id").fetchall():
+        leaderboard.update_leaderboards(connection, *row)
+
+
+def migrate_add_trends(connection):
+    """Function which adds the trend buckets (per-day/week/month aggregates of each user's results), populating them from the results recorded so far"""
+    connection.executescript("""
+        CREATE TABLE trend_buckets (
+            user TEXT NOT NULL,
+            level TEXT NOT NULL,
+            bucket_start REAL NOT NULL,
+            tests INTEGER NOT NULL,
+            total_cpm INTEGER NOT NULL,
+            best_cpm INTEGER NOT NULL,
+            PRIMARY KEY (user, level, bucket_start)
+        ) WITHOUT ROWID;
+        CREATE INDEX results_by_user ON results (user, suspect, finished_at, cpm);
+    """)
+    for rows in iterate_result_batches(connection):
+        for row in rows:
+            if not row[RESULT_COLUMNS.index("suspect")]:
+                trends.update_trends(connection, row[1], row[3], row[5])
+
+
+def migrate_add_result_hashes(connection):
+    """Function which adds the hash identifying each result (used to skip duplicates on import), computing it for the results recorded so far"""
+    connection.execute("ALTER TABLE results ADD COLUMN result_hash BLOB")
+    for rows in iterate_result_batches(connection):
+        connection.executemany("UPDATE results SET result_hash = ? WHERE id = ?",
+                               [(compute_result_hash(*row[1:8], row[9]), row[0]) for row in rows])
+    connection.execute("CREATE UNIQUE INDEX results_by_hash ON results (result_hash)")
+
+
+# Define list of schema migrations (SQL scripts or functions; the database's 'user_version' is the number applied):
+SCHEMA_MIGRATIONS = [
+    """
+    CREATE TABLE results (
+        id INTEGER PRIMARY KEY,
+        user TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        finished_at REAL NOT NULL,
+        duration REAL NOT NULL,
+        cpm INTEGER NOT NULL,
+        wpm INTEGER NOT NULL,
+        accuracy REAL NOT NULL,
+        speed_samples BLOB NOT NULL
+    );
+    CREATE TABLE export_state (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL
+    );
+    """,
+    migrate_add_leaderboards,
+    """
+    ALTER TABLE results ADD COLUMN suspect INTEGER NOT NULL DEFAULT 0;
+    """,
+    """
+    CREATE TABLE problem_words (
+        user TEXT NOT NULL,
+        word TEXT NOT NULL,
+        weight REAL NOT NULL,
+        interval REAL NOT NULL,
+        due_at REAL NOT NULL,
+        priority REAL NOT NULL,
+        PRIMARY KEY (user, word)
+    ) WITHOUT ROWID;
+    CREATE INDEX problem_words_by_priority ON problem_words (user, priority);
+    """,
+    migrate_add_trends,
+    migrate_add_result_hashes,
+]
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def compute_result_hash(user, mode, finished_at, duration, cpm, wpm, accuracy, speed_samples_blob):
+    """Function which returns the hash identifying a result (the same result recorded on two machines has the same hash)"""
+    # (NOTE: Numbers are normalised to the types they are stored as, so the hash is the same before and after storage.)
+    fields = (user, mode, float(finished_at), float(duration), int(cpm), int(wpm), float(accuracy))
+    return hashlib.blake2b("\x1f".join(map(repr, fields)).encode("utf-8") + b"\x1f" + speed_samples_blob,
+                           digest_size=16).digest()
+
+
+def connect(path=HISTORY_DATABASE_PATH):
+    """Function which opens the history database, creating or upgrading its schema as needed"""
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+
+    # Apply any schema migrations which have not yet been applied:
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    for migration in SCHEMA_MIGRATIONS[version:]:
+        version += 1
+        with connection:
+            if callable(migration):
+                migration(connection)
+            else:
+                connection.executescript(migration)
+            connection.execute(f"PRAGMA user_version = {version}")
+
+    # Return the connection to the calling function:
+    return connection
+
+
+def decode_speed_samples(blob):
+    """Function which converts stored speed samples back into an array of per-second CPM values"""
+    samples = array(SPEED_SAMPLES_TYPECODE)
+    samples.frombytes(blob)
+    return samples
+
+
+def get_current_user():
+    """Function which returns the name of the user taking the test (the operating-system login)"""
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "unknown"
+
+
+def get_export_state(connection, name):
+    """Function which returns the id of the last result included in the named (incremental) export"""
+    row = connection.execute("SELECT last_id FROM export_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def iterate_result_batches(connection, since_id=0, user=None, mode=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Generator which yields recorded results (after the given id, optionally filtered) in fixed-size batches of rows"""
+    # Build the query (results are read in id order, which is served directly by the primary key):
+    query = "SELECT " + ", ".join(RESULT_COLUMNS) + " FROM results WHERE id > ?"
+    parameters = [since_id]
+    if user is not None:
+        query += " AND user = ?"
+        parameters.append(user)
+    if mode is not None:
+        query += " AND mode = ?"
+        parameters.append(mode)
+    query += " ORDER BY id"
+
+    # Yield the rows one batch at a time:
+    cursor = connection.execute(query, parameters)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def record_result(connection, user, mode, duration, cpm, wpm, accuracy, speed_samples, finished_at=None, suspect=False):
+    """Function which records the result of a completed test (flagged if suspected of cheating) and returns its id"""
+    finished_at = time.time() if finished_at is None else finished_at
+    speed_samples_blob = array(SPEED_SAMPLES_TYPECODE, speed_samples).tobytes()
+    with connection:
+        cursor = connection.execute(
+            "INSERT INTO results (user, mode, finished_at, duration, cpm, wpm, accuracy, suspect, speed_samples, "
+            "result_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (user, mode, finished_at, duration, cpm, wpm, accuracy, int(suspect), speed_samples_blob,
+             compute_result_hash(user, mode, finished_at, duration, cpm, wpm, accuracy, speed_samples_blob)))
+
+        # Update the leaderboards, personal bests and trend buckets in the same transaction (suspect results are kept
+        # out of them):
+        if not suspect:
+            leaderboard.update_leaderboards(connection, cursor.lastrowid, user, mode, finished_at, cpm, wpm)
+            trends.update_trends(connection, user, finished_at, cpm)
+    return cursor.lastrowid
+
+
+def set_export_state(connection, name, last_id):
+    """Function which records the id of the last result included in the named (incremental) export"""
+    with connection:
+        connection.execute("INSERT INTO export_state (name, last_id) VALUES (?, ?) "
+                           "ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id", (name, last_id))
@@ -0,0 +1,91 @@
+# Next-key highlighting on the keyboard image of the Typing Speed Test application.
+
+# The rectangle of every key of the keyboard shown at the top of the application window ('keyboard.png', a UK ISO
+# layout) is held in a precomputed layout map (image coordinates at 1x).  When the highlighter is created, the map is
+# converted once into canvas coordinates (for the image's position and scale) for every character which can be typed.
+# Highlighting then uses two canvas items created up front: one outlines the next key to press, the other flashes a
+# mistyped key.  A keystroke only moves an item (a single 'coords' call, skipped if the key is unchanged), so no
+# canvas items are created or deleted while typing and the highlight follows each keystroke within a frame.
+
+# Define constant for the rows of keys of the keyboard image: top and bottom (y), then the characters typed with each
+# key (unshifted and shifted; BACKSPACE for the Backspace key) with its left and right edges (x):
+BACKSPACE = "\b"
+KEY_ROWS = (
+    (39, 50, (("`¬", 8, 21.5), ("1!", 21.5, 34.5), ('2"', 34.5, 46), ("3£", 46, 58), ("4$", 58, 69.5),
+              ("5%", 69.5, 81.5), ("6^", 81.5, 93.5), ("7&", 93.5, 105.5), ("8*", 105.5, 117.5), ("9(", 117.5, 129),
+              ("0)", 129, 140.5), ("-_", 140.5, 152.5), ("=+", 152.5, 165), (BACKSPACE, 165, 188.5))),
+    (51, 63, (("\t", 8, 23.5), ("qQ", 23.5, 35.5), ("wW", 35.5, 47), ("eE", 47, 58.5), ("rR", 58.5, 70.5),
+              ("tT", 70.5, 82.5), ("yY", 82.5, 94.5), ("uU", 94.5, 106), ("iI", 106, 118), ("oO", 118, 129.5),
+              ("pP", 129.5, 141.5), ("[{", 141.5, 153.5), ("]}", 153.5, 165.5), ("\n", 165.5, 188.5))),
+    (64, 76, (("aA", 25.5, 37), ("sS", 37, 48.5), ("dD", 48.5, 60.5), ("fF", 60.5, 72.5), ("gG", 72.5, 84.5),
+              ("hH", 84.5, 96), ("jJ", 96, 107.5), ("kK", 107.5, 119.5), ("lL", 119.5, 131.5), (";:", 131.5, 143.5),
+              ("'@", 143.5, 155.5), ("#~", 155.5, 167.5))),
+    (77, 89, (("\\|", 23.5, 35.5), ("zZ", 35.5, 47.5), ("xX", 47.5, 59), ("cC", 59, 70.5), ("vV", 70.5, 82.5),
+              ("bB", 82.5, 94.5), ("nN", 94.5, 106.5), ("mM", 106.5, 118), (",<", 118, 130), (".>", 130, 141.5),
+              ("/?", 141.5, 154))),
+    (90, 102, ((" ", 60, 121),)),
+)
+
+# Define constants for the appearance of the highlights, and the duration (in milliseconds) of a mistyped-key flash:
+NEXT_KEY_OUTLINE = "blue"
+MISTYPED_KEY_OUTLINE = "red"
+HIGHLIGHT_WIDTH = 2
+FLASH_DURATION = 150
+
+# Define constant for the coordinates at which a highlight is hidden (outside the canvas):
+HIDDEN_COORDINATES = (-10, -10, -10, -10)
+
+
+class KeyHighlighter:
+    """Class which highlights the next key to press, and flashes mistyped keys, on the keyboard image"""
+    __slots__ = ("canvas", "key_coordinates", "next_key_item", "mistyped_key_item", "next_key_coordinates",
+                 "flash_timer")
+
+    def __init__(self, canvas, origin_x, origin_y, scale=1):
+        self.canvas = canvas
+
+        # Convert the layout map into canvas coordinates (for the image's top-left corner and scale) for each character:
+        self.key_coordinates = {}
+        for top, bottom, keys in KEY_ROWS:
+            for characters, left, right in keys:
+                coordinates = (origin_x + left * scale, origin_y + top * scale,
+                               origin_x + right * scale, origin_y + bottom * scale)
+                for character in characters:
+                    self.key_coordinates[character] = coordinates
+
+        # Create the two highlight items (hidden until needed):
+        self.next_key_item = canvas.create_rectangle(*HIDDEN_COORDINATES, outline=NEXT_KEY_OUTLINE,
+                                                     width=HIGHLIGHT_WIDTH * scale)
+        self.mistyped_key_item = canvas.create_rectangle(*HIDDEN_COORDINATES, outline=MISTYPED_KEY_OUTLINE,
+                                                         width=HIGHLIGHT_WIDTH * scale)
+        self.next_key_coordinates = HIDDEN_COORDINATES
+        self.flash_timer = None
+
+    def flash_mistyped_key(self, character):
+        """Function which briefly highlights the key of a mistyped character"""
+        coordinates = self.key_coordinates.get(character)
+        if coordinates is None:
+            return
+        self.canvas.coords(self.mistyped_key_item, *coordinates)
+        if self.flash_timer is not None:
+            self.canvas.after_cancel(self.flash_timer)
+        self.flash_timer = self.canvas.after(FLASH_DURATION, self.hide_mistyped_key)
+
+    def hide(self):
+        """Function which hides both highlights"""
+        self.show_next_key(None)
+        if self.flash_timer is not None:
+            self.canvas.after_cancel(self.flash_timer)
+        self.hide_mistyped_key()
+
+    def hide_mistyped_key(self):
+        """Function which hides the highlight of a mistyped key"""
+        self.flash_timer = None
+        self.canvas.coords(self.mistyped_key_item, *HIDDEN_COORDINATES)
+
+    def show_next_key(self, character):
+        """Function which highlights the key of the next character to type (hidden if None or not on the keyboard)"""
+        coordinates = self.key_coordinates.get(character, HIDDEN_COORDINATES)
+        if coordinates is not self.next_key_coordinates:
+            self.next_key_coordinates = coordinates
+            self.canvas.coords(self.next_key_item, *coordinates)
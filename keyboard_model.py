@@ -0,0 +1,11 @@
+# Keyboard model of the Typing Speed Test application.
+
+# Which hand and finger type each letter key, and the rows of letter keys, on a QWERTY keyboard (touch typing).  Shared
+# by the typist simulator ('simulator.py'), which derives bigram delays and neighbouring-key errors from it, and the
+# difficulty scoring of words ('difficulty.py'), which counts same-finger sequences and hand alternation.
+
+# Define constants for the keyboard model (QWERTY; hand and finger of each key, and the rows of letter keys):
+LEFT_HAND_KEYS = "qwertasdfgzxcvb"
+FINGER_OF_KEY = {key: finger for finger, keys in enumerate(("qaz", "wsx", "edc", "rfvtgb", "yhnujm", "ik", "ol", "p"))
+                 for key in keys}
+KEYBOARD_ROWS = ("qwertyuiop", "asdfghjkl", "zxcvbnm")
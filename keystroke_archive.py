@@ -0,0 +1,422 @@
+# Compressed keystroke archives for the Typing Speed Test application.
+
+# The raw keystrokes of every test (the time and character of each key pressed) are archived, so that typing can be
+# analysed or replayed later.  Each test session is encoded compactly: keystroke times (milliseconds since the start of
+# the test) and key codes (Unicode code points) are delta-encoded, as two separate columns, into variable-length
+# integers (7 bits per byte, so most deltas take one or two bytes; key-code deltas are zigzag-encoded as they may be
+# negative).  Times are kept to the millisecond (the resolution of Tk's own event times), as finer digits are noise
+# which no compressor can squeeze.  Encoded sessions are grouped into blocks of about BLOCK_SIZE bytes (or of at most
+# MAXIMUM_PENDING_SESSIONS sessions, or MAXIMUM_PENDING_AGE seconds' worth, so little is lost if the application is
+# killed), and each block is compressed independently (with 'lzma' or 'zlib') and appended to the archive.  A separate
+# index file holds one fixed-size entry per session (its block and its position within the block), and session ids are
+# consecutive, so one session is read by seeking to its index entry and decompressing a single block rather than the
+# whole archive.
+
+# Several instances of the application may append to the same archive: blocks are appended under a host-wide lock (see
+# 'live_leaderboard.py'), which is also when session ids are assigned.  A block's data is written before its index
+# entries, so a crash can only leave unindexed data at the end of the archive, which is discarded on the next append.
+
+# Usage example (report the compression ratio and decode throughput of an archive, or of simulated sessions):
+#   python keystroke_archive.py keystrokes.karc
+#   python keystroke_archive.py --benchmark 2000
+
+# Import necessary library(ies):
+from array import array
+import argparse
+import hashlib
+from itertools import accumulate
+import lzma
+import os
+import struct
+import time
+import zlib
+
+from live_leaderboard import HostLock
+
+# Define constant for the default path of the keystroke archive (its index is kept alongside, with INDEX_SUFFIX added):
+KEYSTROKE_ARCHIVE_PATH = "keystrokes.karc"
+INDEX_SUFFIX = ".idx"
+
+# Define constants for the magic numbers at the start of the archive and index files:
+ARCHIVE_MAGIC = b"KEYARC01"
+INDEX_MAGIC = b"KEYIDX01"
+
+# Define constants for the structure of a block header (codec, compressed size, uncompressed size) and of an index
+# entry (session id, started at, block offset, block's compressed size, offset and size of the session in the block):
+BLOCK_HEADER = struct.Struct("<BII")
+INDEX_ENTRY = struct.Struct("<QdQIII")
+
+# Define constants for the codecs with which blocks are compressed:
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+DEFAULT_CODEC = CODEC_LZMA
+
+# Define constant for the resolution of the archived keystroke times (ticks per second, i.e. milliseconds):
+TIME_RESOLUTION = 1000
+
+# Define constant for the (uncompressed) size in bytes at which a block of encoded sessions is compressed and appended:
+BLOCK_SIZE = 64 * 1024
+
+# Define constants for the number of sessions, and the time in seconds since the first of them was added, after which
+# pending sessions are appended even if they fill less than a block (the age is also checked periodically by the
+# application, see 'KeystrokeArchiveWriter.flush_if_due'):
+MAXIMUM_PENDING_SESSIONS = 16
+MAXIMUM_PENDING_AGE = 300.0
+
+# Define constant for the size in bytes of a keystroke stored without encoding (8-byte time, 4-byte key code), against
+# which the compression ratio is reported:
+RAW_KEYSTROKE_SIZE = 12
+
+
+class KeystrokeLog:
+    """Class which records the keystrokes (time and character) of the current test (reused between tests)"""
+    __slots__ = ("started_at", "start_time", "times", "codes")
+
+    def __init__(self):
+        self.times = array("d")
+        self.codes = array("I")
+        self.reset()
+
+    def record(self, timestamp, character):
+        """Function which records a keystroke made at the given time (performance-counter seconds)"""
+        self.times.append(timestamp)
+        self.codes.append(ord(character))
+
+    def reset(self, started_at=None, start_time=None):
+        """Function which prepares the log for a new test, started at the given time (wall-clock and performance-counter seconds)"""
+        self.started_at = time.time() if started_at is None else started_at
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        del self.times[:]
+        del self.codes[:]
+
+
+class KeystrokeSession:
+    """Class which holds the keystrokes of one archived test session"""
+    __slots__ = ("session_id", "user", "mode", "started_at", "times", "codes")
+
+    def __init__(self, session_id, user, mode, started_at, times, codes):
+        self.session_id = session_id
+        self.user = user
+        self.mode = mode
+        self.started_at = started_at
+        self.times = times
+        self.codes = codes
+
+    def get_keys(self):
+        """Function which returns the characters typed in the session (backspaces included, as '\\b')"""
+        return "".join(map(chr, self.codes))
+
+
+class KeystrokeArchiveReader:
+    """Class which reads sessions from a keystroke archive (one block decompressed per session read)"""
+    __slots__ = ("archive_file", "index_file", "session_count", "cached_block_offset", "cached_block")
+
+    def __init__(self, path=KEYSTROKE_ARCHIVE_PATH):
+        self.archive_file = open(path, mode="rb")
+        self.index_file = open(path + INDEX_SUFFIX, mode="rb")
+        if self.archive_file.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC or \
+                self.index_file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"Not a keystroke archive: {path}")
+        self.session_count = (os.fstat(self.index_file.fileno()).st_size - len(INDEX_MAGIC)) // INDEX_ENTRY.size
+        self.cached_block_offset = None
+        self.cached_block = None
+
+    def close(self):
+        """Function which closes the archive"""
+        self.archive_file.close()
+        self.index_file.close()
+
+    def get_session_count(self):
+        """Function which returns the number of sessions in the archive"""
+        return self.session_count
+
+    def iterate_sessions(self):
+        """Generator which yields every session in the archive in id order (each block being decompressed once)"""
+        for session_id in range(1, self.session_count + 1):
+            yield self.read_session(session_id)
+
+    def read_block(self, block_offset, compressed_size):
+        """Function which returns the decompressed contents of the block at the given offset (the last block read is cached)"""
+        if block_offset != self.cached_block_offset:
+            self.archive_file.seek(block_offset)
+            codec, _, uncompressed_size = BLOCK_HEADER.unpack(self.archive_file.read(BLOCK_HEADER.size))
+            compressed = self.archive_file.read(compressed_size)
+            block = lzma.decompress(compressed) if codec == CODEC_LZMA else zlib.decompress(compressed)
+            if len(block) != uncompressed_size:
+                raise ValueError(f"Corrupt keystroke archive block at offset {block_offset}")
+            self.cached_block_offset = block_offset
+            self.cached_block = block
+        return self.cached_block
+
+    def read_index_entry(self, session_id):
+        """Function which returns the index entry of a session (session id, started at, block offset, ...)"""
+        if not 1 <= session_id <= self.session_count:
+            raise KeyError(session_id)
+        self.index_file.seek(len(INDEX_MAGIC) + (session_id - 1) * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack(self.index_file.read(INDEX_ENTRY.size))
+
+    def read_session(self, session_id):
+        """Function which reads one session from the archive"""
+        _, started_at, block_offset, compressed_size, offset, size = self.read_index_entry(session_id)
+        block = self.read_block(block_offset, compressed_size)
+        user, mode, times, codes = decode_session(block[offset:offset + size])
+        return KeystrokeSession(session_id, user, mode, started_at, times, codes)
+
+
+class KeystrokeArchiveWriter:
+    """Class which appends sessions to a keystroke archive, compressing them in blocks"""
+    __slots__ = ("path", "codec", "block_size", "pending_sessions", "pending_size", "first_pending_time")
+
+    def __init__(self, path=KEYSTROKE_ARCHIVE_PATH, codec=DEFAULT_CODEC, block_size=BLOCK_SIZE):
+        self.path = path
+        self.codec = codec
+        self.block_size = block_size
+        self.pending_sessions = []
+        self.pending_size = 0
+        self.first_pending_time = 0.0
+
+    def add_session(self, user, mode, keystroke_log):
+        """Function which adds the session recorded in a keystroke log (appending a block once enough sessions are pending)"""
+        encoded = encode_session(user, mode, keystroke_log.start_time, keystroke_log.times, keystroke_log.codes)
+        if not self.pending_sessions:
+            self.first_pending_time = time.monotonic()
+        self.pending_sessions.append((keystroke_log.started_at, encoded))
+        self.pending_size += len(encoded)
+        if (self.pending_size >= self.block_size or len(self.pending_sessions) >= MAXIMUM_PENDING_SESSIONS
+                or time.monotonic() - self.first_pending_time >= MAXIMUM_PENDING_AGE):
+            self.flush()
+
+    def close(self):
+        """Function which appends any pending sessions to the archive"""
+        self.flush()
+
+    def flush_if_due(self):
+        """Function which appends the pending sessions if the first of them was added MAXIMUM_PENDING_AGE seconds ago (called periodically, so an idle application does not hold them indefinitely)"""
+        if self.pending_sessions and time.monotonic() - self.first_pending_time >= MAXIMUM_PENDING_AGE:
+            self.flush()
+
+    def flush(self):
+        """Function which compresses the pending sessions into a block and appends it (and their index entries) to the archive"""
+        if not self.pending_sessions:
+            return
+        block = b"".join(encoded for _, encoded in self.pending_sessions)
+        compressed = lzma.compress(block) if self.codec == CODEC_LZMA else zlib.compress(block, 9)
+
+        # Append the block, then its index entries, under the host-wide lock of the archive:
+        lock_name = "typing_keystrokes_" + hashlib.sha1(os.path.abspath(self.path).encode("utf-8")).hexdigest()[:16]
+        with HostLock(lock_name), open(self.path, mode="a+b") as archive_file, \
+                open(self.path + INDEX_SUFFIX, mode="a+b") as index_file:
+            block_offset, next_session_id = prepare_for_append(archive_file, index_file)
+            archive_file.seek(block_offset)
+            archive_file.write(BLOCK_HEADER.pack(self.codec, len(compressed), len(block)))
+            archive_file.write(compressed)
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+
+            entries = []
+            offset = 0
+            for session_id, (started_at, encoded) in enumerate(self.pending_sessions, start=next_session_id):
+                entries.append(INDEX_ENTRY.pack(session_id, started_at, block_offset, len(compressed), offset,
+                                                len(encoded)))
+                offset += len(encoded)
+            index_file.write(b"".join(entries))
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        self.pending_sessions = []
+        self.pending_size = 0
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def decode_session(data):
+    """Function which decodes an encoded session into (user, mode, times (seconds since the start), key codes)"""
+    position = 0
+    strings = []
+    for _ in range(2):
+        (length,), position = decode_varints(data, position, 1)
+        strings.append(data[position:position + length].decode("utf-8"))
+        position += length
+    (count,), position = decode_varints(data, position, 1)
+    time_deltas, position = decode_varints(data, position, count)
+    code_deltas, position = decode_varints(data, position, count)
+
+    # Undo the delta (and zigzag) encoding:
+    times = array("d", (ticks / TIME_RESOLUTION for ticks in accumulate(time_deltas)))
+    codes = array("I", accumulate((value >> 1) ^ -(value & 1) for value in code_deltas))
+    return strings[0], strings[1], times, codes
+
+
+def decode_varints(data, position, count):
+    """Function which decodes the given no. of variable-length integers from the data at a position, returning (values, new position)"""
+    values = []
+    append = values.append
+    value = shift = 0
+    while len(values) < count:
+        byte = data[position]
+        position += 1
+        if byte < 0x80:
+            append(value | (byte << shift))
+            value = shift = 0
+        else:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+    return values, position
+
+
+def encode_session(user, mode, start_time, times, codes):
+    """Function which encodes a session's keystrokes (times in performance-counter seconds, and key codes) compactly"""
+    # Convert the times into (non-decreasing) ticks since the start of the test, and take the deltas of the times and
+    # key codes (zigzag-encoding the code deltas, which may be negative):
+    time_deltas = []
+    previous = 0
+    for timestamp in times:
+        ticks = max(previous, round((timestamp - start_time) * TIME_RESOLUTION))
+        time_deltas.append(ticks - previous)
+        previous = ticks
+    code_deltas = []
+    previous = 0
+    for code in codes:
+        delta = code - previous
+        code_deltas.append(delta << 1 if delta >= 0 else (-delta << 1) - 1)
+        previous = code
+
+    # Encode the header (user, mode, no. of keystrokes) and the two columns:
+    data = bytearray()
+    for string in (user, mode):
+        encoded = string.encode("utf-8")
+        encode_varints((len(encoded),), data)
+        data += encoded
+    encode_varints((len(time_deltas),), data)
+    encode_varints(time_deltas, data)
+    encode_varints(code_deltas, data)
+    return bytes(data)
+
+
+def encode_varints(values, data):
+    """Function which appends non-negative integers to a bytearray as variable-length integers (7 bits per byte)"""
+    append = data.append
+    for value in values:
+        while value >= 0x80:
+            append((value & 0x7F) | 0x80)
+            value >>= 7
+        append(value)
+
+
+def get_archive_statistics(path=KEYSTROKE_ARCHIVE_PATH):
+    """Function which decodes a whole archive, returning (sessions, keystrokes, raw size, encoded size, archive size, decode time)"""
+    reader = KeystrokeArchiveReader(path)
+    try:
+        keystrokes = 0
+        start = time.perf_counter()
+        for session in reader.iterate_sessions():
+            keystrokes += len(session.codes)
+        decode_time = time.perf_counter() - start
+
+        # Total the (uncompressed) sizes of the encoded sessions from the index:
+        encoded_size = 0
+        for session_id in range(1, reader.get_session_count() + 1):
+            encoded_size += reader.read_index_entry(session_id)[5]
+        archive_size = os.path.getsize(path) + os.path.getsize(path + INDEX_SUFFIX)
+        return (reader.get_session_count(), keystrokes, keystrokes * RAW_KEYSTROKE_SIZE, encoded_size, archive_size,
+                decode_time)
+    finally:
+        reader.close()
+
+
+def prepare_for_append(archive_file, index_file):
+    """Function which returns the offset at which the next block is appended and the next session id (discarding any data left unindexed by a crash)"""
+    # Write the magic numbers of new (empty) files:
+    for file, magic in ((archive_file, ARCHIVE_MAGIC), (index_file, INDEX_MAGIC)):
+        if os.fstat(file.fileno()).st_size == 0:
+            file.write(magic)
+            file.flush()
+
+    # Drop any partly written index entry, then find the end of the last indexed block:
+    index_size = os.fstat(index_file.fileno()).st_size
+    session_count = (index_size - len(INDEX_MAGIC)) // INDEX_ENTRY.size
+    index_file.truncate(len(INDEX_MAGIC) + session_count * INDEX_ENTRY.size)
+    if session_count:
+        index_file.seek(len(INDEX_MAGIC) + (session_count - 1) * INDEX_ENTRY.size)
+        _, _, block_offset, compressed_size, _, _ = INDEX_ENTRY.unpack(index_file.read(INDEX_ENTRY.size))
+        end = block_offset + BLOCK_HEADER.size + compressed_size
+    else:
+        end = len(ARCHIVE_MAGIC)
+    index_file.seek(0, os.SEEK_END)
+
+    # Drop any unindexed data after the last indexed block:
+    archive_file.truncate(end)
+    return end, session_count + 1
+
+
+def run_report():
+    """Main function used to report the compression ratio and decode throughput of a keystroke archive"""
+    parser = argparse.ArgumentParser(description="Report the compression ratio and decode throughput of a keystroke "
+                                                 "archive.")
+    parser.add_argument("path", nargs="?", default=KEYSTROKE_ARCHIVE_PATH, help="path of the keystroke archive")
+    parser.add_argument("--benchmark", type=int, metavar="SESSIONS",
+                        help="first archive this many simulated 60-second sessions (with each codec) in a temp. directory")
+    arguments = parser.parse_args()
+
+    if arguments.benchmark:
+        import shutil
+        import tempfile
+
+        from simulator import TypistModel
+
+        # Simulate sessions of typists of various speeds:
+        models = {}
+        sessions = []
+        for number in range(arguments.benchmark):
+            wpm = 40 + number % 8 * 10
+            model = models.get(wpm)
+            if model is None:
+                model = models[wpm] = TypistModel(wpm=wpm, error_rate=0.03, seed=wpm)
+            log = KeystrokeLog()
+            log.reset(started_at=1.7e9 + number * 90, start_time=0.0)
+            timestamp = 0.0
+            for key, interval in model.iterate_keystrokes(2 * wpm):
+                timestamp += interval
+                if timestamp > 60:
+                    break
+                log.record(timestamp, key)
+            sessions.append(log)
+
+        # Archive them with each codec, and report on each archive (and the time to read one session):
+        directory = tempfile.mkdtemp()
+        try:
+            for codec_name, codec in (("zlib", CODEC_ZLIB), ("lzma", CODEC_LZMA)):
+                path = os.path.join(directory, codec_name + ".karc")
+                writer = KeystrokeArchiveWriter(path, codec)
+                start = time.perf_counter()
+                for number, log in enumerate(sessions):
+                    writer.add_session(f"user{number % 20}", "words", log)
+                writer.close()
+                print(f"{codec_name}: archived {len(sessions):,} sessions in {time.perf_counter() - start:.2f} s")
+                report_statistics(path)
+                reader = KeystrokeArchiveReader(path)
+                start = time.perf_counter()
+                for session_id in range(1, reader.get_session_count() + 1, 97):
+                    reader.cached_block_offset = None  # (Time a cold read: always decompress the session's block.)
+                    reader.read_session(session_id)
+                reads = len(range(1, reader.get_session_count() + 1, 97))
+                print(f"  one session read in {(time.perf_counter() - start) / reads * 1000:.2f} ms (one block "
+                      f"decompressed)")
+                reader.close()
+        finally:
+            shutil.rmtree(directory)
+    else:
+        report_statistics(arguments.path)
+
+
+def report_statistics(path):
+    """Function which prints the compression ratio and decode throughput of a keystroke archive"""
+    sessions, keystrokes, raw_size, encoded_size, archive_size, decode_time = get_archive_statistics(path)
+    print(f"  {sessions:,} sessions, {keystrokes:,} keystrokes: {raw_size:,} bytes raw, {encoded_size:,} bytes "
+          f"delta/varint-encoded ({raw_size / max(encoded_size, 1):.1f}x), {archive_size:,} bytes compressed with "
+          f"index ({raw_size / max(archive_size, 1):.1f}x)")
+    print(f"  decoded in {decode_time:.2f} s ({keystrokes / max(decode_time, 1e-9):,.0f} keystrokes/s, "
+          f"{raw_size / max(decode_time, 1e-9) / 1e6:.1f} MB/s raw)")
+
+
+if __name__ == '__main__':
+    run_report()
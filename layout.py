@@ -0,0 +1,123 @@
+# Line layout of the words pane for the Typing Speed Test application.
+
+# Rather than letting the text widget wrap the (long) string of words to type, the line breaks are computed once per
+# test from word widths measured with 'tkinter.font.Font.measure' (memoised per font, for the most recently used words,
+# so each word of a test is measured once and the words of the corpus, which recur, are rarely measured again).  The words are then inserted with explicit line breaks, and the line and column of every word are kept in
+# arrays.  The pane can therefore highlight any word by its precomputed index and scroll to its line with a single
+# 'yview' call, at the same cost however long the test is.  Lines of code (code mode; see 'code_snippets.py') are not
+# wrapped: each is laid out on a line of its own.
+
+# Import necessary library(ies):
+from array import array
+from collections import OrderedDict
+
+# Define constant for the number of layouts kept (e.g., for retakes of recent tests):
+LAYOUT_CACHE_SIZE = 8
+
+# Define constants for the number of fonts, and of words per font, whose widths are kept (passages bring new words
+# with every test, so the memoised widths must be bounded; the words of a corpus fit many times over):
+FONT_CACHE_SIZE = 4
+WORD_WIDTH_CACHE_SIZE = 10000
+
+# Define dictionaries of memoised word widths (font description -> {word: width in pixels}) and computed layouts
+# ((prepared test key, font description, width) -> Layout), least recently used first:
+word_widths_by_font = OrderedDict()
+layout_cache = OrderedDict()
+
+
+class Layout:
+    """Class which holds the layout of a test's words: the text (with line breaks) and each word's line and column"""
+    __slots__ = ("text", "word_lines", "word_columns", "line_count")
+
+    def __init__(self, text, word_lines, word_columns, line_count):
+        self.text = text
+        self.word_lines = word_lines
+        self.word_columns = word_columns
+        self.line_count = line_count
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def compute_layout(words, measure_word, space_width, line_width):
+    """Function which breaks the words into lines no wider than the given width (in pixels) and returns their layout"""
+    word_lines = array("I")
+    word_columns = array("I")
+    lines = []
+    current_line = []
+    line = 0
+    column = 0  # In characters.
+    used_width = 0  # In pixels.
+
+    for word in words:
+        word_width = measure_word(word)
+
+        # Start a new line if the word (preceded by a space) does not fit on the current one:
+        if current_line and used_width + space_width + word_width > line_width:
+            lines.append(" ".join(current_line) + " ")
+            current_line = []
+            line += 1
+            column = 0
+            used_width = 0
+        elif current_line:
+            used_width += space_width
+
+        word_lines.append(line)
+        word_columns.append(column)
+        current_line.append(word)
+        column += len(word) + 1
+        used_width += word_width
+    lines.append(" ".join(current_line) + " ")
+
+    # Return the layout:
+    return Layout("\n".join(lines), word_lines, word_columns, len(lines))
+
+
+def compute_line_layout(lines):
+    """Function which lays out each of the given lines (e.g., of code) on a line of its own, starting at column 0"""
+    return Layout("".join(line + "\n" for line in lines), array("I", range(len(lines))), array("I", bytes(4 * len(lines))),
+                  len(lines))
+
+
+def get_font_key(font):
+    """Function which returns a hashable description of a 'tkinter.font.Font' (family, size, weight, slant)"""
+    actual = font.actual()
+    return actual["family"], actual["size"], actual["weight"], actual["slant"]
+
+
+def get_layout(prepared_test, font, line_width):
+    """Function which returns the layout of a prepared test's words for a font and line width (from the cache if possible)"""
+    font_key = get_font_key(font)
+    key = (prepared_test.key, font_key, line_width)
+    layout = layout_cache.get(key)
+    if layout is not None:
+        layout_cache.move_to_end(key)
+        return layout
+
+    # Compute the layout (lines of code are not wrapped, so need no measuring; otherwise, each distinct word is
+    # measured once per font) and cache it:
+    if prepared_test.separator == "\n":
+        layout = compute_line_layout(prepared_test.words)
+    else:
+        widths = word_widths_by_font.get(font_key)
+        if widths is None:
+            widths = word_widths_by_font[font_key] = OrderedDict()
+            while len(word_widths_by_font) > FONT_CACHE_SIZE:
+                word_widths_by_font.popitem(last=False)
+        else:
+            word_widths_by_font.move_to_end(font_key)
+
+        def measure_word(word):
+            width = widths.get(word)
+            if width is None:
+                width = font.measure(word)
+                widths[word] = width
+            else:
+                widths.move_to_end(word)
+            return width
+
+        layout = compute_layout(prepared_test.words, measure_word, measure_word(" "), line_width)
+        while len(widths) > WORD_WIDTH_CACHE_SIZE:
+            widths.popitem(last=False)
+    layout_cache[key] = layout
+    while len(layout_cache) > LAYOUT_CACHE_SIZE:
+        layout_cache.popitem(last=False)
+    return layout
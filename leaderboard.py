@@ -0,0 +1,165 @@
+# Leaderboards for the Typing Speed Test application.
+
+# Leaderboards (by day, week and all-time; overall, per user and per test mode) and personal bests are kept as
+# materialised tables in the history database (see 'history.py').  They are updated incrementally as each result is
+# recorded: a result is inserted into each board it belongs to, and the board is then trimmed back to its top K
+# entries.  Showing a leaderboard therefore reads at most K rows (through an index), however many tests are stored.
+
+# Import necessary library(ies):
+from datetime import datetime
+from operator import itemgetter
+import time
+
+# Define constant for the number of entries kept per leaderboard:
+LEADERBOARD_SIZE = 10
+
+# Define constants for the periods covered by the leaderboards:
+PERIOD_ALL_TIME = "all-time"
+PERIOD_DAY = "day"
+PERIOD_WEEK = "week"
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def get_board_key(period, scope="all", when=None):
+    """Function which returns the key of a leaderboard, e.g. 'week:2026-W42/user:alice' ('when' defaults to now)"""
+    if period == PERIOD_ALL_TIME:
+        return PERIOD_ALL_TIME + "/" + scope
+    when = datetime.now() if when is None else datetime.fromtimestamp(when)
+    if period == PERIOD_DAY:
+        return "day:" + when.strftime("%Y-%m-%d") + "/" + scope
+    if period == PERIOD_WEEK:
+        return "week:" + when.strftime("%G-W%V") + "/" + scope
+    raise ValueError(f"Unknown leaderboard period: {period}")
+
+
+def get_leaderboard(connection, period, scope="all", when=None, limit=LEADERBOARD_SIZE):
+    """Function which returns the entries (rank, user, mode, CPM, WPM, finished at) of a leaderboard, best first"""
+    rows = connection.execute(
+        "SELECT user, mode, cpm, wpm, finished_at FROM leaderboard_entries WHERE board = ? "
+        "ORDER BY cpm DESC, result_id LIMIT ?", (get_board_key(period, scope, when), limit)).fetchall()
+    return [(rank,) + row for rank, row in enumerate(rows, start=1)]
+
+
+def get_personal_best(connection, user, mode=None):
+    """Function which returns the personal-best aggregate (best CPM, no. of tests, average CPM) of a user"""
+    if mode is None:
+        row = connection.execute("SELECT MAX(best_cpm), SUM(tests), SUM(total_cpm) FROM personal_bests WHERE user = ?",
+                                 (user,)).fetchone()
+    else:
+        row = connection.execute("SELECT best_cpm, tests, total_cpm FROM personal_bests WHERE user = ? AND mode = ?",
+                                 (user, mode)).fetchone()
+    if not row or not row[1]:
+        return None
+    return row[0], row[1], row[2] / row[1]
+
+
+def update_leaderboards(connection, result_id, user, mode, finished_at, cpm, wpm):
+    """Function which adds a newly recorded result to its leaderboards and personal bests (within the caller's transaction)"""
+    # Add the result to every board it belongs to, trimming each board back to its top K entries.  A result which does
+    # not make it into a full board is skipped without being inserted:
+    for period in (PERIOD_ALL_TIME, PERIOD_DAY, PERIOD_WEEK):
+        for scope in ("all", "user:" + user, "mode:" + mode):
+            board = get_board_key(period, scope, finished_at)
+            entries, lowest_cpm = connection.execute(
+                "SELECT COUNT(*), MIN(cpm) FROM leaderboard_entries WHERE board = ?", (board,)).fetchone()
+            if entries >= LEADERBOARD_SIZE and cpm <= lowest_cpm:
+                continue
+            connection.execute(
+                "INSERT INTO leaderboard_entries (board, result_id, user, mode, cpm, wpm, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (board, result_id, user, mode, cpm, wpm, finished_at))
+            if entries >= LEADERBOARD_SIZE:
+                connection.execute(
+                    "DELETE FROM leaderboard_entries WHERE board = ? AND result_id NOT IN "
+                    "(SELECT result_id FROM leaderboard_entries WHERE board = ? ORDER BY cpm DESC, result_id LIMIT ?)",
+                    (board, board, LEADERBOARD_SIZE))
+
+    # Update the user's personal-best aggregate for the test mode:
+    connection.execute(
+        "INSERT INTO personal_bests (user, mode, best_cpm, tests, total_cpm) VALUES (?, ?, ?, 1, ?) "
+        "ON CONFLICT(user, mode) DO UPDATE SET best_cpm = MAX(best_cpm, excluded.best_cpm), tests = tests + 1, "
+        "total_cpm = total_cpm + excluded.total_cpm", (user, mode, cpm, cpm))
+
+
+def update_leaderboards_bulk(connection, results):
+    """Function which adds a batch of newly recorded results (id, user, mode, finished at, CPM, WPM), in id order, to their leaderboards and personal bests (within the caller's transaction)"""
+    # Collect each board's best K results of the batch.  The board keys are memoised by (local date, user, mode), and
+    # each board's candidates are pruned to its best K whenever 2K have accumulated, after which results no better than
+    # its K-th best are skipped without being kept (results are in id order, so an equal CPM never displaces an entry):
+    candidates = {}
+    thresholds = {}
+    board_keys_by_group = {}
+    period_keys_by_date = {}
+    personal_bests = {}
+    get_cpm = itemgetter(4)
+    for result in results:
+        result_id, user, mode, finished_at, cpm, wpm = result
+        date = time.localtime(finished_at)[:3]
+        group = (date, user, mode)
+        board_keys = board_keys_by_group.get(group)
+        if board_keys is None:
+            period_keys = period_keys_by_date.get(date)
+            if period_keys is None:
+                period_keys = [get_board_key(period, "", finished_at) for period in (PERIOD_ALL_TIME, PERIOD_DAY, PERIOD_WEEK)]
+                period_keys_by_date[date] = period_keys
+            board_keys = [period_key + scope for period_key in period_keys
+                          for scope in ("all", "user:" + user, "mode:" + mode)]
+            board_keys_by_group[group] = board_keys
+        for board in board_keys:
+            entries = candidates.get(board)
+            if entries is None:
+                candidates[board] = [result]
+            elif cpm > thresholds.get(board, -1):
+                entries.append(result)
+                if len(entries) >= 2 * LEADERBOARD_SIZE:
+                    entries.sort(key=get_cpm, reverse=True)  # (NOTE: Stable, so equal CPMs stay in id order.)
+                    del entries[LEADERBOARD_SIZE:]
+                    thresholds[board] = entries[-1][4]
+
+        # Aggregate the personal bests (best CPM, no. of tests, total CPM):
+        aggregate = personal_bests.get((user, mode))
+        if aggregate is None:
+            personal_bests[(user, mode)] = [cpm, 1, cpm]
+        else:
+            aggregate[0] = max(aggregate[0], cpm)
+            aggregate[1] += 1
+            aggregate[2] += cpm
+
+    # Read the no. of entries and lowest CPM of the boards already in the database (through the boards' index):
+    existing_boards = {}
+    boards = list(candidates)
+    for start in range(0, len(boards), 900):  # (Within SQLite's limit on the no. of query parameters.)
+        part = boards[start:start + 900]
+        for board, entry_count, lowest_cpm in connection.execute(
+                f"SELECT board, COUNT(*), MIN(cpm) FROM leaderboard_entries WHERE board IN ({','.join('?' * len(part))}) "
+                "GROUP BY board", part):
+            existing_boards[board] = (entry_count, lowest_cpm)
+
+    # Add each board's best K results (skipping those which cannot enter a full board), then trim only the boards
+    # which have grown past K entries:
+    entries_to_insert = []
+    boards_to_trim = []
+    for board, entries in candidates.items():
+        if len(entries) > LEADERBOARD_SIZE:
+            entries.sort(key=get_cpm, reverse=True)
+            del entries[LEADERBOARD_SIZE:]
+        entry_count, lowest_cpm = existing_boards.get(board, (0, None))
+        if entry_count >= LEADERBOARD_SIZE:
+            entries = [entry for entry in entries if entry[4] > lowest_cpm]
+        if entry_count + len(entries) > LEADERBOARD_SIZE:
+            boards_to_trim.append((board, board, LEADERBOARD_SIZE))
+        entries_to_insert.extend((board, result_id, user, mode, cpm, wpm, finished_at)
+                                 for result_id, user, mode, finished_at, cpm, wpm in entries)
+    connection.executemany(
+        "INSERT INTO leaderboard_entries (board, result_id, user, mode, cpm, wpm, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        entries_to_insert)
+    connection.executemany(
+        "DELETE FROM leaderboard_entries WHERE board = ? AND result_id NOT IN "
+        "(SELECT result_id FROM leaderboard_entries WHERE board = ? ORDER BY cpm DESC, result_id LIMIT ?)",
+        boards_to_trim)
+
+    # Update the personal-best aggregates:
+    connection.executemany(
+        "INSERT INTO personal_bests (user, mode, best_cpm, tests, total_cpm) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(user, mode) DO UPDATE SET best_cpm = MAX(best_cpm, excluded.best_cpm), "
+        "tests = tests + excluded.tests, total_cpm = total_cpm + excluded.total_cpm",
+        [key + tuple(aggregate) for key, aggregate in personal_bests.items()])
@@ -0,0 +1,234 @@
+# Live leaderboard shared by all instances of the Typing Speed Test application running on one host.
+
+# The top scores are kept in a named 'multiprocessing.shared_memory' segment with a fixed layout: a header (a sequence
+# number and the no. of entries) followed by a table of K fixed-size entries (CPM, WPM, time finished and user), best
+# first.  Writers take a host-wide file lock (so concurrent submissions are never lost), and bump the sequence number
+# to an odd value before changing the table and back to an even value afterwards (a seqlock).  Readers never block:
+# they copy the table and retry if the sequence number was odd or changed meanwhile (so they never see a torn entry).
+# Each instance checks the sequence number once per frame (a single memory read), and only reads the table when it
+# has changed, so new high scores are seen by every instance without polling any file.
+
+# Import necessary library(ies):
+from multiprocessing import resource_tracker, shared_memory
+import os
+import struct
+import tempfile
+import time
+
+# Define constant for the name of the shared-memory segment (shared by all instances on the host):
+SEGMENT_NAME = "typing_speed_test_live_leaderboard"
+
+# Define constant for the number of entries kept in the live leaderboard:
+LIVE_LEADERBOARD_SIZE = 10
+
+# Define constants for the layout of the segment (header, then the entries; user names are UTF-8, zero-padded):
+HEADER = struct.Struct("<QI4x")  # Sequence number (odd while being written), no. of entries
+SEQUENCE = struct.Struct("<Q")
+USER_NAME_SIZE = 32
+ENTRY = struct.Struct(f"<IId{USER_NAME_SIZE}s")  # CPM, WPM, time finished (seconds since the epoch), user
+SEGMENT_SIZE = HEADER.size + LIVE_LEADERBOARD_SIZE * ENTRY.size
+
+# Define constant for the number of times a reader retries before waiting briefly for a (stalled) writer:
+READ_SPINS = 1000
+
+# Import the module used to lock files across processes (depending on the operating system):
+try:
+    import fcntl
+except ImportError:  # Windows.
+    fcntl = None
+    import msvcrt
+
+
+class HostLock:
+    """Class which provides a lock held by one process at a time across the host (on a lock file in the temp. directory)"""
+    __slots__ = ("path", "file")
+
+    def __init__(self, name):
+        self.path = os.path.join(tempfile.gettempdir(), name + ".lock")
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, mode="a+b")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # Still locked by another process after ~10 s of retries; keep waiting.
+                    pass
+        return self
+
+    def __exit__(self, exception_type, exception, exception_traceback):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+class LiveLeaderboard:
+    """Class which reads and updates the live leaderboard in shared memory"""
+    __slots__ = ("name", "memory", "buffer", "lock")
+
+    def __init__(self, name=SEGMENT_NAME):
+        self.name = name
+        self.lock = HostLock(name)
+        self.memory = open_segment(name)
+        self.buffer = self.memory.buf
+
+    def close(self):
+        """Function which detaches from the shared-memory segment (which stays available to other instances)"""
+        self.buffer = None
+        self.memory.close()
+
+    def get_entries(self):
+        """Function which returns a consistent copy of the entries (CPM, WPM, time finished, user), best first"""
+        spins = 0
+        while True:
+            sequence = SEQUENCE.unpack_from(self.buffer, 0)[0]
+            if not sequence & 1:
+                count = HEADER.unpack_from(self.buffer, 0)[1]
+                table = bytes(self.buffer[HEADER.size:HEADER.size + min(count, LIVE_LEADERBOARD_SIZE) * ENTRY.size])
+                if SEQUENCE.unpack_from(self.buffer, 0)[0] == sequence:
+                    return [(cpm, wpm, finished_at, user.rstrip(b"\0").decode("utf-8", errors="replace"))
+                            for cpm, wpm, finished_at, user in ENTRY.iter_unpack(table)]
+
+            # A writer is (or was) changing the table; retry, yielding the processor if the writer seems stalled:
+            spins += 1
+            if spins % READ_SPINS == 0:
+                time.sleep(0.0001)
+
+    def get_high_score(self):
+        """Function which returns the best CPM on the live leaderboard (0 if it is empty)"""
+        entries = self.get_entries()
+        return entries[0][0] if entries else 0
+
+    def get_sequence(self):
+        """Function which returns the sequence number of the leaderboard (which changes whenever the leaderboard does)"""
+        return SEQUENCE.unpack_from(self.buffer, 0)[0]
+
+    def submit(self, user, cpm, wpm, finished_at=None):
+        """Function which submits a score and returns its rank on the live leaderboard (None if it did not make it)"""
+        finished_at = time.time() if finished_at is None else finished_at
+        with self.lock:
+            # Find the rank of the new score (after any equal scores already on the leaderboard):
+            entries = self.get_entries()
+            rank = 0
+            while rank < len(entries) and entries[rank][0] >= cpm:
+                rank += 1
+            if rank >= LIVE_LEADERBOARD_SIZE:
+                return None
+            entries.insert(rank, (cpm, wpm, finished_at, user))
+            del entries[LIVE_LEADERBOARD_SIZE:]
+
+            # Write the entries from the new one onwards, inside a (sequence number) write section:
+            sequence = SEQUENCE.unpack_from(self.buffer, 0)[0]
+            SEQUENCE.pack_into(self.buffer, 0, sequence + 1)
+            for position in range(rank, len(entries)):
+                entry_cpm, entry_wpm, entry_finished_at, entry_user = entries[position]
+                ENTRY.pack_into(self.buffer, HEADER.size + position * ENTRY.size, entry_cpm, entry_wpm,
+                                entry_finished_at, entry_user.encode("utf-8")[:USER_NAME_SIZE])
+            HEADER.pack_into(self.buffer, 0, sequence + 1, len(entries))
+            SEQUENCE.pack_into(self.buffer, 0, sequence + 2)
+            return rank + 1
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def get_stress_score(writer, number):
+    """Function which returns the (unique, and increasing with each submission) score submitted by a writer of the stress test"""
+    return 100 + number * 32 + writer
+
+
+def open_segment(name):
+    """Function which attaches to the named shared-memory segment, creating it (zero-filled, i.e. empty) if needed"""
+    try:
+        memory = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+    except FileExistsError:
+        memory = shared_memory.SharedMemory(name=name)
+
+    # The segment outlives any one instance, so it must not be removed when this process exits (which the resource
+    # tracker would otherwise do):
+    try:
+        resource_tracker.unregister(memory._name, "shared_memory")
+    except Exception:
+        pass
+    return memory
+
+
+def remove_segment(name=SEGMENT_NAME):
+    """Function which removes the named shared-memory segment (e.g., to reset the live leaderboard)"""
+    try:
+        memory = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    memory.close()
+    memory.unlink()
+
+
+def run_stress_writer(name, writer, submissions):
+    """Function which submits scores from one writer process of the stress test (each score identifies its writer)"""
+    board = LiveLeaderboard(name)
+    try:
+        for number in range(submissions):
+            cpm = get_stress_score(writer, number)
+            board.submit(f"{writer}:{number}", cpm, cpm // 5, float(cpm))
+    finally:
+        board.close()
+
+
+if __name__ == '__main__':
+    import subprocess
+    import sys
+
+    # When started as a writer process of the stress test (below), submit the writer's scores and exit:
+    if len(sys.argv) == 5 and sys.argv[1] == "--stress-writer":
+        run_stress_writer(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        sys.exit()
+
+    # Stress test: 32 writer processes (started independently, as app instances are) submit ever-higher scores, so
+    # that every submission changes the leaderboard, while this process reads the leaderboard as fast as it can.
+    # Every read must be consistent (entries sorted, each entry intact), and the final leaderboard must be exactly the
+    # top K of all scores submitted (no lost updates):
+    WRITERS = 32
+    SUBMISSIONS = 2000
+    stress_name = f"{SEGMENT_NAME}_stress_{os.getpid()}"
+    remove_segment(stress_name)
+    board = LiveLeaderboard(stress_name)
+    start = time.perf_counter()
+    processes = [subprocess.Popen([sys.executable, __file__, "--stress-writer", stress_name, str(writer),
+                                   str(SUBMISSIONS)]) for writer in range(WRITERS)]
+
+    reads = 0
+    changes = 0
+    last_sequence = -1
+    while any(process.poll() is None for process in processes):
+        entries = board.get_entries()
+        reads += 1
+        for cpm, wpm, finished_at, user in entries:
+            writer, number = map(int, user.split(":"))
+            assert cpm == get_stress_score(writer, number) and wpm == cpm // 5 and finished_at == cpm, "torn entry"
+        assert [entry[0] for entry in entries] == sorted((entry[0] for entry in entries), reverse=True), "unsorted"
+        sequence = board.get_sequence()
+        if sequence != last_sequence:
+            changes += 1
+            last_sequence = sequence
+    elapsed = time.perf_counter() - start
+    assert all(process.returncode == 0 for process in processes), "writer failed"
+
+    expected = sorted((get_stress_score(writer, number) for writer in range(WRITERS) for number in range(SUBMISSIONS)),
+                      reverse=True)[:LIVE_LEADERBOARD_SIZE]
+    final = [entry[0] for entry in board.get_entries()]
+    print(f"{WRITERS} writers x {SUBMISSIONS} submissions in {elapsed:.2f} s "
+          f"({WRITERS * SUBMISSIONS / elapsed:,.0f} submissions/s, including process start-up)")
+    print(f"{reads:,} consistent reads while writing ({changes:,} distinct versions seen); "
+          f"{board.get_sequence() // 2:,} updates applied")
+    print("Final leaderboard matches the top", LIVE_LEADERBOARD_SIZE, "of all submissions:", final == expected)
+    assert final == expected, "lost update"
+    board.close()
+    remove_segment(stress_name)
+    os.remove(os.path.join(tempfile.gettempdir(), stress_name + ".lock"))
@@ -5,26 +5,124 @@
 # Words per minute (WPM): Divide the CPM by 5 (de facto international standard)
 
 # Import necessary library(ies):
+import atexit
+from contextlib import nullcontext
 from datetime import datetime
-from random import choices
-from time import sleep
+import hashlib
+from time import perf_counter, sleep
 from tkinter import *
+from tkinter import font
 from tkinter import messagebox
+from tkinter import simpledialog
+import os
+import sys
 import traceback
 
-# Import the common-word list to be used for this application (contained in 'data.py'):
-from data import common_words
+# Import the test rules and high-score storage (shared with the terminal application; see 'engine.py'):
+from engine import LENGTH_OF_TEST, NUMBER_OF_WORDS_TO_SELECT, calculate_wpm, read_high_score, write_high_score
 
-# Define constant to store number of words to select at random (from the 'common_words" list) for the current exercise:
-NUMBER_OF_WORDS_TO_SELECT = 900
+# Import the language corpora (the common-word list contained in 'data.py' being the default) and the matcher
+# used to compare (normalised) typed input against the current word:
+from corpus import DEFAULT_LANGUAGE, IncrementalMatcher, fold_text, get_corpus
+
+# Import the functions used to select a random passage of real text (for passage mode) and identify its text file:
+from passage import choose_passage_words, get_file_digest
+
+# Import the functions used to select random snippets of code from an indexed source tree (for code mode; see 'code_snippets.py'):
+from code_snippets import INDENT, MINIMUM_SNIPPETS, NUMBER_OF_LINES_TO_SELECT, choose_code_lines, get_code_index
+
+# Import the difficulty bands of the corpus words, used to choose words with a given mix of difficulties (for graded mode):
+from difficulty import DEFAULT_DIFFICULTY_MIX, choose_graded_words
+
+# Import the seeded test generation and the cache of prepared tests (see 'prepared_tests.py'):
+import prepared_tests
+
+# Import the test history (in which the result of every test is recorded; see 'history.py'):
+import history
+
+# Import the hook (plugin) API, through which plugins are notified of events in the test lifecycle (see 'hooks.py'):
+import hooks
+
+# Import the per-test profilers (switched on by environment variable or command-line flag; see 'profiling.py'):
+import profiling
+
+# Import the session object which holds the state of the current test (see 'session.py'):
+from session import TestSession
+
+# Import the anti-cheat detector, which flags results not (probably) typed by a human (see 'anti_cheat.py'):
+from anti_cheat import CheatDetector
+
+# Import the line layout of the words pane (line breaks precomputed from measured word widths; see 'layout.py'):
+from layout import get_layout
+
+# Import the spaced-repetition queue of each user's error-prone words, some of which are mixed into each new test
+# (see 'review.py'):
+import review
+
+# Import the live leaderboard shared (in shared memory) by all instances of this application on the host, through
+# which new high scores reach every instance (see 'live_leaderboard.py'):
+from live_leaderboard import LiveLeaderboard
+
+# Import the asset cache, from which images are loaded already decoded and scaled (see 'assets.py'):
+from assets import load_image
+
+# Import the highlighting of the next key to press (and of mistyped keys) on the keyboard image (see 'keyboard_highlight.py'):
+from keyboard_highlight import BACKSPACE, KeyHighlighter
+
+# Import the live speed graph, fed with a sample at the end of each second of the test (see 'speed_graph.py'):
+from speed_graph import SpeedGraph
+
+# Import the keystroke log of the current test, and the archive (compressed in blocks) to which the keystrokes of every
+# test are appended (see 'keystroke_archive.py'):
+from keystroke_archive import KEYSTROKE_ARCHIVE_PATH, KeystrokeArchiveWriter, KeystrokeLog
+
+# Import the leaderboards (maintained incrementally as each result is recorded; see 'leaderboard.py'):
+import leaderboard
+
+# Import the trend charts (downsampled from per-day/week/month aggregates maintained as each result is recorded; see 'trends.py'):
+import trends
 
 # Define constants for application default font size as well as window's height and width:
 FONT_NAME = "Arial"
 WINDOW_HEIGHT = 650
 WINDOW_WIDTH = 425
 
-# Define constant for setting the length of each test (in seconds):
-LENGTH_OF_TEST = 60.0
+# Define constant for the scale factor of the keyboard image (e.g., 2 on HiDPI displays):
+KEYBOARD_IMAGE_SCALE = 1
+
+# Define constants for the size (in pixels) of the progress chart:
+CHART_WIDTH = 400
+CHART_HEIGHT = 200
+
+# Define constant for the language of the words to type (see 'corpus.py'):
+LANGUAGE = DEFAULT_LANGUAGE
+
+# Define constants for the source of the words to type ("words" = random words from the corpus of the selected language,
+# "graded" = random words from the corpus in the mix of difficulties designated below (share of easy, medium and hard
+# words; see 'difficulty.py'), "passage" = a random passage from the text file designated below; see 'passage.py'),
+# "code" = random snippets of code (typed line by line) from the source tree designated below; see 'code_snippets.py').
+# (NOTE: Code mode needs a source tree to be designated, with at least MINIMUM_SNIPPETS snippets which fit the words
+# pane; this application's own directory has only a handful.):
+TEST_MODE = "words"
+DIFFICULTY_MIX = DEFAULT_DIFFICULTY_MIX
+PASSAGE_FILE_PATH = "passages.txt"
+CODE_SOURCE_DIRECTORY = None
+
+# Define constant for the share of each new test's words taken from the user's error-prone words which are due for
+# review (0 = none).  (NOTE: Review words are personal, so they are not part of the test's challenge code.):
+REVIEW_FRACTION = 0.1
+
+# Define constant for the test modes in which review words are mixed in and words' outcomes recorded (those whose words
+# are corpus words: not passages, whose real prose would be corrupted and whose tokens carry capitals and punctuation,
+# nor lines of code):
+REVIEW_TEST_MODES = ("words", "graded")
+
+# Define constant for the interval (in milliseconds, about one frame) at which the live leaderboard is checked for changes:
+LIVE_LEADERBOARD_CHECK_INTERVAL = 16
+
+# Define constant for the interval (in milliseconds) at which the keystroke archive is checked for pending sessions
+# which are due to be appended (so sessions are not held indefinitely while the application is idle):
+KEYSTROKE_ARCHIVE_CHECK_INTERVAL = 10000
 
 # Define variable for the GUI (application) window (so that it can be used globally), and make it a TKinter instance:
 window = Tk()
@@ -34,36 +132,112 @@ window = Tk()
 # generating additional errors):
 application_exited = False
 
-# Define list variables for storing words (chosen at random) to display in the application window as well as their
-# ending indices relative to the 'words_to_type' widget:
-words_to_type = []
-words_to_type_indices_end = []
+# Define variable for the state of the current test: words (chosen at random) to display in the application window,
+# the position of the current word, and the test's statistics (CPM, WPM, remaining time, keystrokes, speed samples).
+# The same session object (and its buffers) is reused for every test:
+session = TestSession()
+
+# Define variable for comparing what the user has typed against the current word (normalised incrementally):
+word_matcher = IncrementalMatcher()
+
+# Define variable for detecting pasted text, macros and superhuman bursts during the current test:
+cheat_detector = CheatDetector()
+
+# Define variable for recording the keystrokes (time and character) of the current test, and for the archive to which
+# they are appended once the test has ended (None until the application has started):
+keystroke_log = KeystrokeLog()
+keystroke_archive = None
 
 # Define variable for widgets that must be referenced across functions:
 txt_high_score = Text()
 txt_stats = Text()
 txt_words_to_type = Text()
+words_to_type_font = None
 txt_word_typed = Text()
 button_test = Button()
 
-# Define variable for image to be displayed at top of application window:
+# Define variable for image to be displayed at top of application window, and the highlighter of keys on it:
 img = None
+key_highlighter = None
+
+# Define variable for the live speed graph:
+speed_graph = None
+
+# Define variable for the line of the words pane scrolled to the top (so the pane is only scrolled when it changes):
+words_to_type_top_line = 0
 
-# Define variables for tracking current-test statistics:
-current_test_cpm = 0
-current_test_wpm = 0
-current_test_time_remaining = LENGTH_OF_TEST
+# Define variables for the Text widget indexes of the highlighted word and for the statistics shown (so the widgets
+# are only updated, and their tags only moved, when these change):
+highlighted_word_indexes = None
+displayed_stats = None
+
+# Define variable for the challenge code (from which a test can be reproduced) of the previous test:
+previous_test_challenge_code = ""
 
 # Define variable to track if a test is in progress:
 test_in_progress = False
 
+# Define variable to track if the user has pressed Return to submit the current line of code (code mode only):
+line_submitted = False
+
+# Define variable for the profiler applied to each test (None when profiling is off):
+test_profiler = None
+
+# Define variables for the live leaderboard (None if shared memory is unavailable) and its last sequence number seen:
+live_board = None
+live_board_sequence = None
+
 
 # DEFINE FUNCTIONS TO BE USED FOR THIS APPLICATION (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
-def choose_words():
-    """Function to select at random (from the 'common_words" list) words for the current test"""
+def check_keystroke_archive():
+    """Function which appends the keystroke archive's pending sessions once they are due (even while the application is idle)"""
+    try:
+        keystroke_archive.flush_if_due()
+
+    except:  # An error has occurred.
+        # Update system log with error details (the keystroke archive is not essential, so the application carries on):
+        update_system_log("check_keystroke_archive", traceback.format_exc())
+
+    # Check again after the interval:
+    window.after(KEYSTROKE_ARCHIVE_CHECK_INTERVAL, check_keystroke_archive)
+
+
+def check_live_leaderboard():
+    """Function which shows a new high score achieved in another instance of this application (checked once per frame)"""
+    global live_board_sequence
+
+    try:
+        # Read the leaderboard only if it has changed since it was last checked (a single read of shared memory):
+        sequence = live_board.get_sequence()
+        if sequence != live_board_sequence:
+            live_board_sequence = sequence
+            show_high_score(get_high_score())
+
+    except:  # An error has occurred.
+        # Update system log with error details (the live leaderboard is not essential, so the application carries on):
+        update_system_log("check_live_leaderboard", traceback.format_exc())
+
+    # Check again after the next frame:
+    window.after(LIVE_LEADERBOARD_CHECK_INTERVAL, check_live_leaderboard)
+
+
+def choose_words(rng, number_of_words):
+    """Function to select at random (from the corpus of the selected language, a passage of text or a source tree) words for the current test"""
     try:
-        # Choose words at random to use for the current test:
-        return choices(common_words, k=NUMBER_OF_WORDS_TO_SELECT)
+        # In code mode, choose snippets of code at random (from the index of the source tree) and use their lines:
+        if TEST_MODE == "code":
+            return choose_code_lines(CODE_SOURCE_DIRECTORY, min(number_of_words, NUMBER_OF_LINES_TO_SELECT), rng)
+
+        # In passage mode, choose a passage at random (starting at a paragraph) to use for the current test:
+        if TEST_MODE == "passage":
+            return choose_passage_words(PASSAGE_FILE_PATH, number_of_words, rng)
+
+        # In graded mode, choose words at random from each difficulty band, in the designated mix:
+        if TEST_MODE == "graded":
+            return choose_graded_words(get_corpus(LANGUAGE), rng, number_of_words, DIFFICULTY_MIX)
+
+        # Choose words at random (in proportion to their frequency weights, if the corpus has any) to use for the current test:
+        return get_corpus(LANGUAGE).choose_words(rng, number_of_words)
 
     except:  # An error has occurred.
         # Inform user:
@@ -79,7 +253,14 @@ def choose_words():
 def end_test():
     """Function which ends the current test"""
     try:
-        global txt_word_typed, current_test_cpm, current_test_wpm, current_test_time_remaining, test_in_progress
+        global txt_word_typed, test_in_progress, previous_test_challenge_code
+
+        # If the test is being profiled, stop profiling it and save the profile (before waiting on the user below):
+        if test_profiler is not None:
+            test_profiler.stop(profiling.get_profile_path(test_profiler))
+
+        # Stop highlighting keys on the keyboard image:
+        key_highlighter.hide()
 
         # Display final metrics to user and check if a new high score has been achieved.
         # If an error occurs, exit this application:
@@ -87,13 +268,24 @@ def end_test():
             test_in_progress = False
             exit()
 
+        # Record the result of the test in the test history.  If an error occurs, exit this application:
+        if not record_test_result():
+            test_in_progress = False
+            exit()
+
+        # Notify plugins (if any) that the test has ended:
+        if hooks.on_test_end is not None:
+            hooks.on_test_end(session.cpm, session.wpm, session.get_duration())
+
         # Reset variable to indicate that test is no longer in progress:
         test_in_progress = False
 
         # Change state of button to indicate that test is in progress:
         button_test.config(text="Start Test")
 
-        # Get a new set of words to type in preparation for a new test:
+        # Keep the challenge code of this test (so that it can be retaken), and get a new set of words to type in
+        # preparation for a new test:
+        previous_test_challenge_code = session.challenge_code
         get_words_to_type()
 
         # Reset test to beginning-of-test state, preparing for subsequent word entry by the user.
@@ -124,17 +316,27 @@ def end_test():
         exit()
 
 
+def fill_in_indentation():
+    """Function which fills in the indentation of the current line of code in the entry widget, as an editor would (code mode only)"""
+    global line_submitted
+
+    line_submitted = False
+    if TEST_MODE == "code" and session.has_words_remaining():
+        line = session.get_current_word()
+        indentation = line[:len(line) - len(line.lstrip(" "))]
+        txt_word_typed.insert(0, indentation)
+        cheat_detector.set_text_length(len(indentation))
+
+
 def get_high_score():
     """Function which retrieves the high score to-date (archived in file 'high_score.txt')"""
     try:
         # Open the high-score archive file, retrieve the current high score, and close the file:
         # (NOTE: If the high-score archive file does not exist, high-score will be set to 0).
-        try:
-            with open("high_score.txt", mode="r") as file:
-                high_score_cpm = int(file.read())
-                file.close()
-        except FileNotFoundError:  # Archive file not found.
-            high_score_cpm = 0
+        # A higher score on the live leaderboard (e.g., just achieved in another instance) takes precedence:
+        high_score_cpm = read_high_score()
+        if live_board is not None:
+            high_score_cpm = max(high_score_cpm, live_board.get_high_score())
 
         # Return the retrieved high score to the calling function:
         return high_score_cpm
@@ -150,34 +352,75 @@ def get_high_score():
         return False
 
 
-def get_words_to_type():
-    """Function to select words at random and display them in the application window for the user to type during the test"""
-    global words_to_type, words_to_type_indices_end
+def get_review_test(prepared_test):
+    """Function which returns a copy of a prepared test with some words replaced by the user's words due for review"""
+    connection = history.connect()
+    try:
+        review_words = review.choose_review_words(connection, history.get_current_user(),
+                                                  int(len(prepared_test.words) * REVIEW_FRACTION))
+    finally:
+        connection.close()
+    if not review_words:
+        return prepared_test
+    # (NOTE: The key identifies the review words by a stable digest, unlike 'hash', which varies between processes.)
+    review_digest = hashlib.sha256("\0".join(review_words).encode("utf-8")).hexdigest()[:16]
+    return prepared_tests.PreparedTest(prepared_test.key + ":review:" + review_digest,
+                                       review.mix_review_words(prepared_test.words, review_words))
+
+
+def get_word_source_digest():
+    """Function which returns the digest identifying the source of the words to type (corpus, passage file or source tree)"""
+    if TEST_MODE == "passage":
+        return get_file_digest(PASSAGE_FILE_PATH)
+    if TEST_MODE == "code":
+        # Refuse code mode unless a source tree with enough snippets (for tests which do not repeat) is designated:
+        if CODE_SOURCE_DIRECTORY is None:
+            raise ValueError("Code mode needs a source tree: designate it in CODE_SOURCE_DIRECTORY.")
+        code_index = get_code_index(CODE_SOURCE_DIRECTORY)
+        if len(code_index.snippets) < MINIMUM_SNIPPETS:
+            raise ValueError(f"The source tree '{CODE_SOURCE_DIRECTORY}' has only {len(code_index.snippets)} snippets "
+                             f"which fit the words pane (code mode needs at least {MINIMUM_SNIPPETS}).")
+        return code_index.digest
+    return get_corpus(LANGUAGE).digest
+
+
+def get_words_to_type(seed=None):
+    """Function to select words at random (reproducibly, from the given or a new seed) and display them in the application window for the user to type during the test"""
+    global highlighted_word_indexes
 
     try:
-        # Choose words (at random) for user to type. If an error occurs, return failed-execution indication to the
-        # calling function:
-        words_to_type = choose_words()
-        if not words_to_type:
+        # Get the prepared test for the seed: words chosen (at random) for user to type, and one string which contains
+        # them.  Tests are cached, so retakes and challenges load without being chosen again.
+        # If an error occurs, return failed-execution indication to the calling function:
+        new_test = seed is None
+        if new_test:
+            seed = prepared_tests.new_seed()
+        source_digest = get_word_source_digest()
+        # (NOTE: In code mode, each "word" is a line of code, followed by a line break rather than a space.)
+        separator = prepared_tests.LINE_SEPARATOR if TEST_MODE == "code" else prepared_tests.WORD_SEPARATOR
+        prepared_test = prepared_tests.get_prepared_test(TEST_MODE, seed, source_digest, NUMBER_OF_WORDS_TO_SELECT, choose_words, separator)
+        if prepared_test is None:
             return False
 
-        # Comprise one string which contains the selected words:
-        words_to_type_string = ""
-        for word in words_to_type:
-            words_to_type_string += word + " "
+        # For a new test (rather than a retake or challenge), replace some of the words with the user's error-prone
+        # words which are due for review (only in the modes whose words are corpus words):
+        if REVIEW_FRACTION > 0 and new_test and TEST_MODE in REVIEW_TEST_MODES:
+            prepared_test = get_review_test(prepared_test)
 
-        # Display chosen words in the application window (at the designated textbox):
+        # Break the words into lines which fit the 'words to type' widget (measured in the widget's font), so that the
+        # position of every word is known in advance:
+        layout = get_layout(prepared_test, words_to_type_font,
+                            int(txt_words_to_type.cget("width")) * words_to_type_font.measure("0"))
+        session.load(prepared_test, prepared_tests.format_challenge_code(TEST_MODE, seed, source_digest), layout)
+
+        # Display chosen words in the application window (at the designated textbox), scrolled to the top:
+        # (NOTE: Deleting the previous words also removes their tags, including the highlight.)
         txt_words_to_type.config(state="normal")
         txt_words_to_type.delete(1.0, 'end')
-        txt_words_to_type.tag_configure("center", justify="center")
-        txt_words_to_type.insert(1.0, chars=words_to_type_string)
-        txt_words_to_type.tag_add("left", "1.0", "end")
-        txt_words_to_type.config(wrap=WORD, state="disabled")
-
-        # Capture indices to use when highlighting each word in the 'words_to_type' widget.
-        # If an error occurs, return failed-execution indication to the calling function:
-        if not get_words_to_type_update_indices():
-            return False
+        txt_words_to_type.insert(1.0, chars=layout.text)
+        txt_words_to_type.config(wrap=NONE, state="disabled")
+        highlighted_word_indexes = None
+        scroll_to_current_word(force=True)
 
         # Return successful-execution indication to the calling function:
         return True
@@ -193,30 +436,59 @@ def get_words_to_type():
         return False
 
 
-def get_words_to_type_update_indices():
-    """Function which captures indices to use when highlighting each word in the 'words_to_type' widget"""
-    global words_to_type, words_to_type_indices_end
+def handle_keystroke(event):
+    """Function which counts the characters typed by the user (used to calculate the accuracy of the current test)"""
+    # Count only keystrokes which produce a character (e.g., not Shift or BackSpace) while a test is in progress:
+    if test_in_progress and event.char and event.char.isprintable():
+        session.record_keystroke()
+        cheat_detector.record_keystroke(perf_counter())
 
-    try:
-        # Capture ending indices to use when highlighting each word in the 'words_to_type' widget:
-        words_to_type_indices_end = []
-        i = 0
-        for word in words_to_type:
-            words_to_type_indices_end.append("1."+str(int(i + len(word)+1)))
-            i += len(word)
+    # Log every character-producing keystroke (including backspaces) for the keystroke archive:
+    if test_in_progress and event.char:
+        keystroke_log.record(perf_counter(), event.char)
 
-        # Return successful-execution indication to the calling function:
-        return True
+    # Once the entry widget has processed the keystroke, highlight the next key to press (flashing the key pressed if
+    # it was wrong):
+    if test_in_progress:
+        window.after_idle(update_key_highlight, event.char if event.char.isprintable() else None)
 
-    except:  # An error has occurred.
-        # Inform user:
-        messagebox.showinfo("Error", f"Error (get_words_to_type_update_indices): {traceback.format_exc()}")
+    # Notify plugins (if any) of the keystroke:
+    if test_in_progress and hooks.on_keystroke is not None:
+        hooks.on_keystroke(event.char, event.keysym)
 
-        # Update system log with error details:
-        update_system_log("get_words_to_type_update_indices", traceback.format_exc())
 
-        # Return failed-execution indication to the calling function:
-        return False
+def handle_paste(event):
+    """Function which records that the user has pasted text into the entry widget (flagging the current test as suspect)"""
+    if test_in_progress:
+        cheat_detector.record_paste()
+
+
+def handle_return(event):
+    """Function which records that the user has pressed Return to submit the current line of code (code mode only)"""
+    global line_submitted
+
+    # (NOTE: This binding takes precedence over the entry widget's '<Key>' binding, so the keystroke is handled here.)
+    handle_keystroke(event)
+    if test_in_progress:
+        line_submitted = True
+
+
+def handle_tab(event):
+    """Function which indents what the user has typed to the next level of nesting (code mode only), keeping the focus in the entry widget"""
+    # (NOTE: This binding takes precedence over the entry widget's '<Key>' binding, so the keystroke is handled here.)
+    handle_keystroke(event)
+
+    # Outside code mode, Tab moves the focus to the next widget as usual:
+    if TEST_MODE != "code":
+        return None
+
+    if test_in_progress:
+        txt_word_typed.insert("insert", INDENT[:len(INDENT) - txt_word_typed.index("insert") % len(INDENT)])
+
+        # The application (not the user) has inserted the spaces, so the anti-cheat detector must not count them:
+        cheat_detector.set_text_length(len(txt_word_typed.get()))
+        window.after_idle(update_key_highlight)
+    return "break"
 
 
 def handle_window_on_closing():
@@ -237,10 +509,19 @@ def handle_window_on_closing():
 
 def highlight_current_word(start_index, end_index):
     """Function to highlight the current word in the 'txt_words_to_type' widget"""
+    global highlighted_word_indexes
+
     try:
-        # Highlight current word:
+        # If the current word is already highlighted (i.e., on every tick until it has been typed), there is nothing to do:
+        if (start_index, end_index) == highlighted_word_indexes:
+            return True
+
+        # Highlight current word (removing the highlight from the previous word, which is no longer deleted once typed):
+        # (NOTE: The "start" tag is configured once, when the widget is created, so only its one range is moved here.)
+        if highlighted_word_indexes is not None:
+            txt_words_to_type.tag_remove("start", *highlighted_word_indexes)
         txt_words_to_type.tag_add("start", start_index, end_index)
-        txt_words_to_type.tag_config("start", background="yellow", foreground="blue")
+        highlighted_word_indexes = (start_index, end_index)
 
         # Update the application window to reflect the updates executed above:
         window.update()
@@ -259,10 +540,90 @@ def highlight_current_word(start_index, end_index):
         return False
 
 
+def record_test_result():
+    """Function which records the result of the current test in the test history (see 'history.py')"""
+    try:
+        # Calculate the duration and accuracy (share of typed characters belonging to correctly typed words) of the test:
+        duration = round(session.get_duration(), 2)
+        accuracy = min(1.0, session.cpm / session.keystrokes) if session.keystrokes else 0.0
+
+        # Record the result:
+        connection = history.connect()
+        try:
+            user = history.get_current_user()
+            suspect = bool(cheat_detector.get_suspicion_reasons(session.cpm))
+            history.record_result(connection, user, TEST_MODE, duration, session.cpm,
+                                  session.wpm, accuracy, session.get_speed_samples(), suspect=suspect)
+
+            # Update the user's error-prone words with the words mistyped and typed correctly in the test (only in the
+            # modes whose words are corpus words):
+            if TEST_MODE in REVIEW_TEST_MODES:
+                review.record_word_outcomes(connection, user, session.mistyped_words, session.get_completed_words())
+        finally:
+            connection.close()
+
+        # Add the test's keystrokes to the keystroke archive (if the archive cannot be written, carry on without it):
+        try:
+            keystroke_archive.add_session(user, TEST_MODE, keystroke_log)
+        except:
+            update_system_log("record_test_result", traceback.format_exc())
+
+        # Return successful-execution indication to the calling function:
+        return True
+
+    except:  # An error has occurred.
+        # Inform user:
+        messagebox.showinfo("Error", f"Error (record_test_result): {traceback.format_exc()}")
+
+        # Update system log with error details:
+        update_system_log("record_test_result", traceback.format_exc())
+
+        # Return failed-execution indication to the calling function:
+        return False
+
+
+def load_challenge():
+    """Function which loads the test for a challenge code entered by the user (by default, the previous test, to retake it)"""
+    try:
+        # Challenges can only be loaded between tests:
+        if test_in_progress:
+            return True
+
+        # Ask the user for the challenge code:
+        code = simpledialog.askstring("Challenge", "Enter a challenge code (or keep the code of the previous test to retake it):", initialvalue=previous_test_challenge_code or session.challenge_code, parent=window)
+        if not code:
+            return True
+
+        # Check that the challenge was created with the current test mode and word source:
+        try:
+            mode, seed, source_digest = prepared_tests.parse_challenge_code(code)
+        except ValueError:
+            messagebox.showinfo("Challenge", "This is not a valid challenge code.")
+            return True
+        if mode != TEST_MODE or not get_word_source_digest().startswith(source_digest):
+            messagebox.showinfo("Challenge", "This challenge was created with a different test mode or word list.")
+            return True
+
+        # Load the test for the challenge.  If an error occurs, return failed-execution indication to the calling function:
+        if not get_words_to_type(seed):
+            return False
+
+        # Return successful-execution indication to the calling function:
+        return True
+
+    except:  # An error has occurred.
+        # Inform user:
+        messagebox.showinfo("Error", f"Error (load_challenge): {traceback.format_exc()}")
+
+        # Update system log with error details:
+        update_system_log("load_challenge", traceback.format_exc())
+
+        # Return failed-execution indication to the calling function:
+        return False
+
+
 def reset_test_to_beginning():
     """Function which clears the entry widget of its contents and performs supporting functionality"""
-    global current_test_cpm, current_test_wpm, current_test_time_remaining
-
     try:
         # Clear the entry widget of its contents, preparing for subsequent word entry by the user:
         txt_word_typed.config(state="normal")
@@ -272,9 +633,7 @@ def reset_test_to_beginning():
         # If test is not in progress (e.g., in "beginning-of-test" state), perform the following:
         if not test_in_progress:
             # Reset CPM, WPM, and remaining time metrics in preparation for a new test:
-            current_test_cpm = 0
-            current_test_wpm = 0
-            current_test_time_remaining = LENGTH_OF_TEST
+            session.reset_metrics()
 
             # Update the application with the beginning-of-test statistics (i.e., CPM, WPM, remaining time).
             # If an error occurs, return failed-execution indication to the calling function:
@@ -309,9 +668,39 @@ def reset_test_to_beginning():
         return False
 
 
+def reset_word_matcher():
+    """Function which prepares the matcher for the current word (folded, or in code mode matched exactly as typed)"""
+    word = session.get_current_word()
+    if TEST_MODE == "code":
+        word_matcher.reset(word, exact=True)
+    else:
+        word_matcher.reset(get_corpus(LANGUAGE).get_folded(word))
+
+
 def run_app():
     """Main function used to run this application"""
+    global test_profiler, live_board, keystroke_archive
+
     try:
+        # Create the profiler applied to each test, if profiling has been switched on:
+        test_profiler = profiling.create_profiler(sys.argv[1:], os.environ)
+
+        # Attach to the live leaderboard shared by the instances of this application on the host (if shared memory is
+        # unavailable, carry on with the high-score file only):
+        try:
+            live_board = LiveLeaderboard()
+        except:
+            update_system_log("run_app", traceback.format_exc())
+
+        # Open the keystroke archive, appending any sessions still pending (not yet compressed into a block) when this
+        # application exits:
+        keystroke_archive = KeystrokeArchiveWriter(KEYSTROKE_ARCHIVE_PATH)
+        atexit.register(keystroke_archive.close)
+
+        # Load the plugins (if any) designated by the environment, reporting errors raised by their hooks in the system log:
+        hooks.error_handler = update_system_log
+        hooks.load_plugins(os.environ.get(hooks.PLUGINS_ENVIRONMENT_VARIABLE, ""))
+
         # Creates and configure all visible aspects of the application window.  If an error occurs,
         # exit this application:
         if not window_config():
@@ -322,6 +711,13 @@ def run_app():
         if not get_words_to_type():
             exit()
 
+        # Start checking the live leaderboard for new high scores achieved in other instances:
+        if live_board is not None:
+            check_live_leaderboard()
+
+        # Start checking the keystroke archive for pending sessions which are due to be appended:
+        window.after(KEYSTROKE_ARCHIVE_CHECK_INTERVAL, check_keystroke_archive)
+
         # From this point, test will start and end based on user's use of the start/end button, with subsequent
         # functionality defined from there.
 
@@ -347,13 +743,11 @@ def run_app():
 
 def run_test():
     """Function which runs the typing test"""
-    global current_test_cpm, current_test_wpm, current_test_time_remaining, test_in_progress, application_exited
+    global test_in_progress, application_exited, line_submitted
 
     try:
-        # Reset CPM, WPM, and remaining time metrics in preparation for a new test:
-        current_test_cpm = 0
-        current_test_wpm = 0
-        current_test_time_remaining = LENGTH_OF_TEST
+        # Reset CPM, WPM, remaining time, keystroke count and speed samples in preparation for a new test:
+        session.reset_metrics()
 
         # Update the application with the beginning-of-test statistics (i.e., CPM, WPM, remaining time).
         # If an error occurs, exit this application:
@@ -366,65 +760,111 @@ def run_test():
         # Indicate that a new test is now in progress (used in the 'while' loop below):
         test_in_progress = True
 
+        # Prepare the matcher for the first word to type, and the anti-cheat detector for the new test:
+        reset_word_matcher()
+        cheat_detector.reset()
+        keystroke_log.reset()
+        update_key_highlight()
+
+        # Clear the live speed graph of the previous test:
+        speed_graph.reset()
+
+        # If profiling has been switched on, start profiling the test:
+        if test_profiler is not None:
+            test_profiler.start()
+
         # Reset test to beginning-of-test state, preparing for subsequent word entry by the user.
         # If an error occurs, exit this application:
         if not reset_test_to_beginning():
             exit()
 
+        # In code mode, fill in the indentation of the first line of code:
+        fill_in_indentation()
+
+        # Notify plugins (if any) that the test has started:
+        if hooks.on_test_start is not None:
+            hooks.on_test_start()
+
         # Count down the time remaining in the current test. Also, update the current CPM and WPM stats after each successfully typed word:
-        i = 0  # Index of the current word:
         while test_in_progress:
             # If no time remains in the current test, end the test:
-            if current_test_time_remaining <= 0:
+            if session.time_remaining <= 0:
                 test_in_progress = False
                 end_test()  # If error occurs in ending test, the "end_test" function itself will exit this application.
 
             else:  # Time remains on the current test.
                 # If all of the words to type have NOT been completed, highlight the word to text and respond to user's entry:
-                if i < len(words_to_type):
+                if session.has_words_remaining():
                     # Highlight, in YELLOW, the current word in the 'words_to_type' widget indicate in-progress state.
                     # If an error occurs, exit this application:
-                    if not highlight_current_word("1.0", words_to_type_indices_end[0]):
+                    if not highlight_current_word(session.current_word_start_index, session.current_word_end_index):
                         test_in_progress = False
                         exit()
 
-                    # If user has fully and correctly typed the current word, remove it from the 'words_to_type' widget,
-                    # and associated variables, and update the CPM and WPM stats so far for this test:
-                    if txt_word_typed.get() == words_to_type[0]:
+                    # Fold what the user has typed so far (only the newly typed characters are normalised), and check
+                    # that it has grown by no more than the keystrokes made (i.e., no multi-character inserts):
+                    word_typed = txt_word_typed.get()
+                    word_matcher.update(word_typed)
+                    cheat_detector.record_text_length(len(word_typed))
+
+                    # If what the user has typed is not a correct beginning of the current word, record the mistype
+                    # (for the review of error-prone words):
+                    if not session.current_word_mistyped and not word_matcher.is_prefix():
+                        session.record_mistype()
+
+                    # If user has fully and correctly typed the current word (in code mode, the current line of code,
+                    # submitted with Return), remove it from the 'words_to_type' widget, move on to the next word, and
+                    # update the CPM and WPM stats so far for this test:
+                    if word_matcher.is_match() and (line_submitted or TEST_MODE != "code"):
                         # Clear out the user entry widget:
                         txt_word_typed.delete(0, END)
+                        cheat_detector.record_text_length(0)
+
+                        # Mark the word (and all words before it) as typed in the 'words_to_type' widget:
+                        txt_words_to_type.tag_add("typed", "1.0", session.current_word_end_index)
 
-                        # Remove the word from the 'words_to_type' widget:
-                        txt_words_to_type.config(state='normal')
-                        txt_words_to_type.delete("1.0", words_to_type_indices_end[0])
-                        txt_words_to_type.config(state='disabled')
+                        # Update the CPM and WPM totals for the current test, and move on to the next word (scrolling
+                        # the 'words_to_type' widget if the next word is on another line):
+                        completed_word = session.get_current_word()
+                        session.complete_current_word()
+                        scroll_to_current_word()
 
-                        # Update the CPM and WPM totals for the current test:
-                        current_test_cpm += len(words_to_type[i])
-                        current_test_wpm = int(round(current_test_cpm / 5, 0))
+                        # Notify plugins (if any) that the word has been completed:
+                        if hooks.on_word_completed is not None:
+                            hooks.on_word_completed(completed_word, session.cpm, session.wpm)
 
-                        # Remove the word and its ending index from relevant variables:
-                        del words_to_type[0]
+                        # Prepare the matcher for the next word (if any), filling in its indentation in code mode:
+                        if session.has_words_remaining():
+                            reset_word_matcher()
+                            fill_in_indentation()
+                            update_key_highlight()
 
-                        # Update indices.  If an error occurs, exit this application:
-                        if not get_words_to_type_update_indices():
-                            test_in_progress = False
-                            exit()
+                    else:  # (NOTE: Return pressed before the current line of code is complete is ignored.)
+                        line_submitted = False
 
                 else:  # All words have been typed in fully and correctly.
                     test_in_progress = False
                     end_test()  # If error occurs in ending test, the "end_test" function itself will exit this application.
 
                 # Deduct 0.01 seconds from the remaining time for the current test:
-                current_test_time_remaining -= 0.01
+                session.time_remaining -= 0.01
                 sleep(0.01)
 
+                # At the end of each second of the test, record a sample of the speed (CPM) so far:
+                # (NOTE: Each sample is also added to the live speed graph.)
+                if session.record_speed_sample_if_due():
+                    speed_graph.add_sample(session.cpm)
+
                 # Update the application with the current test's statistics (i.e., CPM, WPM, remaining time).
                 # If an error occurs, exit this application:
                 if not update_stats():
                     test_in_progress = False
                     exit()
 
+                # Notify plugins (if any) of the tick:
+                if hooks.on_tick is not None:
+                    hooks.on_tick(session.cpm, session.wpm, session.time_remaining)
+
                 # Update the application window to reflect the updates executed above:
                 window.update()
 
@@ -451,6 +891,18 @@ def run_test():
         exit()
 
 
+def scroll_to_current_word(force=False):
+    """Function which scrolls the 'txt_words_to_type' widget (when needed) so the current word's line is near the top"""
+    global words_to_type_top_line
+
+    # Keep the line before the current word's line visible (so the user sees the words just typed), scrolling with a
+    # single 'yview' call only when that changes the top line:
+    top_line = max(0, session.current_word_line - 1)
+    if force or top_line != words_to_type_top_line:
+        txt_words_to_type.yview(str(top_line + 1) + ".0")
+        words_to_type_top_line = top_line
+
+
 def show_final_metrics():
     """Function to show the final metrics (i.e., CPM and WPM) for the current test (including info. on if a new high score has been achieved)"""
     try:
@@ -459,12 +911,19 @@ def show_final_metrics():
         previous_high_score_cpm = get_high_score()
         if not previous_high_score_cpm:
             return False
-        previous_high_score_wpm = int(round(previous_high_score_cpm / 5, 0))
+        previous_high_score_wpm = calculate_wpm(previous_high_score_cpm)
+
+        # Check whether the result is suspected of cheating (e.g., pasted text or superhuman bursts).  Suspect results
+        # cannot set a new high score:
+        suspicion_reasons = cheat_detector.get_suspicion_reasons(session.cpm)
 
         # If a new high score has been achieved, archive it and include as part of the final-metrics message box to user:
-        if current_test_cpm > previous_high_score_cpm:  # New high score has been achieved.
+        if suspicion_reasons:  # Result is suspect.
+            high_score_added_message = "\n\nThis result has been flagged and does not count towards the high score:\n" + "\n".join(suspicion_reasons)
+
+        elif session.cpm > previous_high_score_cpm:  # New high score has been achieved.
             # Archive the new high score.  If an error occurs, return failed-execution indication to the calling function:
-            if not update_high_score(current_test_cpm):
+            if not update_high_score(session.cpm):
                 return False
 
             # Prepare an "addendum" to the final-metrics message box to be shown to the user:
@@ -473,8 +932,13 @@ def show_final_metrics():
         else:  # New high score has NOT been achieved.
             high_score_added_message = ""
 
+        # Submit the result to the live leaderboard (unless it is suspect) before the (modal) final-metrics message box
+        # is shown, so that other instances see it within a frame rather than once the user has dismissed the box:
+        if live_board is not None and not suspicion_reasons:
+            live_board.submit(history.get_current_user(), session.cpm, session.wpm)
+
         # Display the final-metrics message box to the user:
-        messagebox.showinfo(title="Test has ended", message=f"FINAL METRICS:\nCPM: {current_test_cpm}\nWPM: {current_test_wpm}{high_score_added_message}")
+        messagebox.showinfo(title="Test has ended", message=f"FINAL METRICS:\nCPM: {session.cpm}\nWPM: {session.wpm}{high_score_added_message}\n\nChallenge code (to retake or share this test):\n{session.challenge_code}")
 
         # Return successful-execution indication to the calling function:
         return True
@@ -490,23 +954,128 @@ def show_final_metrics():
         return False
 
 
+def show_high_score(high_score_cpm):
+    """Function which shows the high score in the application window"""
+    # (NOTE: The "center" tag is configured once, when the widget is created, and applied to the text as it is inserted.)
+    txt_high_score.config(state="normal")
+    txt_high_score.replace(1.0, END, "HIGH SCORE: " + str(high_score_cpm) + " CPM (" + str(calculate_wpm(high_score_cpm)) + " WPM)", "center")
+    txt_high_score.config(state="disabled")
+
+
+def show_leaderboards():
+    """Function which shows the leaderboards (by day, week and all-time; overall, for the current user and test mode)"""
+    try:
+        # Define the leaderboards which may be shown (title -> period, scope):
+        user = history.get_current_user()
+        boards = {
+            "Today": (leaderboard.PERIOD_DAY, "all"),
+            "This Week": (leaderboard.PERIOD_WEEK, "all"),
+            "All-Time": (leaderboard.PERIOD_ALL_TIME, "all"),
+            "My Best (This Week)": (leaderboard.PERIOD_WEEK, "user:" + user),
+            "My Best (All-Time)": (leaderboard.PERIOD_ALL_TIME, "user:" + user),
+            "This Mode (All-Time)": (leaderboard.PERIOD_ALL_TIME, "mode:" + TEST_MODE),
+        }
+
+        # Create and configure the leaderboard window, with a menu to select the leaderboard and a text widget to show it:
+        window_leaderboards = Toplevel(window, padx=20, pady=10, bg='white')
+        window_leaderboards.title("Leaderboards")
+        window_leaderboards.resizable(0, 0)
+        selected_board = StringVar(window_leaderboards, value="Today")
+        txt_leaderboard = Text(window_leaderboards, width=45, height=leaderboard.LEADERBOARD_SIZE + 2, bg='white', fg='black', bd=0, highlightthickness=0, font=(FONT_NAME,10,"normal"))
+
+        def show_selected_board(*args):
+            # Read the (at most K) entries of the selected leaderboard and display them:
+            connection = history.connect()
+            try:
+                entries = leaderboard.get_leaderboard(connection, *boards[selected_board.get()])
+            finally:
+                connection.close()
+            txt_leaderboard.config(state="normal")
+            txt_leaderboard.delete(1.0, END)
+            txt_leaderboard.insert(1.0, "\n".join(f"{rank:>2}. {entry_user:<20} {cpm:>4} CPM ({wpm} WPM)  [{mode}]" for rank, entry_user, mode, cpm, wpm, finished_at in entries) or "No results yet.")
+            txt_leaderboard.config(state="disabled")
+
+        OptionMenu(window_leaderboards, selected_board, *boards, command=show_selected_board).grid(column=0, row=0)
+        txt_leaderboard.grid(column=0, row=1, pady=10)
+        show_selected_board()
+
+        # Create and configure button used to show the current user's progress over time:
+        Button(window_leaderboards, text="My Progress", width=20, height=1, bg='white', fg='red', pady=0, font=(FONT_NAME,10,"bold"), command=show_progress_chart).grid(column=0, row=2)
+
+        # Return successful-execution indication to the calling function:
+        return True
+
+    except:  # An error has occurred.
+        # Inform user:
+        messagebox.showinfo("Error", f"Error (show_leaderboards): {traceback.format_exc()}")
+
+        # Update system log with error details:
+        update_system_log("show_leaderboards", traceback.format_exc())
+
+        # Return failed-execution indication to the calling function:
+        return False
+
+
+def show_progress_chart():
+    """Function which shows a chart of the current user's speed (CPM) over all of their recorded tests"""
+    try:
+        # Read the user's series, downsampled to the width of the chart (from the finest level of aggregates which fits):
+        connection = history.connect()
+        try:
+            level, points = trends.get_trend_series(connection, history.get_current_user(), CHART_WIDTH)
+        finally:
+            connection.close()
+
+        # Create and configure the chart window:
+        window_chart = Toplevel(window, padx=20, pady=10, bg='white')
+        window_chart.title("My Progress")
+        window_chart.resizable(0, 0)
+        canvas_chart = Canvas(window_chart, width=CHART_WIDTH, height=CHART_HEIGHT, bg='white', highlightthickness=0)
+        canvas_chart.grid(column=0, row=1)
+        if len(points) < 2:
+            Label(window_chart, text="Not enough results yet.", bg='white', font=(FONT_NAME,10,"normal")).grid(column=0, row=0)
+            return True
+
+        # Scale the points to the chart and draw them as a single line:
+        first_time, last_time = points[0][0], points[-1][0]
+        lowest_cpm = min(cpm for finished_at, cpm in points)
+        highest_cpm = max(cpm for finished_at, cpm in points)
+        x_scale = (CHART_WIDTH - 1) / ((last_time - first_time) or 1)
+        y_scale = (CHART_HEIGHT - 2) / ((highest_cpm - lowest_cpm) or 1)
+        canvas_chart.create_line(*[coordinate for finished_at, cpm in points for coordinate in ((finished_at - first_time) * x_scale, CHART_HEIGHT - 1 - (cpm - lowest_cpm) * y_scale)], fill='red', width=1)
+
+        # Label the chart with the period covered, the CPM range and the level of detail:
+        period = datetime.fromtimestamp(first_time).strftime("%Y-%m-%d") + " to " + datetime.fromtimestamp(last_time).strftime("%Y-%m-%d")
+        detail = "each test" if level == trends.LEVEL_TEST else "average per " + level
+        Label(window_chart, text=f"{period}: {round(lowest_cpm)} to {round(highest_cpm)} CPM ({detail})", bg='white', font=(FONT_NAME,10,"normal")).grid(column=0, row=0)
+
+        # Return successful-execution indication to the calling function:
+        return True
+
+    except:  # An error has occurred.
+        # Inform user:
+        messagebox.showinfo("Error", f"Error (show_progress_chart): {traceback.format_exc()}")
+
+        # Update system log with error details:
+        update_system_log("show_progress_chart", traceback.format_exc())
+
+        # Return failed-execution indication to the calling function:
+        return False
+
+
 def update_high_score(new_high_score_cpm):
     """Function which archives a new high score to file 'high_score.txt'"""
     global txt_high_score
 
     try:
-        # Open the high-score archive file, store the new high score, and close the file:
-        with open("high_score.txt", mode="w") as file:
-            file.write(str(new_high_score_cpm))
-            file.close()
+        # Open the high-score archive file, store the new high score, and close the file.  Other instances may be doing
+        # the same, so this is done under the live leaderboard's host-wide lock, and only if the score is still higher:
+        with live_board.lock if live_board is not None else nullcontext():
+            if new_high_score_cpm > read_high_score():
+                write_high_score(new_high_score_cpm)
 
         # Update the application window to show the new high score:
-        new_high_score_wpm = int(round(new_high_score_cpm / 5, 0))
-        txt_high_score.config(state="normal")
-        txt_high_score.tag_configure("center", justify='center')
-        txt_high_score.replace(1.0, END, "HIGH SCORE: " + str(new_high_score_cpm) + " CPM (" + str(new_high_score_wpm) + " WPM)")
-        txt_high_score.tag_add("center", "1.0", "end")
-        txt_high_score.config(state="disabled")
+        show_high_score(new_high_score_cpm)
 
         # Return successful-execution indication to the calling function:
         return True
@@ -522,17 +1091,42 @@ def update_high_score(new_high_score_cpm):
         return False
 
 
+def update_key_highlight(last_character=None):
+    """Function which highlights the next key to press on the keyboard image, flashing the key just pressed if it was wrong"""
+    if not test_in_progress or not session.has_words_remaining():
+        key_highlighter.hide()
+        return
+
+    # If what the user has typed is a correct beginning of the current word, highlight the word's next character (or
+    # the space bar, or Return in code mode, once it is complete); otherwise, highlight the Backspace key:
+    word = session.get_current_word()
+    typed = txt_word_typed.get()
+    if TEST_MODE == "code":  # (NOTE: Lines of code are matched exactly, as typed.)
+        typed_correctly = word.startswith(typed)
+    else:
+        typed_correctly = get_corpus(LANGUAGE).get_folded(word).startswith(fold_text(typed))
+    if typed_correctly:
+        key_highlighter.show_next_key(word[len(typed)] if len(typed) < len(word) else ("\n" if TEST_MODE == "code" else " "))
+    else:
+        if last_character:
+            key_highlighter.flash_mistyped_key(last_character)
+        key_highlighter.show_next_key(BACKSPACE)
+
+
 def update_stats():
     """Function which updates the application window with the current test's statistics"""
-    global current_test_cpm, current_test_wpm, current_test_time_remaining
+    global displayed_stats
 
     try:
-        # Update the application window to show the current test's statistics (i.e., CPM, WPM, remaining time):
-        txt_stats.config(state="normal")
-        txt_stats.tag_configure("center", justify='center')
-        txt_stats.replace(1.0, END, "CPM: " + str(current_test_cpm) + "     WPM: " + str(current_test_wpm) + "     Remaining Time: " + str(abs(round(current_test_time_remaining,1))))
-        txt_stats.tag_add("center", "1.0", "end")
-        txt_stats.config(state="disabled")
+        # Update the application window to show the current test's statistics (i.e., CPM, WPM, remaining time), if they
+        # have changed since they were last shown (the remaining time is shown to 0.1 seconds, so on one tick in ten):
+        # (NOTE: The "center" tag is configured once, when the widget is created, and applied to the text as it is inserted.)
+        stats = "CPM: " + str(session.cpm) + "     WPM: " + str(session.wpm) + "     Remaining Time: " + str(abs(round(session.time_remaining,1)))
+        if stats != displayed_stats:
+            txt_stats.config(state="normal")
+            txt_stats.replace(1.0, END, stats, "center")
+            txt_stats.config(state="disabled")
+            displayed_stats = stats
 
         # Return successful-execution indication to the calling function:
         return True
@@ -636,7 +1230,8 @@ def window_create_and_config():
         window.minsize(width=520, height=400)
         window.config(padx=45, pady=0,bg='white')
         window.resizable(0, 0)  # Prevents window from being resized.
-        window.attributes("-toolwindow", 1)  # Removes the minimize and maximize buttons from the application window.
+        if sys.platform == "win32":  # (NOTE: The "-toolwindow" attribute exists only on Windows; e.g., not under X11.)
+            window.attributes("-toolwindow", 1)  # Removes the minimize and maximize buttons from the application window.
 
         # Center the application window on the computer screen.  If an error occurs, return failed-execution
         # indication to the calling function:
@@ -662,16 +1257,19 @@ def window_create_and_config():
 
 def window_create_and_config_user_interface():
     """Function which creates and configures items comprising the user interface, including the canvas (which overlays on top of the app. window), labels, textboxes, and button"""
-    global txt_high_score, txt_stats, txt_words_to_type, txt_word_typed, button_test, img
+    global txt_high_score, txt_stats, txt_words_to_type, words_to_type_font, txt_word_typed, button_test, img, key_highlighter, speed_graph
 
     try:
         # Create and configure canvas which overlays on top of window:
         canvas = Canvas(window)
-        img = PhotoImage(file="keyboard.png")
-        canvas.config(height=img.height(), width=WINDOW_WIDTH, bg='white', highlightthickness=0)
-        canvas.create_image(210,54, image=img)
+        # (NOTE: The image is loaded from the asset cache, decoded and scaled, and blended with the white background.)
+        img = load_image("keyboard.png", KEYBOARD_IMAGE_SCALE, master=window)
+        canvas.config(height=img.height(), width=max(WINDOW_WIDTH, img.width()), bg='white', highlightthickness=0)
+        canvas.create_image(210 * KEYBOARD_IMAGE_SCALE, 54 * KEYBOARD_IMAGE_SCALE, image=img)
         canvas.grid(column=0, row=3, columnspan=2, padx=0, pady=0)
         canvas.create_line(0, 0, 500, 0)
+        key_highlighter = KeyHighlighter(canvas, 210 * KEYBOARD_IMAGE_SCALE - img.width() / 2,
+                                         54 * KEYBOARD_IMAGE_SCALE - img.height() / 2, KEYBOARD_IMAGE_SCALE)
         canvas.update()
 
         # Get high score for display (archived in file 'high_score.txt'),  If an error occurs, return failed-execution
@@ -679,7 +1277,7 @@ def window_create_and_config_user_interface():
         high_score_cpm = get_high_score()
         if not high_score_cpm:
             return False
-        high_score_wpm = int(round(high_score_cpm / 5, 0))
+        high_score_wpm = calculate_wpm(high_score_cpm)
 
         # Create and configure text widget to show the high score:
         txt_high_score = Text(window, width=50, height=0, bg='white', fg='black', padx=0, pady=0, bd=0, borderwidth=0, highlightthickness=0, font=(FONT_NAME,10,"bold"))
@@ -702,24 +1300,42 @@ def window_create_and_config_user_interface():
         label_words_to_type_header.grid(column=0, row=4, columnspan=2)
 
         # Create and configure the text widget for displaying the words user must type:
-        txt_words_to_type = Text(window, width=35, height=12, bg='white', fg='blue', padx=0, pady=0, bd=0, borderwidth=0, highlightthickness=0, font=(FONT_NAME,14,"normal"))
+        # (NOTE: The font is kept as an object so that word widths can be measured in it when laying out the words.)
+        words_to_type_font = font.Font(window, family=FONT_NAME, size=14, weight="normal")
+        txt_words_to_type = Text(window, width=35, height=12, bg='white', fg='blue', padx=0, pady=0, bd=0, borderwidth=0, highlightthickness=0, font=words_to_type_font)
         txt_words_to_type.grid(column=0, row=5, columnspan=2)
+        txt_words_to_type.tag_config("typed", foreground="grey")
+        txt_words_to_type.tag_config("start", background="yellow", foreground="blue")
 
         # Create and configure the entry widget for displaying the contents of what the user has typed:
-        txt_word_typed = Entry(window, width=35, bg='white', fg='red', font=(FONT_NAME,14,"normal"), justify="center")
+        # (NOTE: In code mode, the text is left-justified so that its indentation lines up with the line of code.)
+        txt_word_typed = Entry(window, width=35, bg='white', fg='red', font=(FONT_NAME,14,"normal"), justify="left" if TEST_MODE == "code" else "center")
         txt_word_typed.delete(0, "end")
         txt_word_typed.insert(0, "Press 'Start Test' button below to begin test.")
         txt_word_typed.grid(column=0, row=6, columnspan=2, pady=10)
         txt_word_typed.config(state="disabled")
+        txt_word_typed.bind("<Key>", handle_keystroke)
+        txt_word_typed.bind("<<Paste>>", handle_paste, add="+")
+        txt_word_typed.bind("<Return>", handle_return, add="+")
+        txt_word_typed.bind("<Tab>", handle_tab)
 
-        # Create and configure the blank "label" which serves as a separator between the 'words to type' text and the button:
-        label_space = Label(text="Words to Type:", bg='white', fg='white', padx=0, pady=0, font=(FONT_NAME,16, "bold"))
-        label_space.grid(column=0, row=7)
+        # Create and configure the live speed graph, which also serves as a separator between the 'words to type' text and the button:
+        canvas_speed_graph = Canvas(window, height=26, width=WINDOW_WIDTH, bg='white', highlightthickness=0)
+        canvas_speed_graph.grid(column=0, row=7, columnspan=2)
+        speed_graph = SpeedGraph(canvas_speed_graph, WINDOW_WIDTH, 26)
 
         # Create and configure button used to either start or end the current game:
         button_test = Button(text="Start Test", width=20, height=1, bg='red', fg='white', pady=0, font=(FONT_NAME,16,"bold"), command=run_test)
         button_test.grid(column=0, row=8,columnspan=2)
 
+        # Create and configure button used to show the leaderboards:
+        button_leaderboards = Button(text="Leaderboards", width=20, height=1, bg='white', fg='red', pady=0, font=(FONT_NAME,10,"bold"), command=show_leaderboards)
+        button_leaderboards.grid(column=0, row=9, pady=5)
+
+        # Create and configure button used to retake a test or load a shared challenge:
+        button_challenge = Button(text="Challenge", width=20, height=1, bg='white', fg='red', pady=0, font=(FONT_NAME,10,"bold"), command=load_challenge)
+        button_challenge.grid(column=1, row=9, pady=5)
+
         # Return successful-execution indication to the calling function:
         return True
 
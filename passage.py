@@ -0,0 +1,156 @@
+# Passage mode for the Typing Speed Test application.
+
+# Instead of random words from a corpus, the user types real prose (or technical text) taken from a large local text
+# file.  The file is never loaded as a whole: it is scanned once (streaming, line by line) to build an index of the
+# byte offsets at which paragraphs start, and the index is saved next to the file.  A random passage is then read with
+# a single seek to a random paragraph start, and its words are produced lazily by a generator.  The scan also hashes the
+# whole file, and the digest (which identifies the file's content in challenge codes) is saved in the index with it.
+
+# Import necessary library(ies):
+from array import array
+import hashlib
+import os
+import random
+import struct
+
+# Define constants for the index file saved next to each text file (extension and header layout):
+INDEX_FILE_EXTENSION = ".pidx"
+INDEX_FILE_HEADER = struct.Struct("<8sQQQ32s")  # Magic, size and modification time of text file, no. of entries, digest
+INDEX_FILE_MAGIC = b"PASSAGE2"
+
+# Define constant for the minimum number of characters for a paragraph to be indexed (skips headings, etc.):
+MINIMUM_PARAGRAPH_LENGTH = 80
+
+# Define dictionaries of loaded indices (path -> array of paragraph-start offsets) and computed digests
+# ((path, size, modification time) -> digest):
+loaded_indices = {}
+computed_digests = {}
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def build_paragraph_index(path):
+    """Function which scans a text file (streaming) and returns the byte offsets at which paragraphs start, and the file's digest"""
+    offsets = array("Q")
+    offset = 0
+    paragraph_start = None
+    paragraph_length = 0
+    digest = hashlib.sha256()
+
+    with open(path, mode="rb") as file:
+        for line in file:
+            digest.update(line)
+            if line.strip():  # Line belongs to a paragraph.
+                if paragraph_start is None:
+                    paragraph_start = offset
+                    paragraph_length = 0
+                paragraph_length += len(line)
+            elif paragraph_start is not None:  # Blank line ends the current paragraph.
+                if paragraph_length >= MINIMUM_PARAGRAPH_LENGTH:
+                    offsets.append(paragraph_start)
+                paragraph_start = None
+            offset += len(line)
+
+    # Index the final paragraph (if the file does not end with a blank line):
+    if paragraph_start is not None and paragraph_length >= MINIMUM_PARAGRAPH_LENGTH:
+        offsets.append(paragraph_start)
+
+    # Return the paragraph-start offsets and the digest:
+    return offsets, digest.hexdigest()
+
+
+def choose_passage_words(path, number_of_words, rng=random):
+    """Function which returns (up to) the given number of words of a passage starting at a random paragraph"""
+    offsets = get_paragraph_index(path)
+    if not offsets:
+        return []
+
+    # Seek to a random paragraph start and read words until enough have been collected:
+    words = []
+    for word in iterate_words(path, offsets[rng.randrange(len(offsets))]):
+        words.append(word)
+        if len(words) == number_of_words:
+            break
+
+    # Return the words of the passage:
+    return words
+
+
+def get_file_digest(path):
+    """Function which returns a digest (SHA-256 of the whole content) identifying a text file, computed once per version of the file"""
+    status = os.stat(path)
+    digest = computed_digests.get((path, status.st_size, status.st_mtime_ns))
+    if digest is None:
+        # Load the digest saved with the paragraph index for this version of the file, or rebuild the index (which
+        # hashes the file as it scans it):
+        loaded_indices.pop(path, None)
+        get_paragraph_index(path)
+        digest = computed_digests.get((path, status.st_size, status.st_mtime_ns))
+    if digest is None:  # (NOTE: Only if the file has changed meanwhile.)
+        digest = get_file_digest(path)
+    return digest
+
+
+def get_paragraph_index(path):
+    """Function which returns the paragraph index for a text file, loading it from disk or (re)building it as needed"""
+    offsets = loaded_indices.get(path)
+    if offsets is not None:
+        return offsets
+
+    # Use the saved index if it was built for the current version of the text file; otherwise, rebuild and save it
+    # (keeping the file's digest, for the version of the file indexed):
+    status = os.stat(path)
+    saved_index = load_paragraph_index(path, status)
+    if saved_index is None:
+        offsets, digest = build_paragraph_index(path)
+        save_paragraph_index(path, status, offsets, digest)
+    else:
+        offsets, digest = saved_index
+    loaded_indices[path] = offsets
+    computed_digests[(path, status.st_size, status.st_mtime_ns)] = digest
+
+    # Return the paragraph-start offsets:
+    return offsets
+
+
+def iterate_words(path, offset=0):
+    """Generator which yields the words of a text file, starting at the given byte offset (wrapping around at the end)"""
+    with open(path, mode="rb") as file:
+        # Yield the words from the offset to the end of the file:
+        file.seek(offset)
+        for line in file:
+            yield from line.decode("utf-8", errors="replace").split()
+
+        # Wrap around and yield the words from the beginning of the file up to the offset:
+        file.seek(0)
+        remaining = offset
+        while remaining > 0:
+            line = file.readline(remaining)
+            if not line:
+                return
+            remaining -= len(line)
+            yield from line.decode("utf-8", errors="replace").split()
+
+
+def load_paragraph_index(path, status):
+    """Function which loads the saved paragraph index and digest for a version (status) of a text file (None if missing or out of date)"""
+    try:
+        with open(path + INDEX_FILE_EXTENSION, mode="rb") as file:
+            magic, size, modified, count, digest = INDEX_FILE_HEADER.unpack(file.read(INDEX_FILE_HEADER.size))
+            if magic != INDEX_FILE_MAGIC or size != status.st_size or modified != status.st_mtime_ns:
+                return None
+            offsets = array("Q")
+            offsets.fromfile(file, count)
+            return offsets, digest.hex()
+    except (OSError, struct.error, EOFError):
+        return None
+
+
+def save_paragraph_index(path, status, offsets, digest):
+    """Function which saves the paragraph index and digest of a version (status) of a text file next to it (silently skipped if not writable)"""
+    try:
+        with open(path + INDEX_FILE_EXTENSION, mode="wb") as file:
+            file.write(INDEX_FILE_HEADER.pack(INDEX_FILE_MAGIC, status.st_size, status.st_mtime_ns, len(offsets),
+                                              bytes.fromhex(digest)))
+            offsets.tofile(file)
+    except OSError:
+        pass
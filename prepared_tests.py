@@ -0,0 +1,145 @@
+# Seeded, reproducible test generation for the Typing Speed Test application.
+
+# A test is generated from a seed with its own random-number generator, so the same seed and word source (identified
+# by a digest of the corpus or passage file) always produce the same words.  A test can therefore be shared as a
+# "challenge code".  Prepared tests (words, display string and word-offset table) are kept in a bounded LRU cache in
+# memory and on disk, so retakes and challenges load without being sampled and built again.  Words are separated by a
+# space, except in code mode (see 'code_snippets.py'), where each "word" is a line of code and is followed by a line break.
+
+# Import necessary library(ies):
+from array import array
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import random
+
+# Define constants for the in-memory and on-disk caches (maximum number of prepared tests, directory):
+MEMORY_CACHE_SIZE = 32
+DISK_CACHE_SIZE = 256
+DISK_CACHE_DIRECTORY = "prepared_tests"
+
+# Define constants for the separators which follow each word of a test (a space; a line break between lines of code):
+WORD_SEPARATOR = " "
+LINE_SEPARATOR = "\n"
+
+# Define constant for the separator used in challenge codes ('<mode>-<seed>-<source digest>'):
+CHALLENGE_CODE_SEPARATOR = "-"
+
+# Define constant for the number of hexadecimal digits of the source digest included in challenge codes:
+CHALLENGE_CODE_DIGEST_LENGTH = 10
+
+# Define the in-memory cache (key -> PreparedTest), least recently used first:
+memory_cache = OrderedDict()
+
+
+class PreparedTest:
+    """Class which holds a prepared test: its words, the string displayed to the user and the end offset of each word"""
+    __slots__ = ("key", "words", "separator", "display_string", "end_offsets")
+
+    def __init__(self, key, words, display_string=None, end_offsets=None, separator=WORD_SEPARATOR):
+        self.key = key
+        self.words = words
+        self.separator = separator
+        self.display_string = (display_string if display_string is not None
+                               else "".join(word + separator for word in words))
+        if end_offsets is None:
+            # Each word is followed by one separator; its end offset (in characters) includes that separator:
+            end_offsets = array("I")
+            offset = 0
+            for word in words:
+                offset += len(word) + 1
+                end_offsets.append(offset)
+        self.end_offsets = end_offsets
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def cache_prepared_test(prepared_test):
+    """Function which adds a prepared test to the in-memory cache and saves it to the on-disk cache"""
+    remember_prepared_test(prepared_test)
+    try:
+        os.makedirs(DISK_CACHE_DIRECTORY, exist_ok=True)
+        with open(get_disk_cache_path(prepared_test.key), mode="w", encoding="utf-8") as file:
+            json.dump({"key": prepared_test.key, "words": prepared_test.words, "separator": prepared_test.separator,
+                       "end_offsets": prepared_test.end_offsets.tolist()}, file)
+        trim_disk_cache()
+    except OSError:
+        pass
+
+
+def format_challenge_code(mode, seed, source_digest):
+    """Function which formats the challenge code of a test"""
+    return CHALLENGE_CODE_SEPARATOR.join((mode, format(seed, "x"), source_digest[:CHALLENGE_CODE_DIGEST_LENGTH]))
+
+
+def get_disk_cache_path(key):
+    """Function which returns the path of the on-disk cache file for a prepared test"""
+    return os.path.join(DISK_CACHE_DIRECTORY, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def get_prepared_test(mode, seed, source_digest, number_of_words, choose_words, separator=WORD_SEPARATOR):
+    """Function which returns the prepared test for a seed from the caches, or generates it with 'choose_words' (None on failure)"""
+    key = ":".join((mode, source_digest, str(seed), str(number_of_words)))
+
+    # Look in the in-memory cache:
+    prepared_test = memory_cache.get(key)
+    if prepared_test is not None:
+        memory_cache.move_to_end(key)
+        return prepared_test
+
+    # Look in the on-disk cache:
+    prepared_test = load_prepared_test(key)
+    if prepared_test is not None:
+        remember_prepared_test(prepared_test)
+        return prepared_test
+
+    # Generate the test with its own (seeded) random-number generator, and cache it:
+    words = choose_words(random.Random(seed), number_of_words)
+    if not words:
+        return None
+    prepared_test = PreparedTest(key, list(words), separator=separator)
+    cache_prepared_test(prepared_test)
+    return prepared_test
+
+
+def load_prepared_test(key):
+    """Function which loads a prepared test from the on-disk cache (None if it is not cached)"""
+    path = get_disk_cache_path(key)
+    try:
+        with open(path, mode="r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data["key"] != key:
+            return None
+        os.utime(path)  # Mark as recently used.
+        return PreparedTest(key, data["words"], end_offsets=array("I", data["end_offsets"]),
+                            separator=data.get("separator", WORD_SEPARATOR))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def new_seed():
+    """Function which returns a new (random) seed for a test"""
+    return random.SystemRandom().getrandbits(40)
+
+
+def parse_challenge_code(code):
+    """Function which splits a challenge code into the test mode, seed and (abbreviated) source digest"""
+    mode, seed, source_digest = code.strip().split(CHALLENGE_CODE_SEPARATOR)
+    return mode, int(seed, 16), source_digest
+
+
+def remember_prepared_test(prepared_test):
+    """Function which adds a prepared test to the in-memory cache, evicting the least recently used test if it is full"""
+    memory_cache[prepared_test.key] = prepared_test
+    memory_cache.move_to_end(prepared_test.key)
+    while len(memory_cache) > MEMORY_CACHE_SIZE:
+        memory_cache.popitem(last=False)
+
+
+def trim_disk_cache():
+    """Function which removes the least recently used prepared tests from the on-disk cache when it is full"""
+    entries = [entry for entry in os.scandir(DISK_CACHE_DIRECTORY) if entry.name.endswith(".json")]
+    if len(entries) > DISK_CACHE_SIZE:
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - DISK_CACHE_SIZE]:
+            os.remove(entry.path)
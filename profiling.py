@@ -0,0 +1,131 @@
+# Per-test profiling for the Typing Speed Test application.
+
+# Profiling is switched on with the environment variable 'TYPING_TEST_PROFILE' or the command-line flag
+# '--profile=<mode>', where the mode is one of:
+#   cprofile    - cProfile around the test (from 'run_test' until 'end_test'), saved as a '.prof' file (pstats format)
+#   tracemalloc - tracemalloc snapshots taken when the test starts and when it ends, saved as a diff (top allocations)
+#   sampling    - a low-overhead thread sampling the main thread's stack, saved in collapsed-stack (flame graph) format
+# Each test produces a dated artifact next to the system log ('log_typing_speed_test_app_*.txt').  When profiling is
+# off, no profiler is created and the application only checks for None at the start and end of each test.
+
+# Import necessary library(ies):
+from collections import Counter
+from datetime import datetime
+import cProfile
+import sys
+import threading
+import tracemalloc
+
+# Define constant for the environment variable (and command-line flag) used to switch on profiling:
+PROFILE_ENVIRONMENT_VARIABLE = "TYPING_TEST_PROFILE"
+PROFILE_FLAG = "--profile="
+
+# Define constant for the prefix of profiling artifacts (a date/time and the mode are appended):
+PROFILE_FILE_PREFIX = "profile_typing_speed_test_app_"
+
+# Define constant for the interval (in seconds) between stack samples in sampling mode:
+SAMPLING_INTERVAL = 0.005
+
+# Define constant for the number of allocation sites reported in tracemalloc mode:
+TRACEMALLOC_TOP_COUNT = 50
+
+
+class CProfileProfiler:
+    """Class which profiles a test with cProfile"""
+    file_extension = "cprofile.prof"
+
+    def __init__(self):
+        self.profiler = None
+
+    def start(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self, path):
+        self.profiler.disable()
+        self.profiler.dump_stats(path)
+        self.profiler = None
+
+
+class SamplingProfiler:
+    """Class which profiles a test by periodically sampling the stack of the thread which started it"""
+    file_extension = "sampling.txt"
+
+    def __init__(self, interval=SAMPLING_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.target_thread_id = None
+
+    def sample(self):
+        # Record the target thread's stack (outermost frame first) until told to stop:
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.samples.clear()
+        self.stop_event.clear()
+        self.target_thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.sample, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self, path):
+        self.stop_event.set()
+        self.thread.join()
+        with open(path, mode="w") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class TracemallocProfiler:
+    """Class which profiles a test's memory allocations by diffing tracemalloc snapshots taken at its start and end"""
+    file_extension = "tracemalloc.txt"
+
+    def __init__(self):
+        self.snapshot = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+        self.snapshot = tracemalloc.take_snapshot()
+
+    def stop(self, path):
+        statistics = tracemalloc.take_snapshot().compare_to(self.snapshot, "traceback")
+        with open(path, mode="w") as file:
+            file.write(f"Top {TRACEMALLOC_TOP_COUNT} allocation differences between the start and end of the test:\n\n")
+            for statistic in statistics[:TRACEMALLOC_TOP_COUNT]:
+                file.write(f"{statistic}\n")
+                for line in statistic.traceback.format():
+                    file.write(f"    {line}\n")
+        self.snapshot = None
+
+
+# Define dictionary of profilers (mode -> class):
+PROFILERS = {"cprofile": CProfileProfiler, "tracemalloc": TracemallocProfiler, "sampling": SamplingProfiler}
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def create_profiler(arguments, environment):
+    """Function which creates the profiler selected by the command-line flag or environment variable (None if profiling is off)"""
+    mode = environment.get(PROFILE_ENVIRONMENT_VARIABLE, "")
+    for argument in arguments:
+        if argument.startswith(PROFILE_FLAG):
+            mode = argument[len(PROFILE_FLAG):]
+    mode = mode.strip().lower()
+    if not mode or mode == "off":
+        return None
+    if mode not in PROFILERS:
+        raise ValueError(f"Unknown profiling mode: {mode} (expected one of: {', '.join(PROFILERS)})")
+    return PROFILERS[mode]()
+
+
+def get_profile_path(profiler):
+    """Function which returns the (dated) file name of the artifact for a test profiled by the given profiler"""
+    return PROFILE_FILE_PREFIX + datetime.now().strftime("%Y-%m-%d_%H%M%S") + "_" + profiler.file_extension
@@ -0,0 +1,197 @@
+# Streaming JSONL import and export of test results for the Typing Speed Test application.
+
+# Results (see 'history.py') are exported as one JSON object per line, and imported from such files, so they can be
+# moved between machines or processed with other tools.  Both directions stream through generators in fixed-size
+# chunks, so memory use stays constant however many results are transferred.  On import, each chunk is validated
+# (invalid records are reported and skipped), records already in the history (identified by their result hash) are
+# skipped, and the rest are inserted in one transaction per chunk, together with the bulk update of the leaderboards,
+# personal bests and trend buckets derived from them.
+
+# Usage examples:
+#   python results_jsonl.py export results.jsonl --user alice
+#   python results_jsonl.py import results.jsonl
+
+# Import necessary library(ies):
+from array import array
+import argparse
+from itertools import islice
+import json
+import math
+from operator import itemgetter
+import sys
+import time
+
+import history
+import leaderboard
+import trends
+
+# Define constant for the number of records processed (and, on import, inserted in one transaction) per chunk:
+DEFAULT_CHUNK_SIZE = 10000
+
+# Define constant for the fields of an exported record (in output order):
+RECORD_FIELDS = ("user", "mode", "finished_at", "duration", "cpm", "wpm", "accuracy", "suspect", "speed_samples")
+
+# Define constant for the JSON types accepted for numeric fields which are not whole numbers:
+NUMBER_TYPES = (int, float)
+
+# Define constant for the highest speed (CPM, WPM or speed sample) accepted, far above any human typist's (larger
+# values could not even be stored as SQLite integers):
+MAXIMUM_SPEED = 10000
+
+# Define constant for how far (in seconds) 'finished_at' may be ahead of the current time (allowing for clock skew
+# between machines):
+MAXIMUM_CLOCK_SKEW = 86400.0
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def export_jsonl(output_path, database_path=history.HISTORY_DATABASE_PATH, user=None, mode=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    """Function which exports (filtered) results to a JSONL file and returns the number of records written"""
+    connection = history.connect(database_path)
+    try:
+        records_written = 0
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        with open(output_path, mode="w", encoding="utf-8") as file:
+            for rows in history.iterate_result_batches(connection, 0, user, mode, chunk_size):
+                file.write("".join(encode({"user": row[1], "mode": row[2], "finished_at": row[3], "duration": row[4],
+                                           "cpm": row[5], "wpm": row[6], "accuracy": row[7], "suspect": bool(row[8]),
+                                           "speed_samples": history.decode_speed_samples(row[9]).tolist(),
+                                           "hash": history.compute_result_hash(*row[1:8], row[9]).hex()}) + "\n"
+                                   for row in rows))
+                records_written += len(rows)
+        return records_written
+    finally:
+        connection.close()
+
+
+def import_jsonl(input_path, database_path=history.HISTORY_DATABASE_PATH, chunk_size=DEFAULT_CHUNK_SIZE,
+                 on_invalid_record=None):
+    """Function which imports the results in a JSONL file (skipping invalid and duplicate records) and returns the counts (imported, duplicate, invalid)"""
+    connection = history.connect(database_path)
+    try:
+        imported = duplicates = invalid = 0
+        with open(input_path, mode="r", encoding="utf-8") as file:
+            for chunk in iterate_chunks(enumerate(file, start=1), chunk_size):
+                # Validate the chunk, reporting invalid records:
+                results, errors = validate_chunk(chunk)
+                invalid += len(errors)
+                if on_invalid_record is not None:
+                    for line_number, error in errors:
+                        on_invalid_record(line_number, error)
+
+                # Insert the new results and update the tables derived from them, in one transaction:
+                inserted = insert_results(connection, results)
+                imported += inserted
+                duplicates += len(results) - inserted
+        return imported, duplicates, invalid
+    finally:
+        connection.close()
+
+
+def insert_results(connection, results):
+    """Function which inserts a chunk of validated results (skipping those already recorded) and returns the no. inserted"""
+    with connection:
+        # Skip results which are already recorded, or repeated within the chunk:
+        unique_results = {result[-1]: result for result in results}
+        existing_hashes = set()
+        hashes = list(unique_results)
+        for start in range(0, len(hashes), 900):  # (Within SQLite's limit on the no. of query parameters.)
+            part = hashes[start:start + 900]
+            existing_hashes.update(row[0] for row in connection.execute(
+                f"SELECT result_hash FROM results WHERE result_hash IN ({','.join('?' * len(part))})", part))
+        new_results = [result for result_hash, result in unique_results.items() if result_hash not in existing_hashes]
+        if not new_results:
+            return 0
+
+        # Insert the results with consecutive ids (so the derived tables can refer to them without reading them back):
+        first_id = connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM results").fetchone()[0]
+        connection.executemany(
+            "INSERT INTO results (id, user, mode, finished_at, duration, cpm, wpm, accuracy, suspect, speed_samples, "
+            "result_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(result_id,) + result for result_id, result in enumerate(new_results, start=first_id)])
+
+        # Update the leaderboards, personal bests and trend buckets (suspect results are kept out of them):
+        counted = [(result_id, user, mode, finished_at, cpm, wpm)
+                   for result_id, (user, mode, finished_at, _, cpm, wpm, _, suspect, _, _)
+                   in enumerate(new_results, start=first_id) if not suspect]
+        leaderboard.update_leaderboards_bulk(connection, counted)
+        trends.update_trends_bulk(connection, [(user, finished_at, cpm) for _, user, _, finished_at, cpm, _ in counted])
+        return len(new_results)
+
+
+def iterate_chunks(iterable, chunk_size):
+    """Generator which yields the items of an iterable in lists of the given size (the last one may be shorter)"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_transfer():
+    """Main function used to run an import or export from the command line"""
+    parser = argparse.ArgumentParser(description="Import or export typing-test results as JSON Lines.")
+    parser.add_argument("command", choices=("import", "export"), help="direction of the transfer")
+    parser.add_argument("path", help="path of the JSONL file to read or write")
+    parser.add_argument("--database", default=history.HISTORY_DATABASE_PATH, help="path of the history database")
+    parser.add_argument("--user", help="only export results of this user")
+    parser.add_argument("--mode", help="only export results of this test mode")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="number of records per chunk")
+    arguments = parser.parse_args()
+
+    if arguments.command == "export":
+        records_written = export_jsonl(arguments.path, arguments.database, arguments.user, arguments.mode,
+                                       arguments.chunk_size)
+        print(f"Exported {records_written} result(s) to {arguments.path}")
+    else:
+        imported, duplicates, invalid = import_jsonl(
+            arguments.path, arguments.database, arguments.chunk_size,
+            lambda line_number, error: print(f"{arguments.path}:{line_number}: {error}", file=sys.stderr))
+        print(f"Imported {imported} result(s) from {arguments.path} ({duplicates} duplicate(s) and {invalid} invalid "
+              f"record(s) skipped)")
+
+
+def validate_chunk(lines):
+    """Function which parses and validates a chunk of numbered JSONL lines, returning (results ready to insert, errors)"""
+    results = []
+    errors = []
+    get_fields = itemgetter(*RECORD_FIELDS)
+    isfinite = math.isfinite
+    latest_finished_at = time.time() + MAXIMUM_CLOCK_SKEW
+    for line_number, line in lines:
+        if line.isspace():
+            continue
+        try:
+            user, mode, finished_at, duration, cpm, wpm, accuracy, suspect, speed_samples = get_fields(json.loads(line))
+            if type(user) is not str or type(mode) is not str or not user or not mode:
+                raise ValueError("'user' and 'mode' must be non-empty strings")
+            if (type(cpm) is not int or type(wpm) is not int or not 0 <= cpm <= MAXIMUM_SPEED
+                    or not 0 <= wpm <= MAXIMUM_SPEED):
+                raise ValueError(f"'cpm' and 'wpm' must be integers from 0 to {MAXIMUM_SPEED}")
+            # (NOTE: JSON decoding accepts NaN and Infinity, which compare False with everything, so each number is
+            # checked to be finite.)
+            if (type(finished_at) not in NUMBER_TYPES or type(duration) not in NUMBER_TYPES
+                    or type(accuracy) not in NUMBER_TYPES or not isfinite(finished_at) or not isfinite(duration)
+                    or not isfinite(accuracy) or not 0 <= finished_at <= latest_finished_at or duration < 0
+                    or not 0 <= accuracy <= 1):
+                raise ValueError("'finished_at' must be a time from 1970 until now, 'duration' a finite non-negative "
+                                 "number, and 'accuracy' from 0 to 1")
+            if type(suspect) is not bool or type(speed_samples) is not list:
+                raise ValueError("'suspect' must be a boolean and 'speed_samples' a list")
+            # (NOTE: The array itself only accepts non-negative integers, within the range of its typecode.)
+            speed_samples_array = array(history.SPEED_SAMPLES_TYPECODE, speed_samples)
+            if speed_samples_array and max(speed_samples_array) > MAXIMUM_SPEED:
+                raise ValueError(f"'speed_samples' must be integers from 0 to {MAXIMUM_SPEED}")
+            speed_samples_blob = speed_samples_array.tobytes()
+        except (ValueError, KeyError, TypeError, OverflowError) as error:  # (JSON decoding errors are ValueErrors.)
+            errors.append((line_number, f"invalid record ({type(error).__name__}: {error})"))
+            continue
+        results.append((user, mode, float(finished_at), float(duration), cpm, wpm, float(accuracy), int(suspect),
+                        speed_samples_blob, history.compute_result_hash(user, mode, finished_at, duration, cpm, wpm,
+                                                                        accuracy, speed_samples_blob)))
+    return results, errors
+
+
+if __name__ == '__main__':
+    run_transfer()
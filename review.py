@@ -0,0 +1,107 @@
+# Spaced-repetition review of error-prone words for the Typing Speed Test application.
+
+# Each user's problem words (words mistyped in a test) are kept in a persistent priority queue in the history
+# database (see 'history.py'): a table with one row per (user, word), and an index on (user, priority) which serves as
+# the heap.  The priority of a word is its next-due time brought forward by its error weight, so the most error-prone
+# words come up first.  A mistyped word is due again soon and gains weight; a word typed correctly has its review
+# interval doubled and its weight halved, and is retired once it is both light and rarely due.  Every lookup and update
+# goes through the primary key or the priority index (O(log n) per word), and nothing is loaded at startup: the queue
+# is only read when a new test is prepared.
+
+# Import necessary library(ies):
+import time
+
+# Define constant for the number of seconds by which each unit of error weight brings a word's next review forward:
+WEIGHT_SECONDS = 3600.0
+
+# Define constants for the review interval (in seconds) after a word is mistyped, and the factor by which it grows
+# (and the error weight shrinks) each time the word is typed correctly:
+INITIAL_INTERVAL = 600.0
+INTERVAL_GROWTH = 2.0
+WEIGHT_DECAY = 0.5
+
+# Define constants for retiring a word from the queue (error weight below, and review interval at least):
+RETIREMENT_WEIGHT = 0.25
+RETIREMENT_INTERVAL = 30 * 86400.0
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def choose_review_words(connection, user, number_of_words, now=None):
+    """Function which returns up to the given no. of a user's problem words which are due for review, highest priority first"""
+    now = time.time() if now is None else now
+    return [row[0] for row in connection.execute(
+        "SELECT word FROM problem_words WHERE user = ? AND priority <= ? ORDER BY priority LIMIT ?",
+        (user, now, number_of_words))]
+
+
+def count_problem_words(connection, user):
+    """Function which returns the number of problem words tracked for a user"""
+    return connection.execute("SELECT COUNT(*) FROM problem_words WHERE user = ?", (user,)).fetchone()[0]
+
+
+def mix_review_words(words, review_words):
+    """Function which returns the words of a test with review words spread evenly among them (replacing some words)"""
+    if not review_words:
+        return words
+    words = list(words)
+    step = max(1, len(words) // len(review_words))
+    for position, review_word in zip(range(0, len(words), step), review_words):
+        words[position] = review_word
+    return words
+
+
+def record_word_outcomes(connection, user, mistyped_words, correct_words, now=None):
+    """Function which updates a user's problem words with the outcome of a test ({word: no. of errors}, and words typed correctly)"""
+    now = time.time() if now is None else now
+    with connection:
+        # Make each mistyped word due again soon, adding its errors to its weight:
+        due_at = now + INITIAL_INTERVAL
+        connection.executemany(
+            "INSERT INTO problem_words (user, word, weight, interval, due_at, priority) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(user, word) DO UPDATE SET weight = problem_words.weight + excluded.weight, "
+            "interval = excluded.interval, due_at = excluded.due_at, "
+            "priority = excluded.due_at - (problem_words.weight + excluded.weight) * ?",
+            ((user, word, errors, INITIAL_INTERVAL, due_at, due_at - errors * WEIGHT_SECONDS, WEIGHT_SECONDS)
+             for word, errors in mistyped_words.items()))
+
+        # Space out the reviews of tracked words typed correctly (words not in the queue are left alone), and retire
+        # those which no longer need reviewing:
+        outcomes = [(user, word) for word in set(correct_words) if word not in mistyped_words]
+        connection.executemany(
+            "UPDATE problem_words SET weight = weight * ?1, interval = interval * ?2, due_at = ?3 + interval * ?2, "
+            "priority = ?3 + interval * ?2 - weight * ?1 * ?4 WHERE user = ?5 AND word = ?6",
+            ((WEIGHT_DECAY, INTERVAL_GROWTH, now, WEIGHT_SECONDS) + outcome for outcome in outcomes))
+        connection.executemany(
+            "DELETE FROM problem_words WHERE user = ? AND word = ? AND weight < ? AND interval >= ?",
+            (outcome + (RETIREMENT_WEIGHT, RETIREMENT_INTERVAL) for outcome in outcomes))
+
+
+if __name__ == '__main__':
+    # Benchmark lookups and updates with 100,000 problem words tracked for one user:
+    import os
+    import random
+    import tempfile
+
+    import history
+
+    database_path = os.path.join(tempfile.mkdtemp(), "history.db")
+    connection = history.connect(database_path)
+    rng = random.Random(0)
+    words = [f"word{number}" for number in range(100000)]
+    start_time = time.time() - 86400
+    record_word_outcomes(connection, "alice", {word: rng.randint(1, 3) for word in words}, [], now=start_time)
+    print(f"Tracking {count_problem_words(connection, 'alice'):,} problem words")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        choose_review_words(connection, "alice", 50)
+    print(f"choose_review_words (50 words): {(time.perf_counter() - start):.3f} ms per call")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        record_word_outcomes(connection, "alice", dict.fromkeys(rng.sample(words, 2), 1), rng.sample(words, 50))
+    print(f"record_word_outcomes (2 mistyped, 50 correct): {(time.perf_counter() - start):.3f} ms per test")
+    plan = connection.execute("EXPLAIN QUERY PLAN SELECT word FROM problem_words WHERE user = ? AND priority <= ? "
+                              "ORDER BY priority LIMIT ?", ("alice", 0, 1)).fetchall()
+    print("Query plan:", plan[-1][-1])
+    connection.close()
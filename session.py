@@ -0,0 +1,168 @@
+# Session state for one typing test of the Typing Speed Test application.
+
+# The state of the current test (words to type, position in them, CPM/WPM, remaining time, keystrokes and per-second
+# speed samples) is kept in one '__slots__'-based object which is reused from test to test.  The word data is the
+# prepared test's display string plus the end offset of each word, copied into an 'array' buffer which is allocated
+# once (and only grows if a test has more words than ever before), so starting a test or moving to the next word does
+# not build new lists.  When the words pane has been laid out (see 'layout.py'), the line and column of each word come
+# from the layout, so the Text widget indexes of the current word are found without searching the widget.
+
+# Import necessary library(ies):
+from array import array
+
+from engine import LENGTH_OF_TEST, NUMBER_OF_WORDS_TO_SELECT, calculate_wpm
+
+
+class TestSession:
+    """Class which holds the state of the current typing test (reused between tests)"""
+    __slots__ = ("display_string", "end_offsets", "word_count", "word_lines", "word_columns", "current_word",
+                 "current_word_start", "current_word_line", "current_word_start_index", "current_word_end_index", "cpm", "wpm", "time_remaining", "keystrokes", "speed_samples",
+                 "speed_sample_count", "challenge_code", "mistyped_words", "current_word_mistyped")
+
+    def __init__(self, capacity=NUMBER_OF_WORDS_TO_SELECT):
+        self.display_string = ""
+        self.end_offsets = array("I", bytes(4 * capacity))
+        self.word_count = 0
+        self.word_lines = None
+        self.word_columns = None
+        self.speed_samples = array("I", bytes(4 * (int(LENGTH_OF_TEST) + 1)))
+        self.challenge_code = ""
+        self.mistyped_words = {}
+        self.reset_metrics()
+        self.move_to_word(0)
+
+    def complete_current_word(self):
+        """Function which counts the current (correctly typed) word towards CPM/WPM and moves on to the next word"""
+        # (NOTE: In code mode, the indentation of a line of code is filled in automatically, so it is not counted.)
+        self.cpm += len(self.get_current_word().lstrip(" "))
+        self.wpm = calculate_wpm(self.cpm)
+        self.move_to_word(self.current_word + 1)
+
+    def get_completed_words(self):
+        """Function which returns the words typed so far in the current test"""
+        return self.display_string[:self.current_word_start].split()
+
+    def get_current_word(self):
+        """Function which returns the word the user must type next"""
+        return self.display_string[self.current_word_start:self.end_offsets[self.current_word] - 1]
+
+    def get_current_word_span(self):
+        """Function which returns the length of the current word, including the space after it"""
+        return self.end_offsets[self.current_word] - self.current_word_start
+
+    def get_duration(self):
+        """Function which returns the time (in seconds) elapsed in the current test"""
+        return min(LENGTH_OF_TEST, LENGTH_OF_TEST - self.time_remaining)
+
+    def get_speed_samples(self):
+        """Function which returns the per-second speed (CPM) samples recorded so far"""
+        return self.speed_samples[:self.speed_sample_count]
+
+    def has_words_remaining(self):
+        """Function which indicates whether there are words left to type"""
+        return self.current_word < self.word_count
+
+    def load(self, prepared_test, challenge_code, layout=None):
+        """Function which loads the words of a prepared test (see 'prepared_tests.py'), and their layout (if any), for the next test"""
+        self.display_string = prepared_test.display_string
+        self.word_count = len(prepared_test.end_offsets)
+
+        # Keep references to the (cached, never modified) line and column arrays of the layout:
+        self.word_lines = layout.word_lines if layout is not None else None
+        self.word_columns = layout.word_columns if layout is not None else None
+
+        # Copy the end offsets into the (reused) buffer, growing it only if it is too small:
+        if self.word_count > len(self.end_offsets):
+            self.end_offsets.extend(bytes(4 * (self.word_count - len(self.end_offsets))))
+        self.end_offsets[:self.word_count] = prepared_test.end_offsets
+        self.challenge_code = challenge_code
+        self.move_to_word(0)
+
+    def move_to_word(self, index):
+        """Function which makes the given word the current word"""
+        self.current_word = index
+        self.current_word_mistyped = False
+        self.current_word_start = self.end_offsets[index - 1] if index else 0
+        if index >= self.word_count:
+            self.current_word_line = 0
+            self.current_word_start_index = self.current_word_end_index = "end"
+            return
+
+        # Compute the Text widget indexes of the current word once here rather than on every tick (without a layout,
+        # all words are on the first line):
+        if self.word_lines is not None:
+            self.current_word_line = self.word_lines[index]
+            column = self.word_columns[index]
+        else:
+            self.current_word_line = 0
+            column = self.current_word_start
+        line = str(self.current_word_line + 1) + "."
+        self.current_word_start_index = line + str(column)
+        self.current_word_end_index = line + str(column + self.get_current_word_span() - 1)
+
+    def record_keystroke(self):
+        """Function which counts a character-producing keystroke"""
+        self.keystrokes += 1
+
+    def record_mistype(self):
+        """Function which records that the user has mistyped the current word (counted once per word)"""
+        if not self.current_word_mistyped:
+            self.current_word_mistyped = True
+            word = self.get_current_word()
+            self.mistyped_words[word] = self.mistyped_words.get(word, 0) + 1
+
+    def record_speed_sample_if_due(self):
+        """Function which records a speed (CPM) sample at the end of each second of the test (True if one was recorded)"""
+        if (round(LENGTH_OF_TEST - self.time_remaining, 2) >= self.speed_sample_count + 1
+                and self.speed_sample_count < len(self.speed_samples)):
+            self.speed_samples[self.speed_sample_count] = self.cpm
+            self.speed_sample_count += 1
+            return True
+        return False
+
+    def reset_metrics(self):
+        """Function which resets CPM, WPM, remaining time, keystrokes and speed samples in preparation for a new test"""
+        self.cpm = 0
+        self.wpm = 0
+        self.time_remaining = LENGTH_OF_TEST
+        self.keystrokes = 0
+        self.speed_sample_count = 0
+        self.mistyped_words.clear()
+
+
+if __name__ == '__main__':
+    # Measure allocations and RSS over 10,000 back-to-back simulated tests (words typed at random speeds):
+    import gc
+    import random
+    import resource
+    import tracemalloc
+
+    from corpus import get_corpus
+    import prepared_tests
+
+    corpus = get_corpus()
+    session = TestSession()
+    rng = random.Random(0)
+    tracemalloc.start()
+    gc.collect()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for test in range(1, 10001):
+        # Load a prepared test (tests repeat, as retakes and challenges do, so most come from the cache):
+        seed = rng.randrange(64)
+        prepared_test = prepared_tests.get_prepared_test("words", seed, corpus.digest, NUMBER_OF_WORDS_TO_SELECT,
+                                                         corpus.choose_words)
+        session.load(prepared_test, prepared_tests.format_challenge_code("words", seed, corpus.digest))
+        session.reset_metrics()
+
+        # Simulate the test: one tick every 0.01 s, a word typed every 0.3 s or so:
+        while session.time_remaining > 0 and session.has_words_remaining():
+            session.time_remaining -= 0.01
+            if rng.random() < 0.033:
+                session.get_current_word()
+                session.complete_current_word()
+            session.record_speed_sample_if_due()
+        if test % 1000 == 0:
+            gc.collect()
+            current = tracemalloc.get_traced_memory()[0] - baseline
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(f"{test:>6} tests: traced memory {current / 1024:8.1f} KiB, max RSS {rss / 1024:6.1f} MiB")
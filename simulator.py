@@ -0,0 +1,235 @@
+# Synthetic typist simulator for the Typing Speed Test application.
+
+# Generates realistic keystroke streams for load and regression testing, from a parametric typist model:
+#   - a target speed (WPM), which sets the mean inter-key interval,
+#   - per-bigram inter-key delay distributions (log-normal; alternating hands are faster than same-hand bigrams, which
+#     are faster than same-finger bigrams),
+#   - an error rate, where each error is a neighbouring key followed (after a reaction delay) by a backspace correction,
+# over words from a corpus (by default, the common words in 'data.py').
+
+# Offline mode yields batches of keystrokes ('keys' string, 'intervals' array of seconds) as fast as possible: each
+# word's intervals are sampled from its bigram distributions a fixed number of times up front, and batches are then
+# assembled from those variants without any per-keystroke Python work.  Real-time mode drives a Tk entry widget (e.g.
+# 'txt_word_typed' in 'main.py') by injecting key events with 'event_generate' at the simulated times.
+
+# Import necessary library(ies):
+from array import array
+from itertools import chain
+import math
+import random
+import time
+
+from corpus import DEFAULT_LANGUAGE, get_corpus
+from keyboard_model import FINGER_OF_KEY, KEYBOARD_ROWS, LEFT_HAND_KEYS
+
+# Define constant for the character used to represent a backspace keystroke:
+BACKSPACE = "\b"
+
+# Define constant for the bigram classes (relative mean delay, log-normal sigma):
+BIGRAM_CLASSES = {
+    "alternating": (0.85, 0.30),
+    "same_hand": (1.00, 0.35),
+    "same_finger": (1.40, 0.40),
+    "repeat": (1.10, 0.30),
+    "after_space": (1.25, 0.45),
+    "space": (0.90, 0.30),
+}
+
+# Define constants for the error model (reaction delay before a backspace correction, relative mean and sigma):
+CORRECTION_DELAY = (2.50, 0.40)
+
+# Define constant for the number of pre-sampled interval variants kept per word:
+VARIANTS_PER_WORD = 16
+
+# Define constant for the number of words per batch in offline mode:
+WORDS_PER_BATCH = 2048
+
+# Define dictionary of Tk keysyms for characters which are not their own keysym (any other character which is not an
+# ASCII letter or digit is sent by its Unicode keysym, "U" followed by its code point, see 'get_keysym'):
+TK_KEYSYMS = {" ": "space", BACKSPACE: "BackSpace", "'": "apostrophe", ",": "comma", ".": "period", "-": "minus",
+              ";": "semicolon", ":": "colon", "!": "exclam", "?": "question", '"': "quotedbl", "(": "parenleft",
+              ")": "parenright", "/": "slash", "\n": "Return", "\t": "Tab"}
+
+
+class TypistModel:
+    """Class which holds a parametric typist model and generates keystroke streams from it"""
+
+    def __init__(self, words=None, wpm=60, error_rate=0.02, separator=" ", seed=None):
+        self.words = list(words) if words is not None else get_corpus(DEFAULT_LANGUAGE).words
+        self.wpm = wpm
+        self.error_rate = error_rate
+        self.separator = separator
+        self.rng = random.Random(seed)
+        self.word_variants = {}
+
+        # Scale the bigram delays so that the mean interval over the corpus matches the target speed
+        # (1 word = 5 characters, so a character takes 60 / (5 x WPM) seconds):
+        mean_relative_delay = sum(sum(BIGRAM_CLASSES[bigram_class][0] for bigram_class in self.classify(word))
+                                  for word in self.words) / sum(len(word) + len(separator) for word in self.words)
+        self.interval_scale = 60.0 / (5 * wpm) / mean_relative_delay
+
+    def classify(self, word):
+        """Function which returns the bigram class of each keystroke of a word (including the separator after it)"""
+        classes = []
+        previous = " "
+        for key in word + self.separator:
+            if previous == " ":
+                classes.append("after_space")
+            elif key == " ":
+                classes.append("space")
+            elif key == previous:
+                classes.append("repeat")
+            elif FINGER_OF_KEY.get(key) is not None and FINGER_OF_KEY.get(key) == FINGER_OF_KEY.get(previous):
+                classes.append("same_finger")
+            elif (key in LEFT_HAND_KEYS) == (previous in LEFT_HAND_KEYS):
+                classes.append("same_hand")
+            else:
+                classes.append("alternating")
+            previous = key
+        return classes
+
+    def get_word_variants(self, word):
+        """Function which returns the pre-sampled interval variants of a word (sampling them on first use)"""
+        variants = self.word_variants.get(word)
+        if variants is None:
+            classes = [BIGRAM_CLASSES[bigram_class] for bigram_class in self.classify(word)]
+            variants = [array("d", (self.sample_delay(mean, sigma) for mean, sigma in classes))
+                        for _ in range(VARIANTS_PER_WORD)]
+            self.word_variants[word] = variants
+        return variants
+
+    def get_neighbouring_key(self, key):
+        """Function which returns a key next to the given key (the wrong key pressed when making an error)"""
+        for row in KEYBOARD_ROWS:
+            position = row.find(key.lower())
+            if position >= 0:
+                neighbours = row[max(0, position - 1):position] + row[position + 1:position + 2]
+                return self.rng.choice(neighbours)
+        return self.rng.choice(KEYBOARD_ROWS[1])
+
+    def iterate_batches(self, number_of_words=None):
+        """Generator which yields batches of keystrokes (keys string, intervals array) for the given (or unlimited) no. of words"""
+        words_remaining = number_of_words
+        while words_remaining is None or words_remaining > 0:
+            batch_size = WORDS_PER_BATCH if words_remaining is None else min(WORDS_PER_BATCH, words_remaining)
+            if words_remaining is not None:
+                words_remaining -= batch_size
+
+            # Choose the words and one pre-sampled variant of each word's intervals:
+            words = self.rng.choices(self.words, k=batch_size)
+            keys = self.separator.join(words) + self.separator
+            variant_numbers = self.rng.choices(range(VARIANTS_PER_WORD), k=batch_size)
+            intervals = array("d", chain.from_iterable(self.get_word_variants(word)[variant]
+                                                       for word, variant in zip(words, variant_numbers)))
+
+            # Insert errors (a wrong key followed by a backspace) at random positions:
+            if self.error_rate > 0:
+                keys, intervals = self.insert_errors(keys, intervals)
+
+            yield keys, intervals
+
+    def insert_errors(self, keys, intervals):
+        """Function which inserts errors and their corrections into a batch of keystrokes"""
+        # Draw the number of errors (binomial, approximated by a normal distribution) and their positions:
+        count = len(keys)
+        expected = count * self.error_rate
+        errors = min(count, max(0, round(self.rng.gauss(expected, math.sqrt(expected * (1 - self.error_rate))))))
+        if not errors:
+            return keys, intervals
+
+        # Build the batch again, inserting (wrong key, backspace) before each chosen keystroke:
+        key_parts = []
+        interval_parts = []
+        start = 0
+        for position in sorted(self.rng.sample(range(count), errors)):
+            key_parts.append(keys[start:position])
+            key_parts.append(self.get_neighbouring_key(keys[position]) + BACKSPACE)
+            interval_parts.append(intervals[start:position])
+            interval_parts.append(array("d", (intervals[position], self.sample_delay(*CORRECTION_DELAY))))
+            start = position
+        key_parts.append(keys[start:])
+        interval_parts.append(intervals[start:])
+        return "".join(key_parts), array("d", chain.from_iterable(interval_parts))
+
+    def iterate_keystrokes(self, number_of_words=None):
+        """Generator which yields individual keystrokes (key, interval in seconds since the previous keystroke)"""
+        for keys, intervals in self.iterate_batches(number_of_words):
+            yield from zip(keys, intervals)
+
+    def sample_delay(self, relative_mean, sigma):
+        """Function which samples one inter-key delay (in seconds) from a log-normal distribution with the given relative mean"""
+        # For a log-normal distribution, mean = exp(mu + sigma^2 / 2):
+        mu = math.log(relative_mean * self.interval_scale) - sigma * sigma / 2
+        return self.rng.lognormvariate(mu, sigma)
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def drive_entry(widget, model, number_of_words=None, on_finished=None):
+    """Function which types into a Tk entry widget in real time by injecting key events (returns a function which stops it)"""
+    # (NOTE: The widget must have keyboard focus for the injected key presses to insert text.)
+    keystrokes = model.iterate_keystrokes(number_of_words)
+    stopped = False
+    next_time = time.perf_counter()
+
+    def inject_next_keystroke():
+        nonlocal next_time
+        if stopped:
+            return
+        try:
+            key, interval = next(keystrokes)
+        except StopIteration:
+            if on_finished is not None:
+                on_finished()
+            return
+
+        # Inject the keystroke (as a key press, as if typed on the keyboard):
+        widget.event_generate("<KeyPress>", keysym=get_keysym(key), when="tail")
+
+        # Schedule the next keystroke relative to the simulated (not the actual) time, so delays do not accumulate:
+        next_time += interval
+        widget.after(max(0, int((next_time - time.perf_counter()) * 1000)), inject_next_keystroke)
+
+    def stop():
+        nonlocal stopped
+        stopped = True
+
+    widget.after(0, inject_next_keystroke)
+    return stop
+
+
+def get_keysym(character):
+    """Function which returns the Tk keysym of the key which types a character"""
+    keysym = TK_KEYSYMS.get(character)
+    if keysym is not None:
+        return keysym
+    if character.isascii() and character.isalnum():
+        return character
+    return "U%04X" % ord(character)
+
+
+def iterate_realtime(model, number_of_words=None):
+    """Generator which yields keystrokes (key, timestamp) at the simulated times, sleeping in between"""
+    next_time = time.perf_counter()
+    for key, interval in model.iterate_keystrokes(number_of_words):
+        next_time += interval
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield key, next_time
+
+
+if __name__ == '__main__':
+    # Benchmark offline generation, and check the simulated speed and error rate against the model parameters:
+    model = TypistModel(wpm=80, error_rate=0.03, seed=1)
+    total_keystrokes = 0
+    total_time = 0.0
+    backspaces = 0
+    start = time.perf_counter()
+    for keys, intervals in model.iterate_batches(500000):
+        total_keystrokes += len(keys)
+        total_time += sum(intervals)
+        backspaces += keys.count(BACKSPACE)
+    elapsed = time.perf_counter() - start
+    print(f"Generated {total_keystrokes:,} keystrokes in {elapsed:.2f} s ({total_keystrokes / elapsed:,.0f} keystrokes/s)")
+    print(f"Simulated speed: {(total_keystrokes - 2 * backspaces) / 5 / (total_time / 60):.1f} WPM (target 80, "
+          f"slower due to corrections); corrections: {backspaces / (total_keystrokes - 2 * backspaces):.3f} per keystroke")
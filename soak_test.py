@@ -0,0 +1,311 @@
+# Long-running (kiosk) soak test for the Typing Speed Test application.
+
+# Kiosks run the application for weeks, so anything which grows with each tick or test (process memory, Tcl commands
+# and pending callbacks, tags and tag ranges of the Text widgets, canvas items) eventually matters.  This harness runs
+# the real application (under a virtual X server, as 'gui_latency.py' does, and in a scratch working directory so the
+# history, high score and caches of the real installation are untouched), loads itself into it as a plugin (see
+# 'hooks.py'), and runs thousands of short tests back to back through the application's own 'run_test' loop:
+#   - each tick types the next character of the current word (a key press injected with 'event_generate'),
+#   - the loop does not sleep between ticks, and each test lasts SOAK_TEST_LENGTH seconds of test time,
+#   - the end-of-test dialog is answered automatically (dialogs would otherwise wait for a user),
+#   - the keystrokes are recorded by the cheat detector at human-like intervals of simulated time (a key on every
+#     tick would be flagged as a macro, and every result would then be kept out of the high score and leaderboards),
+#   - results are submitted to a live leaderboard of the run's own (removed at the end of the run), not to the one
+#     shared by the instances of the application on the host.
+# Every SAMPLE_INTERVAL tests, it samples the resident set size (RSS), the number of Tcl commands (each a Python
+# callback registered with Tcl) and pending 'after' callbacks, the tags and tag ranges of each Text widget, the canvas
+# items and the number of Python objects tracked by the garbage collector.  The harness then reports each measure at
+# the start and end of the run, and its growth per 1,000 tests after a warm-up (which should be zero, or close to it).
+
+# Usage examples (Xvfb must be installed unless a display is already available):
+#   python soak_test.py
+#   python soak_test.py --tests 10000 --sample-interval 100
+
+# Import necessary library(ies):
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter
+
+from anti_cheat import CheatDetector
+from gui_latency import XVFB_DISPLAY, start_xvfb
+from live_leaderboard import SEGMENT_NAME, LiveLeaderboard, remove_segment
+from simulator import get_keysym
+
+# Define constants for the environment variables through which the harness configures the plugin in the application:
+OUTPUT_ENVIRONMENT_VARIABLE = "SOAK_TEST_OUTPUT"
+TESTS_ENVIRONMENT_VARIABLE = "SOAK_TEST_TESTS"
+SAMPLE_INTERVAL_ENVIRONMENT_VARIABLE = "SOAK_TEST_SAMPLE_INTERVAL"
+
+# Define constants for the default no. of tests and the no. of tests between samples:
+DEFAULT_TESTS = 2000
+DEFAULT_SAMPLE_INTERVAL = 50
+
+# Define constant for the length (in seconds of test time, i.e. ticks of 0.01 seconds) of each soak test:
+SOAK_TEST_LENGTH = 2.0
+
+# Define constant for the wait (in milliseconds) before the first test is started:
+STARTUP_DELAY = 1000
+
+# Define constant for the files copied into the scratch working directory (assets, and a high score to beat):
+WORKING_FILES = ("keyboard.png", "high_score.txt")
+
+# Define constants for the simulated inter-key intervals (log-normal; ~110 ms mean, as a human typist) recorded by the
+# cheat detector:
+INTERVAL_MU = -2.2
+INTERVAL_SIGMA = 0.4
+
+# Define constant for the share of the run (its start) treated as warm-up when measuring growth:
+WARM_UP_SHARE = 0.25
+
+# Define constant for the measures sampled from the application (in reporting order):
+MEASURES = ("rss_kb", "tcl_commands", "after_callbacks", "text_tags", "text_tag_ranges", "canvas_items", "python_objects")
+
+
+class PacedCheatDetector(CheatDetector):
+    """Class which records the keystrokes of the soak tests at human-like intervals of simulated time"""
+    __slots__ = ("clock", "rng")
+
+    def __init__(self):
+        self.clock = 0.0
+        self.rng = random.Random(0)
+        super().__init__()
+
+    def record_keystroke(self, timestamp):
+        """Function which records a keystroke at the next simulated time (in place of the actual time of the key press)"""
+        self.clock += self.rng.lognormvariate(INTERVAL_MU, INTERVAL_SIGMA)
+        super().record_keystroke(self.clock)
+
+
+class SoakDriver:
+    """Class which runs back-to-back tests in the running application and samples its resource use"""
+    __slots__ = ("app", "tests", "sample_interval", "output_file", "tests_run", "dialogs", "segment_name")
+
+    def __init__(self, app, tests, sample_interval, output_path):
+        self.app = app
+        self.tests = tests
+        self.sample_interval = sample_interval
+        self.output_file = open(output_path, mode="w", encoding="utf-8")
+        self.tests_run = 0
+        self.dialogs = 0
+        self.segment_name = f"{SEGMENT_NAME}_soak_{os.getpid()}"
+
+    def answer_dialog(self, title, message, **options):
+        """Function which answers a message box in place of the user (errors are logged, and end the run)"""
+        self.dialogs += 1
+        if title == "Error":
+            self.output_file.write(json.dumps({"error": message}) + "\n")
+            self.finish()
+        return "ok"
+
+    def finish(self):
+        """Function which saves the last sample, removes the run's live leaderboard and exits the application"""
+        self.write_sample()
+        self.output_file.close()
+        if self.app.live_board is not None and self.app.live_board.name == self.segment_name:
+            self.app.live_board.close()
+            remove_segment(self.segment_name)
+            try:
+                os.remove(os.path.join(tempfile.gettempdir(), self.segment_name + ".lock"))
+            except OSError:
+                pass
+        os._exit(0)
+
+    def run_next_test(self):
+        """Function which runs the next test (through the application's 'run_test' loop), sampling resource use between tests"""
+        if self.tests_run % self.sample_interval == 0:
+            self.write_sample()
+        if self.tests_run >= self.tests:
+            self.finish()
+            return
+        self.tests_run += 1
+        self.app.button_test.invoke()  # (NOTE: Returns once the test has ended.)
+        self.app.window.after(0, self.run_next_test)
+
+    def shorten_test(self):
+        """Function which shortens the test just started (hook called when a test starts)"""
+        self.app.session.time_remaining = SOAK_TEST_LENGTH
+
+    def start(self):
+        """Function which prepares the application for unattended tests and starts the first one"""
+        app = self.app
+
+        # Submit results to a live leaderboard of this run's own (if shared memory is available to the application):
+        if app.live_board is not None:
+            app.live_board.close()
+            remove_segment(self.segment_name)
+            app.live_board = LiveLeaderboard(self.segment_name)
+
+        # Answer dialogs automatically, tick without sleeping, and type a key on each tick (recorded by the cheat
+        # detector at human-like intervals):
+        # (NOTE: Generated key presses go to the widget with the keyboard focus, which is forced without a window manager.)
+        app.messagebox.showinfo = self.answer_dialog
+        app.sleep = lambda seconds: None
+        app.cheat_detector = PacedCheatDetector()
+        app.txt_word_typed.focus_force()
+        app.hooks.register_hook(app.hooks.EVENT_TEST_START, self.shorten_test)
+        app.hooks.register_hook(app.hooks.EVENT_TICK, self.type_next_key)
+        self.run_next_test()
+
+    def type_next_key(self, cpm, wpm, time_remaining):
+        """Function which injects the next key press of the current word (hook called on each tick)"""
+        app = self.app
+        if not app.session.has_words_remaining():
+            return
+        word = app.session.get_current_word()
+        typed = app.txt_word_typed.get()
+        if not word.startswith(typed):
+            key = "\b"
+        elif len(typed) < len(word):
+            key = word[len(typed)]
+        elif app.TEST_MODE == "code":
+            key = "\n"
+        else:
+            return
+        app.txt_word_typed.event_generate("<KeyPress>", keysym=get_keysym(key), when="tail")
+
+    def write_sample(self):
+        """Function which samples the application's resource use and writes it (one JSON object per line)"""
+        app = self.app
+        tcl = app.window.tk
+        text_widgets = [widget for widget in iterate_widgets(app.window) if isinstance(widget, tkinter.Text)]
+        canvases = [widget for widget in iterate_widgets(app.window) if isinstance(widget, tkinter.Canvas)]
+        sample = {
+            "tests": self.tests_run,
+            "time": time.time(),
+            "rss_kb": get_rss_kb(),
+            "tcl_commands": len(tcl.splitlist(tcl.call("info", "commands"))),
+            "after_callbacks": len(tcl.splitlist(tcl.call("after", "info"))),
+            "text_tags": sum(len(widget.tag_names()) for widget in text_widgets),
+            "text_tag_ranges": sum(len(widget.tag_ranges(tag)) // 2 for widget in text_widgets
+                                   for tag in widget.tag_names()),
+            "canvas_items": sum(len(widget.find_all()) for widget in canvases),
+            "python_objects": len(gc.get_objects()),
+            "dialogs": self.dialogs,
+        }
+        self.output_file.write(json.dumps(sample) + "\n")
+        self.output_file.flush()
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def get_growth_per_thousand_tests(samples, measure):
+    """Function which returns the growth of a measure per 1,000 tests after the warm-up (least-squares slope)"""
+    samples = samples[int(len(samples) * WARM_UP_SHARE):]
+    if len(samples) < 2:
+        return 0.0
+    mean_tests = sum(sample["tests"] for sample in samples) / len(samples)
+    mean_value = sum(sample[measure] for sample in samples) / len(samples)
+    covariance = sum((sample["tests"] - mean_tests) * (sample[measure] - mean_value) for sample in samples)
+    variance = sum((sample["tests"] - mean_tests) ** 2 for sample in samples)
+    return covariance / variance * 1000 if variance else 0.0
+
+
+def get_rss_kb():
+    """Function which returns the resident set size (in KiB) of this process (its peak, where the current size is unavailable)"""
+    try:
+        with open("/proc/self/statm", mode="r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak  # (NOTE: Bytes on macOS, KiB elsewhere.)
+
+
+def iterate_widgets(widget):
+    """Generator which yields a widget and all of its descendants"""
+    yield widget
+    for child in widget.winfo_children():
+        yield from iterate_widgets(child)
+
+
+def register(hooks):
+    """Function which (as a plugin loaded into the application by the harness) schedules the soak test"""
+    output_path = os.environ.get(OUTPUT_ENVIRONMENT_VARIABLE)
+    if not output_path:
+        return
+    driver = SoakDriver(sys.modules["__main__"], int(os.environ.get(TESTS_ENVIRONMENT_VARIABLE, DEFAULT_TESTS)),
+                        int(os.environ.get(SAMPLE_INTERVAL_ENVIRONMENT_VARIABLE, DEFAULT_SAMPLE_INTERVAL)), output_path)
+    driver.app.window.after(STARTUP_DELAY, driver.start)
+
+
+def report_samples(samples):
+    """Function which prints each measure at the start and end of a soak run, and its growth per 1,000 tests after the warm-up"""
+    print(f"{'Measure':<18}{'Start':>12}{'End':>12}{'Max':>12}{'Growth/1k tests':>18}")
+    for measure in MEASURES:
+        growth = get_growth_per_thousand_tests(samples, measure)
+        print(f"{measure:<18}{samples[0][measure]:>12,}{samples[-1][measure]:>12,}"
+              f"{max(sample[measure] for sample in samples):>12,}{growth:>18,.1f}")
+
+
+def run_soak():
+    """Main function used to run the soak test from the command line"""
+    parser = argparse.ArgumentParser(description="Run back-to-back tests in the application and track its resource use.")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"),
+                        help="application script to run (default: main.py)")
+    parser.add_argument("--tests", type=int, default=DEFAULT_TESTS, help="number of tests to run")
+    parser.add_argument("--sample-interval", type=int, default=DEFAULT_SAMPLE_INTERVAL,
+                        help="number of tests between samples of resource use")
+    parser.add_argument("--display", help="X display to use (default: $DISPLAY, or a new Xvfb server)")
+    parser.add_argument("--output", help="path of the JSONL file of samples (default: a temporary file)")
+    arguments = parser.parse_args()
+
+    # Use the given (or current) display, or start a virtual X server:
+    environment = dict(os.environ)
+    xvfb = None
+    if arguments.display:
+        environment["DISPLAY"] = arguments.display
+    elif not environment.get("DISPLAY"):
+        xvfb = start_xvfb(XVFB_DISPLAY)
+        environment["DISPLAY"] = XVFB_DISPLAY
+
+    # Run the application in a scratch working directory, with this module loaded as a plugin:
+    app_path = os.path.abspath(arguments.app)
+    app_directory = os.path.dirname(app_path)
+    working_directory = tempfile.mkdtemp(prefix="soak_")
+    for file_name in WORKING_FILES:
+        if os.path.exists(os.path.join(app_directory, file_name)):
+            shutil.copy(os.path.join(app_directory, file_name), working_directory)
+    output_path = arguments.output or os.path.join(working_directory, "soak_samples.jsonl")
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, (os.path.dirname(os.path.abspath(__file__)), app_directory,
+                                                              environment.get("PYTHONPATH"))))
+    environment["TYPING_TEST_PLUGINS"] = ",".join(filter(None, (environment.get("TYPING_TEST_PLUGINS"), "soak_test")))
+    environment[OUTPUT_ENVIRONMENT_VARIABLE] = os.path.abspath(output_path)
+    environment[TESTS_ENVIRONMENT_VARIABLE] = str(arguments.tests)
+    environment[SAMPLE_INTERVAL_ENVIRONMENT_VARIABLE] = str(arguments.sample_interval)
+    try:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, app_path], cwd=working_directory, env=environment, check=False)
+        elapsed = time.perf_counter() - start
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    # Report the samples:
+    samples = []
+    try:
+        with open(output_path, mode="r", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                if "error" in record:
+                    print("The application reported an error:\n" + record["error"])
+                else:
+                    samples.append(record)
+    except (OSError, ValueError):
+        pass
+    if not samples:
+        sys.exit(f"No samples were recorded (see the application's system log in {working_directory})")
+    print(f"Ran {samples[-1]['tests']:,} tests in {elapsed:.0f} s ({samples[-1]['dialogs']:,} dialogs answered); "
+          f"samples in {output_path}")
+    report_samples(samples)
+
+
+if __name__ == '__main__':
+    run_soak()
@@ -0,0 +1,76 @@
+# Live speed graph (sparkline) for the Typing Speed Test application.
+
+# Once per second, the test engine passes the CPM total so far to the graph.  The totals are kept in a fixed-size ring
+# buffer, from which the current speed is the no. of characters typed over the last few seconds (scaled to a minute).
+# Each speed is drawn as one new line segment on a Canvas; the segments are a fixed ring of pre-created line items, so
+# a new sample reuses the oldest item ('coords') and, once the graph is full, scrolls all items left by one step with
+# a single 'move'.  Nothing is ever redrawn, and the cost per sample is the same however long the test runs.
+
+# Import necessary library(ies):
+from array import array
+
+# Define constant for the number of segments (one per second) shown across the graph (older ones scroll off the left):
+GRAPH_SEGMENTS = 120
+
+# Define constant for the number of seconds over which the current speed is measured:
+SPEED_WINDOW = 5
+
+# Define constant for the speed (CPM) shown at the top of the graph (faster speeds are drawn at the top):
+GRAPH_MAXIMUM_CPM = 500
+
+# Define constants for the appearance of the graph:
+LINE_COLOUR = "red"
+LINE_WIDTH = 2
+LINE_TAG = "speed"
+
+# Define constant for the coordinates at which an unused segment is hidden (outside the canvas):
+HIDDEN_COORDINATES = (-10, -10, -10, -10)
+
+
+class SpeedGraph:
+    """Class which draws a live graph of typing speed on a canvas, one segment per second"""
+    __slots__ = ("canvas", "width", "height", "step", "totals", "sample_count", "segment_items", "next_segment",
+                 "previous_point")
+
+    def __init__(self, canvas, width, height):
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.step = width / GRAPH_SEGMENTS
+
+        # Create the ring buffer of CPM totals (the last SPEED_WINDOW seconds, plus the current second) and the ring of
+        # line items:
+        self.totals = array("I", bytes(4 * (SPEED_WINDOW + 1)))
+        self.segment_items = [canvas.create_line(*HIDDEN_COORDINATES, fill=LINE_COLOUR, width=LINE_WIDTH,
+                                                 tags=LINE_TAG) for _ in range(GRAPH_SEGMENTS)]
+        self.reset()
+
+    def add_sample(self, cpm_total):
+        """Function which adds the CPM total at the end of a second of the test, and draws the new segment of the graph"""
+        # Store the total in the ring buffer, and compute the speed over the last seconds (fewer at the start):
+        self.sample_count += 1
+        self.totals[self.sample_count % len(self.totals)] = cpm_total
+        seconds = min(self.sample_count, SPEED_WINDOW)
+        earlier_total = self.totals[(self.sample_count - seconds) % len(self.totals)]
+        speed = (cpm_total - earlier_total) * 60 / seconds
+
+        # Once the graph is full, scroll it left by one step to make room for the new segment:
+        if self.sample_count > GRAPH_SEGMENTS:
+            self.canvas.move(LINE_TAG, -self.step, 0)
+            self.previous_point = (self.previous_point[0] - self.step, self.previous_point[1])
+
+        # Draw the new segment, reusing the oldest line item:
+        point = (min(self.sample_count, GRAPH_SEGMENTS) * self.step,
+                 self.height - min(speed, GRAPH_MAXIMUM_CPM) * (self.height - LINE_WIDTH) / GRAPH_MAXIMUM_CPM - 1)
+        self.canvas.coords(self.segment_items[self.next_segment], *self.previous_point, *point)
+        self.next_segment = (self.next_segment + 1) % GRAPH_SEGMENTS
+        self.previous_point = point
+
+    def reset(self):
+        """Function which clears the graph in preparation for a new test"""
+        for item in self.segment_items:
+            self.canvas.coords(item, *HIDDEN_COORDINATES)
+        self.totals[0] = 0
+        self.sample_count = 0
+        self.next_segment = 0
+        self.previous_point = (0, self.height - 1)
@@ -0,0 +1,307 @@
+# Terminal (curses) front-end for the Typing Speed Test application.
+
+# A lightweight alternative to the Tk application ('main.py') for terminals which cannot run Tk.  It applies the same
+# test rules (see 'engine.py'), word list and high-score storage.  Only the screen regions which have changed are
+# redrawn: the statistics line when its text changes, the input line on each keystroke, and in the words pane only the
+# previous and current words (unless the current word moves to another line, in which case the pane is scrolled).
+
+# Usage:
+#   python terminal_app.py [challenge code]
+# Press Enter to start a test, Esc to end it (or quit between tests).
+
+# Import necessary library(ies):
+from contextlib import nullcontext
+import curses
+import os
+import sys
+import time
+
+from anti_cheat import CheatDetector
+from corpus import DEFAULT_LANGUAGE, IncrementalMatcher, get_corpus
+from engine import LENGTH_OF_TEST, NUMBER_OF_WORDS_TO_SELECT, calculate_wpm, read_high_score, write_high_score
+import history
+from live_leaderboard import LiveLeaderboard
+import prepared_tests
+
+# Define constant for the test mode recorded in the test history (tests in the terminal use random common words):
+TEST_MODE = "words"
+
+# Define constant for the number of seconds the main loop waits for a keystroke before updating the remaining time:
+TICK_INTERVAL = 0.1
+
+# Define constants for the screen rows of each region:
+ROW_HIGH_SCORE = 0
+ROW_STATS = 1
+ROW_WORDS = 3
+ROWS_BELOW_WORDS = 4  # Blank line, input line, blank line and help line.
+
+# Define constants for key codes:
+KEY_ESCAPE = "\x1b"
+KEYS_BACKSPACE = (curses.KEY_BACKSPACE, "\x7f", "\b")
+KEYS_ENTER = (curses.KEY_ENTER, "\n", "\r")
+
+
+class TerminalTest:
+    """Class which runs typing tests in a curses screen"""
+
+    def __init__(self, screen, seed=None):
+        self.screen = screen
+        self.corpus = get_corpus(DEFAULT_LANGUAGE)
+        self.matcher = IncrementalMatcher()
+        self.cheat_detector = CheatDetector()
+        self.seed = seed
+        self.words = []
+        self.line_starts = []  # Index of the first word on each (wrapped) line of the words pane.
+        self.word_lines = []  # Line (in the words pane) of each word.
+        self.word_columns = []  # Column (in the words pane) of each word.
+        self.current_word = 0
+        self.first_visible_line = 0
+        self.typed = ""
+        self.cpm = 0
+        self.keystrokes = 0
+        self.speed_samples = []
+        self.stats_text = ""
+        self.in_progress = False
+        self.started_at = 0.0
+
+        # Attach to the live leaderboard shared with the other instances (Tk or terminal) on the host, if shared memory
+        # is available:
+        try:
+            self.live_board = LiveLeaderboard()
+        except Exception:
+            self.live_board = None
+
+    def choose_words(self):
+        # Prepare (reproducibly, from the given or a new seed) the words for the next test:
+        seed = prepared_tests.new_seed() if self.seed is None else self.seed
+        self.seed = None
+        prepared_test = prepared_tests.get_prepared_test(TEST_MODE, seed, self.corpus.digest, NUMBER_OF_WORDS_TO_SELECT,
+                                                         self.corpus.choose_words)
+        self.words = prepared_test.words
+        self.challenge_code = prepared_tests.format_challenge_code(TEST_MODE, seed, self.corpus.digest)
+        self.layout_words()
+
+    def draw_high_score(self):
+        high_score_cpm = self.get_high_score()
+        self.draw_line(ROW_HIGH_SCORE, f"HIGH SCORE: {high_score_cpm} CPM ({calculate_wpm(high_score_cpm)} WPM)", curses.A_BOLD)
+
+    def draw_input(self, prompt=None):
+        self.draw_line(self.input_row, "> " + (self.typed if prompt is None else prompt))
+
+    def draw_line(self, row, text, attribute=curses.A_NORMAL):
+        # Skip rows below the bottom of the screen (e.g., the help line in a very short terminal):
+        height, width = self.screen.getmaxyx()
+        if row >= height:
+            return
+        self.screen.move(row, 0)
+        self.screen.clrtoeol()
+        self.screen.addnstr(row, 0, text, width - 1, attribute)
+
+    def draw_stats(self, time_remaining):
+        # Redraw the statistics line only if its text has changed:
+        text = f"CPM: {self.cpm}     WPM: {calculate_wpm(self.cpm)}     Remaining Time: {abs(round(time_remaining, 1))}"
+        if text != self.stats_text:
+            self.stats_text = text
+            self.draw_line(ROW_STATS, text, curses.A_BOLD)
+
+    def draw_word(self, index, attribute):
+        line = self.word_lines[index] - self.first_visible_line
+        if 0 <= line < self.pane_height and ROW_WORDS + line < self.screen.getmaxyx()[0]:
+            column = self.word_columns[index]
+            self.screen.addnstr(ROW_WORDS + line, column, self.words[index], self.screen.getmaxyx()[1] - 1 - column, attribute)
+
+    def draw_words_pane(self):
+        # Draw the visible lines of the words pane, starting at the line of the current word:
+        for line in range(min(self.pane_height, self.screen.getmaxyx()[0] - ROW_WORDS)):
+            self.screen.move(ROW_WORDS + line, 0)
+            self.screen.clrtoeol()
+            layout_line = self.first_visible_line + line
+            if layout_line < len(self.line_starts):
+                end = self.line_starts[layout_line + 1] if layout_line + 1 < len(self.line_starts) else len(self.words)
+                for index in range(self.line_starts[layout_line], end):
+                    self.draw_word(index, curses.A_DIM if index < self.current_word else curses.A_NORMAL)
+        if self.current_word < len(self.words):
+            self.draw_word(self.current_word, curses.A_REVERSE)
+
+    def end_test(self):
+        # Compare the result with the high score (archiving it if it is a new high score), and record it in the history:
+        self.in_progress = False
+        duration = min(LENGTH_OF_TEST, time.monotonic() - self.started_at)
+        previous_high_score_cpm = self.get_high_score()
+        suspicion_reasons = self.cheat_detector.get_suspicion_reasons(self.cpm)
+        user = history.get_current_user()
+        if not suspicion_reasons:
+            # Archive a new high score as 'main.py' does: under the live leaderboard's host-wide lock, and only if the
+            # score is still higher (another instance may have archived a higher one meanwhile):
+            if self.cpm > previous_high_score_cpm:
+                with self.live_board.lock if self.live_board is not None else nullcontext():
+                    if self.cpm > read_high_score():
+                        write_high_score(self.cpm)
+
+            # Submit the result to the live leaderboard, so that the other instances see it:
+            if self.live_board is not None:
+                self.live_board.submit(user, self.cpm, calculate_wpm(self.cpm))
+            if self.cpm > previous_high_score_cpm:
+                self.draw_high_score()
+        connection = history.connect()
+        try:
+            history.record_result(connection, user, TEST_MODE, round(duration, 2), self.cpm,
+                                  calculate_wpm(self.cpm), min(1.0, self.cpm / self.keystrokes) if self.keystrokes else 0.0,
+                                  self.speed_samples, suspect=bool(suspicion_reasons))
+        finally:
+            connection.close()
+
+        # Show the final metrics and prepare the next test:
+        message = f"FINAL: {self.cpm} CPM ({calculate_wpm(self.cpm)} WPM)"
+        if suspicion_reasons:
+            message += " - flagged: " + "; ".join(suspicion_reasons)
+        elif self.cpm > previous_high_score_cpm:
+            message += " - new high score!"
+        self.draw_line(self.help_row, message + f"  Challenge: {self.challenge_code}  [Enter] new test  [Esc] quit", curses.A_BOLD)
+        self.reset()
+
+    def get_high_score(self):
+        # The high score archived in the high-score file, or a higher score on the live leaderboard (e.g., just achieved
+        # in another instance):
+        high_score_cpm = read_high_score()
+        if self.live_board is not None:
+            high_score_cpm = max(high_score_cpm, self.live_board.get_high_score())
+        return high_score_cpm
+
+    def handle_key(self, key):
+        # Handle a keystroke (returns False if the application should quit):
+        if key == KEY_ESCAPE:
+            if self.in_progress:
+                self.end_test()
+                return True
+            return False
+        if not self.in_progress:
+            if key in KEYS_ENTER:
+                self.start_test()
+            return True
+
+        # Update what the user has typed:
+        if key in KEYS_BACKSPACE:
+            self.typed = self.typed[:-1]
+        elif isinstance(key, str) and key.isprintable() and key != " ":
+            self.typed += key
+            self.keystrokes += 1
+            self.cheat_detector.record_keystroke(time.perf_counter())
+        else:
+            return True
+
+        # If the user has fully and correctly typed the current word, move on to the next word:
+        self.matcher.update(self.typed)
+        if self.matcher.is_match():
+            self.cpm += len(self.words[self.current_word])
+            self.typed = ""
+            self.move_to_next_word()
+        if self.in_progress:
+            self.draw_input()
+        return True
+
+    def layout_words(self):
+        # Compute (once per test) the line and column of each word when wrapped to the width of the screen:
+        width = self.screen.getmaxyx()[1] - 1
+        self.line_starts = [0]
+        self.word_lines = []
+        self.word_columns = []
+        column = 0
+        for index, word in enumerate(self.words):
+            if column and column + len(word) > width:
+                self.line_starts.append(index)
+                column = 0
+            self.word_lines.append(len(self.line_starts) - 1)
+            self.word_columns.append(column)
+            column += len(word) + 1
+
+    def move_to_next_word(self):
+        # Un-highlight the completed word and highlight the next one (scrolling the pane if the next word is on another line):
+        self.draw_word(self.current_word, curses.A_DIM)
+        self.current_word += 1
+        if self.current_word >= len(self.words):
+            self.end_test()
+            return
+        self.matcher.reset(self.corpus.get_folded(self.words[self.current_word]))
+        if self.word_lines[self.current_word] != self.first_visible_line:
+            self.first_visible_line = self.word_lines[self.current_word]
+            self.draw_words_pane()
+        else:
+            self.draw_word(self.current_word, curses.A_REVERSE)
+
+    def reset(self):
+        # Prepare the words and screen for a new test:
+        self.choose_words()
+        self.current_word = 0
+        self.first_visible_line = 0
+        self.typed = ""
+        self.cpm = 0
+        self.keystrokes = 0
+        self.speed_samples = []
+        self.draw_stats(LENGTH_OF_TEST)
+        self.draw_words_pane()
+        self.draw_input("Press Enter to begin test.")
+
+    def run(self):
+        # Lay out the screen and run tests until the user quits:
+        curses.curs_set(0)
+        self.screen.timeout(int(TICK_INTERVAL * 1000))
+        height = self.screen.getmaxyx()[0]
+        self.pane_height = max(1, height - ROW_WORDS - ROWS_BELOW_WORDS)
+        self.input_row = ROW_WORDS + self.pane_height + 1
+        self.help_row = self.input_row + 2
+        self.draw_high_score()
+        self.reset()
+        self.draw_line(self.help_row, "[Enter] start test  [Esc] end test / quit")
+        while True:
+            # Only the regions changed since the last iteration are sent to the terminal:
+            self.screen.refresh()
+            try:
+                key = self.screen.get_wch()
+            except curses.error:  # No keystroke before the timeout.
+                key = None
+            if key is not None and not self.handle_key(key):
+                return
+            if self.in_progress:
+                time_remaining = max(0.0, LENGTH_OF_TEST - (time.monotonic() - self.started_at))
+
+                # At the end of each second of the test, record a sample of the speed (CPM) so far (before the test is
+                # ended below, so that its last sample is recorded with it):
+                while LENGTH_OF_TEST - time_remaining >= len(self.speed_samples) + 1:
+                    self.speed_samples.append(self.cpm)
+
+                if time_remaining <= 0:
+                    self.draw_stats(0)
+                    self.end_test()
+                else:
+                    self.draw_stats(time_remaining)
+
+    def start_test(self):
+        # Start the test (the clock starts now):
+        self.in_progress = True
+        self.started_at = time.monotonic()
+        self.speed_samples = []
+        self.cheat_detector.reset()
+        self.matcher.reset(self.corpus.get_folded(self.words[0]))
+        self.draw_line(self.help_row, "[Esc] end test")
+        self.draw_input()
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def run_terminal_app(screen):
+    """Main function used to run the terminal application (within 'curses.wrapper')"""
+    seed = None
+    if len(sys.argv) > 1:
+        try:
+            mode, seed, source_digest = prepared_tests.parse_challenge_code(sys.argv[1])
+        except ValueError:
+            raise SystemExit(f"Invalid challenge code: {sys.argv[1]}\nUsage: python terminal_app.py [challenge code]")
+        if mode != TEST_MODE or not get_corpus(DEFAULT_LANGUAGE).digest.startswith(source_digest):
+            raise SystemExit("This challenge was created with a different test mode or word list.")
+    TerminalTest(screen, seed).run()
+
+
+if __name__ == '__main__':
+    # Shorten the delay curses applies to the Esc key (to tell it apart from escape sequences):
+    os.environ.setdefault("ESCDELAY", "25")
+    curses.wrapper(run_terminal_app)
@@ -0,0 +1,164 @@
+# Historical trend charts for the Typing Speed Test application.
+
+# A user's progress is charted from their recorded results (see 'history.py'), which may be 100k+ tests.  So that a
+# chart opens in milliseconds, per-day, per-week and per-month aggregates of each user's results (no. of tests, total
+# and best CPM) are kept in the history database as a pyramid of materialised buckets, updated incrementally (one row
+# per level) as each result is recorded.  A chart uses the finest level (individual tests, days, weeks or months) which
+# has no more than a few points per pixel column, and then downsamples it to the chart's width with the
+# Largest-Triangle-Three-Buckets (LTTB) algorithm, which keeps the visual shape (peaks and troughs) of the series.
+
+# Import necessary library(ies):
+from datetime import datetime, timedelta
+import time
+
+# Define constants for the levels of the pyramid (finest first; individual tests are read from the results table):
+LEVEL_TEST = "test"
+LEVEL_DAY = "day"
+LEVEL_WEEK = "week"
+LEVEL_MONTH = "month"
+LEVELS = (LEVEL_DAY, LEVEL_WEEK, LEVEL_MONTH)
+
+# Define constant for the maximum number of points per pixel column read before downsampling (LTTB):
+CHART_OVERSAMPLING = 4
+
+
+# DEFINE FUNCTIONS TO BE USED FOR THIS MODULE (LISTED IN ALPHABETICAL ORDER BY FUNCTION NAME):
+def count_points(connection, user, level):
+    """Function which returns the number of points of a user's series at a level of the pyramid"""
+    if level == LEVEL_TEST:
+        row = connection.execute("SELECT SUM(tests) FROM trend_buckets WHERE user = ? AND level = ?",
+                                 (user, LEVEL_MONTH)).fetchone()
+    else:
+        row = connection.execute("SELECT COUNT(*) FROM trend_buckets WHERE user = ? AND level = ?",
+                                 (user, level)).fetchone()
+    return row[0] or 0
+
+
+def downsample_lttb(points, threshold):
+    """Function which downsamples a series of (x, y) points to the given no. of points (Largest-Triangle-Three-Buckets)"""
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+
+    # Always keep the first and last points; choose one point from each of the (threshold - 2) buckets in between:
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    previous_x, previous_y = points[0]
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Average of the next bucket (the third vertex of the triangle):
+        next_end = min(int((bucket + 2) * bucket_size) + 1, len(points))
+        next_points = points[end:next_end] or points[-1:]
+        average_x = sum(point[0] for point in next_points) / len(next_points)
+        average_y = sum(point[1] for point in next_points) / len(next_points)
+
+        # Keep the point of this bucket which forms the largest triangle with the previous kept point and the average:
+        best_area = -1.0
+        best_point = None
+        for point in points[start:end]:
+            area = abs((previous_x - average_x) * (point[1] - previous_y) - (previous_x - point[0]) * (average_y - previous_y))
+            if area > best_area:
+                best_area = area
+                best_point = point
+        sampled.append(best_point)
+        previous_x, previous_y = best_point
+    sampled.append(points[-1])
+    return sampled
+
+
+def get_bucket_start(level, finished_at):
+    """Function which returns the start (seconds since the epoch, local time) of the day, week or month of a result"""
+    when = datetime.fromtimestamp(finished_at)
+    start = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    if level == LEVEL_WEEK:
+        start -= timedelta(days=start.weekday())  # Weeks start on Monday (as ISO weeks do).
+    elif level == LEVEL_MONTH:
+        start = start.replace(day=1)
+    return start.timestamp()
+
+
+def get_trend_series(connection, user, width):
+    """Function which returns the level used and a user's CPM series ((time, CPM) points) downsampled to the given width"""
+    # Use the finest level with no more than a few points per pixel column (or the coarsest level):
+    limit = width * CHART_OVERSAMPLING
+    level = LEVEL_MONTH
+    for candidate in (LEVEL_TEST,) + LEVELS:
+        if count_points(connection, user, candidate) <= limit:
+            level = candidate
+            break
+
+    # Read the series (individual results, or the average CPM of each bucket) and downsample it to the width:
+    if level == LEVEL_TEST:
+        points = connection.execute(
+            "SELECT finished_at, cpm FROM results WHERE user = ? AND suspect = 0 ORDER BY finished_at",
+            (user,)).fetchall()
+    else:
+        points = connection.execute(
+            "SELECT bucket_start, CAST(total_cpm AS REAL) / tests FROM trend_buckets WHERE user = ? AND level = ? "
+            "ORDER BY bucket_start", (user, level)).fetchall()
+    return level, downsample_lttb(points, width)
+
+
+def update_trends(connection, user, finished_at, cpm):
+    """Function which adds a newly recorded result to the user's day, week and month buckets (within the caller's transaction)"""
+    connection.executemany(
+        "INSERT INTO trend_buckets (user, level, bucket_start, tests, total_cpm, best_cpm) VALUES (?, ?, ?, 1, ?, ?) "
+        "ON CONFLICT(user, level, bucket_start) DO UPDATE SET tests = tests + 1, "
+        "total_cpm = total_cpm + excluded.total_cpm, best_cpm = MAX(best_cpm, excluded.best_cpm)",
+        [(user, level, get_bucket_start(level, finished_at), cpm, cpm) for level in LEVELS])
+
+
+def update_trends_bulk(connection, results):
+    """Function which adds a batch of newly recorded results (user, finished at, CPM) to the users' day, week and month buckets (within the caller's transaction)"""
+    # Aggregate the batch by bucket (memoising the bucket starts by local date):
+    buckets = {}
+    bucket_starts_by_date = {}
+    for user, finished_at, cpm in results:
+        date = time.localtime(finished_at)[:3]
+        bucket_starts = bucket_starts_by_date.get(date)
+        if bucket_starts is None:
+            bucket_starts = [(level, get_bucket_start(level, finished_at)) for level in LEVELS]
+            bucket_starts_by_date[date] = bucket_starts
+        for level, bucket_start in bucket_starts:
+            aggregate = buckets.get((user, level, bucket_start))
+            if aggregate is None:
+                buckets[(user, level, bucket_start)] = [1, cpm, cpm]
+            else:
+                aggregate[0] += 1
+                aggregate[1] += cpm
+                aggregate[2] = max(aggregate[2], cpm)
+
+    # Add the aggregates to the buckets:
+    connection.executemany(
+        "INSERT INTO trend_buckets (user, level, bucket_start, tests, total_cpm, best_cpm) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(user, level, bucket_start) DO UPDATE SET tests = tests + excluded.tests, "
+        "total_cpm = total_cpm + excluded.total_cpm, best_cpm = MAX(best_cpm, excluded.best_cpm)",
+        [key + tuple(aggregate) for key, aggregate in buckets.items()])
+
+
+if __name__ == '__main__':
+    # Benchmark: record 150,000 results over three years for one user, then time opening charts of various widths:
+    import os
+    import random
+    import tempfile
+
+    import history
+
+    connection = history.connect(os.path.join(tempfile.mkdtemp(), "history.db"))
+    connection.execute("PRAGMA synchronous = OFF")  # (Benchmark only: don't wait for the disk after each test.)
+    rng = random.Random(0)
+    start_time = time.time() - 3 * 365 * 86400
+    start = time.perf_counter()
+    for number in range(150000):
+        finished_at = start_time + number * (3 * 365 * 86400 / 150000)
+        cpm = int(150 + 100 * number / 150000 + rng.gauss(0, 30))
+        history.record_result(connection, "alice", "words", 60.0, cpm, cpm // 5, 0.95, [], finished_at=finished_at)
+    print(f"Recorded 150,000 results in {time.perf_counter() - start:.1f} s (trend buckets updated as each was recorded)")
+
+    for width in (50, 200, 400, 1200):
+        start = time.perf_counter()
+        level, series = get_trend_series(connection, "alice", width)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Chart {width:>4} px wide: {len(series):>4} points from the '{level}' level in {elapsed:.1f} ms")
+    connection.close()